@@ -0,0 +1,194 @@
+# batch_runner.py
+#
+# Scan a directory or manifest of videos for events with a pool of worker processes.
+# Progress is checkpointed per video so an interrupted batch resumes where it stopped.
+# Run from the ui directory:
+#     python -m video_processors.batch_runner /recordings -o /recordings/events
+
+import argparse
+import json
+import os
+import time
+from multiprocessing import Pool, cpu_count
+
+import cv2
+
+from .event_detection.auto_detector import AutoEventDetector
+from .event_detection.headless import write_detections
+from .event_detection.event_intervals import intervals_from_detections
+from .event_detection.matching import MATCHERS, create_matcher
+from .logger import setup_logger
+
+logger = setup_logger()
+
+# Extensions picked up when a directory is given (same as the Open Video dialog, plus mkv)
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+
+def find_videos(source):
+    """
+    Return the videos to process.
+
+    :param source: A directory (its videos are taken in name order), a JSON
+                   manifest holding a list of paths, or a text manifest with one
+                   path per line (blank lines and '#' comments are ignored).
+                   Relative manifest paths are relative to the manifest.
+    """
+    if os.path.isdir(source):
+        return [os.path.join(source, name) for name in sorted(os.listdir(source))
+                if name.lower().endswith(VIDEO_EXTENSIONS)]
+
+    with open(source) as file:
+        if source.endswith('.json'):
+            paths = json.load(file)
+        else:
+            paths = [line.strip() for line in file if line.strip() and not line.lstrip().startswith('#')]
+    base_dir = os.path.dirname(os.path.abspath(source))
+    return [os.path.join(base_dir, path) for path in paths]
+
+
+class Checkpoint:
+    """
+    Progress of one video, stored as JSON next to its output.
+
+    The state holds the scan settings, the last processed frame, the detections
+    found so far and whether the video is done. It is written to a temporary
+    file and renamed, so a crash mid-write leaves the previous checkpoint intact.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self, settings):
+        """Return the saved state, or None if there is none or it was made with other settings."""
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path) as file:
+                state = json.load(file)
+        except (OSError, json.JSONDecodeError):
+            logger.warning(f"Ignoring unreadable checkpoint {self.path}")
+            return None
+        if state.get("settings") != settings:
+            logger.info(f"Settings changed since {self.path} was written; rescanning")
+            return None
+        return state
+
+    def save(self, state):
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump(state, file)
+        os.replace(temp_path, self.path)
+
+
+class CheckpointWriter:
+    """Detector subscriber that saves the progress every ``interval`` seconds."""
+
+    def __init__(self, detector, checkpoint, state, interval=30.0):
+        self.detector = detector
+        self.checkpoint = checkpoint
+        self.state = state
+        self.interval = interval
+        self.previous_events = list(state["events"])
+        self.last_save = time.monotonic()
+
+    def __call__(self, frame_number, timestamp_ms, context, events):
+        self.state["last_frame"] = frame_number
+        if time.monotonic() - self.last_save >= self.interval:
+            self.flush()
+        return False
+
+    def flush(self):
+        self.state["events"] = self.previous_events + self.detector.detections
+        self.checkpoint.save(self.state)
+        self.last_save = time.monotonic()
+
+
+def output_paths(video_path, output_dir):
+    """Return the (events, checkpoint) file paths of a video."""
+    stem = os.path.splitext(os.path.basename(video_path))[0]
+    events_path = os.path.join(output_dir, f"{stem}_events.json")
+    return events_path, events_path + '.checkpoint'
+
+
+def process_video(task):
+    """
+    Scan one video, resuming from its checkpoint if there is one.
+
+    :return: (video_path, status, number of detections), where status is
+             'done', 'skipped' (already finished earlier) or 'failed'.
+    """
+    video_path, output_dir, settings, checkpoint_interval = task
+    # Videos run in parallel already; keep OpenCV from starting its own thread pool in every worker
+    cv2.setNumThreads(1)
+    events_path, checkpoint_path = output_paths(video_path, output_dir)
+    checkpoint = Checkpoint(checkpoint_path)
+
+    state = checkpoint.load(settings)
+    if state is not None and state["status"] == "done":
+        return video_path, "skipped", len(state["events"])
+    if state is None:
+        state = {"video": video_path, "settings": settings, "status": "running", "last_frame": None, "events": []}
+
+    frames_to_skip = settings["frames_to_skip"]
+    start_frame = 0 if state["last_frame"] is None else state["last_frame"] + frames_to_skip + 1
+    if start_frame:
+        logger.info(f"Resuming {video_path} at frame {start_frame} with {len(state['events'])} events")
+
+    matcher = create_matcher(settings["engine"]) if settings["engine"] else None
+    detector = AutoEventDetector(video_path, settings["threshold"], frames_to_skip, matcher=matcher)
+    writer = CheckpointWriter(detector, checkpoint, state, checkpoint_interval)
+    detector.subscribe(writer)
+    try:
+        detector.detect(start_frame)
+    except Exception:
+        logger.exception(f"Failed to process {video_path}")
+        writer.flush()
+        return video_path, "failed", len(state["events"])
+
+    writer.flush()
+    # A resumed scan only saw part of the video, so the intervals are rebuilt from all the hits
+    intervals = intervals_from_detections(state["events"], threshold=settings["threshold"])
+    write_detections(state["events"], events_path, video_path, detector.fps, 'json', intervals)
+    state["status"] = "done"
+    checkpoint.save(state)
+    return video_path, "done", len(state["events"])
+
+
+def run_batch(source, output_dir, threshold=0.8, frames_to_skip=0, engine=None, num_processes=None, checkpoint_interval=30.0):
+    """
+    Process every video of a directory or manifest across a pool of workers.
+
+    :return: A list of (video_path, status, number of detections), one per video.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    videos = find_videos(source)
+    settings = {"threshold": threshold, "frames_to_skip": frames_to_skip, "engine": engine}
+    tasks = [(video_path, output_dir, settings, checkpoint_interval) for video_path in videos]
+    num_processes = min(num_processes or cpu_count(), max(1, len(tasks)))
+    logger.info(f"Processing {len(tasks)} videos on {num_processes} processes")
+
+    results = []
+    with Pool(num_processes) as pool:
+        for result in pool.imap_unordered(process_video, tasks):
+            logger.info(f"{result[0]}: {result[1]} ({result[2]} detections)")
+            results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect events in a batch of videos with resumable checkpoints.")
+    parser.add_argument("source", help="Directory of videos, or a manifest (.json list or one path per line).")
+    parser.add_argument("-o", "--output-dir", required=True, help="Directory for the event files and checkpoints.")
+    parser.add_argument("--threshold", type=float, default=0.8, help="Minimum match score.")
+    parser.add_argument("--skip", type=int, default=0, help="Frames to skip between scanned frames.")
+    parser.add_argument("--engine", choices=sorted(MATCHERS), help="Template matching engine.")
+    parser.add_argument("--processes", type=int, help="Number of worker processes (default: one per core).")
+    parser.add_argument("--checkpoint-interval", type=float, default=30.0, help="Seconds between checkpoints.")
+    args = parser.parse_args()
+
+    run_batch(args.source, args.output_dir, args.threshold, args.skip, args.engine, args.processes, args.checkpoint_interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,9 @@ import cv2
 import os
 
 class ClipExtractor:
-    def __init__(self, video_path):
+    def __init__(self, video_path, output_dir="clips"):
         self.video_path = video_path
+        self.output_dir = output_dir
 
     def extract_clip(self, start_time, end_time, event_type):
         cap = cv2.VideoCapture(self.video_path)
@@ -14,7 +15,7 @@ class ClipExtractor:
         fourcc = cv2.VideoWriter_fourcc(*'h264')
         
         # Create a directory for each event type inside the clips directory
-        event_dir = os.path.join("clips", event_type)
+        event_dir = os.path.join(self.output_dir, event_type)
         os.makedirs(event_dir, exist_ok=True)
         
         # Determine the next clip number for the given event type
@@ -47,3 +48,7 @@ class ClipExtractor:
         cap.release()
         out.release()
         return output_path
+
+    def extract_clips(self, intervals):
+        # Extract one clip per detected event interval (start_ms, end_ms, event_type, ...)
+        return [self.extract_clip(interval[0], interval[1], interval[2]) for interval in intervals]
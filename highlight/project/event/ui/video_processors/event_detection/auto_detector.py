@@ -1,95 +1,392 @@
 # Import necessary libraries and modules
 import cv2  # OpenCV library for computer vision tasks
 import json  # Library to work with JSON data
-from ..event_detector import detect_all_events  # Import the function to detect all events
+from ..event_detector import score_all_events, get_detector_pool  # Import the function to score all events
 from ..event_detection.regions.center_roi import get_center_roi  # Import the function to get the center region of interest
+from ..event_detection.events.down_event import DOWN_SCALES  # Template scales searched by the down detector
+from ..event_detection.events.shield_break import SHIELD_BREAK_SCALES  # Template scales searched by the shield break detector
+from ..event_detection.scale_tracker import ScaleTracker, ScaleStatsStore  # Learned template scales per resolution
+from ..event_detection.frame_context import FrameContext  # Shared per-frame ROI cache
+from ..event_detection.frame_source import ThreadedFrameSource  # Decode-ahead frame reader
+from ..event_detection.event_intervals import EventAggregator  # Merges per-frame hits into event intervals
+from ..event_detection.scan_schedule import plan_dense_windows  # Dense re-scan windows of the adaptive scan
+from ..event_detection.change_gate import ChangeGate  # Skips detectors on unchanged ROIs
+from ..event_detection.score_timeline import TimelineRecorder  # Per-frame scores of a scan
+from ..event_detection.result_cache import ResultCache  # Scans already done with the same video and settings
+from ..event_detection.scan_schedule import DEFAULT_SCAN_POLICIES  # Default adaptive scan policies
+from ..event_detection.template_manager import TemplateManager  # Template digests for the timeline key
+from ..event_detection.matching import get_default_matcher  # Default matching engine
+from ..event_detection.detector_registry import DetectorScheduler, default_detectors, get_detector  # Registered detectors
+from ..event_detection.roi_preprocessing import RoiPreprocessing  # Preprocessing of the detectors' ROIs only
 import logging  # Library for logging information
 
 # Set the logging level to INFO to display informational messages
 logging.basicConfig(level=logging.INFO)
 
+# Colors used to draw each event type in the preview
+EVENT_COLORS = {
+    "down_event": (255, 0, 0),
+    "shield_break_event": (0, 0, 255),
+    "kill_event": (0, 255, 255),
+}
+
+# Define the preview window, an optional subscriber of the detection loop
+class PreviewWindow:
+    """Draw the ROI and the detections on each frame and show it with cv2.imshow."""
+
+    def __init__(self, delay_ms=30):
+        # Milliseconds to wait for a key press after each frame
+        self.delay_ms = delay_ms
+
+    def __call__(self, frame_number, timestamp_ms, context, events):
+        frame = context.frame
+
+        # Draw a green rectangle around the region of interest
+        _, top_left, bottom_right = get_center_roi(context)
+        cv2.rectangle(frame, top_left, bottom_right, (0, 255, 0), 2)
+
+        # Draw a rectangle on every detected event
+        for event_type, event_top_left in events.items():
+            event_bottom_right = (event_top_left[0] + 50, event_top_left[1] + 50)
+            cv2.rectangle(frame, event_top_left, event_bottom_right, EVENT_COLORS.get(event_type, (255, 255, 255)), 2)
+
+        # Display the frame; pressing 'q' stops the scan
+        cv2.imshow('Video Playback', frame)
+        return cv2.waitKey(self.delay_ms) & 0xFF == ord('q')
+
+    def close(self):
+        cv2.destroyAllWindows()
+
 # Define the AutoEventDetector class
 class AutoEventDetector:
     # Constructor method to initialize the class
-    def __init__(self, video_path, threshold=0.8, frames_to_skip=0):
+    def __init__(self, video_path, threshold=0.8, frames_to_skip=0, skip_mode='auto', matcher=None, rules=None,
+                 change_threshold=None, cache=True, detectors=None, detector_threads=0, preprocessing=None):
         # Store the video path, threshold, and frames to skip as class attributes
         self.video_path = video_path
         self.threshold = threshold
         self.frames_to_skip = frames_to_skip
+        # How skipped frames are passed over: 'grab', 'seek', or 'auto' to pick the cheaper one as measured
+        self.skip_mode = skip_mode
+        # Matching engine for the template detectors (None uses the module default)
+        self.matcher = matcher
+        # Callables notified after every processed frame; see subscribe()
+        self.subscribers = []
+        # Frame rate of the video, known once detect() has opened it
+        self.fps = None
+        # Detections of the current or last scan, filled in as detect() runs
+        self.detections = []
+        # Per event type EventRules (hysteresis, minimum duration, cooldown); None uses the defaults
+        self.rules = rules
+        # Event intervals of the last scan, see EventInterval
+        self.intervals = []
+        # Gray level difference (see ChangeGate) below which a detector's ROI counts as unchanged; None runs every detector on every frame
+        self.change_threshold = change_threshold
+        self.gates = {}
+        # Result cache of complete scans (True for the default ResultCache, None to disable), and the ScoreTimeline of the last one
+        self.cache = ResultCache() if cache is True else cache
+        self.timeline = None
+        # Names of the registered detectors to run (see detector_registry); None runs the default ones
+        self.detectors = list(detectors) if detectors is not None else default_detectors()
+        # Runs the expensive detectors at their minimum frame rate only; recreated for every scan
+        self.scheduler = None
+        # Threads the detectors of a frame are spread over (0 runs them one after the other on the scan thread)
+        self.detector_threads = detector_threads
+        # Preprocessing settings per detector name, over the ones the detectors declare; run on their ROIs only
+        specs = [get_detector(name) for name in self.detectors]
+        settings = {spec.name: spec.preprocessing for spec in specs}
+        unknown = set(preprocessing or {}) - set(self.detectors)
+        if unknown:
+            raise ValueError(f"Preprocessing given for detectors that don't run: {', '.join(sorted(unknown))}")
+        settings.update(preprocessing or {})
+        self.preprocessing = RoiPreprocessing(settings, {spec.name: spec.roi for spec in specs})
+
+    # Method to register a per-frame callback
+    def subscribe(self, subscriber):
+        """
+        Call ``subscriber(frame_number, timestamp_ms, context, events)`` after every processed frame.
+
+        ``events`` maps the detected event types to their locations. The scan
+        stops when a subscriber returns True.
+        """
+        self.subscribers.append(subscriber)
+
+    # Method to remove a per-frame callback
+    def unsubscribe(self, subscriber):
+        self.subscribers.remove(subscriber)
+
+    # Method to create one scale tracker per template matching detector
+    def create_scale_trackers(self, width, height):
+        resolution = f"{width}x{height}"
+        store = ScaleStatsStore.for_video(self.video_path)
+        return {
+            "down_event": ScaleTracker("center_down_icon", DOWN_SCALES, resolution, store, confidence=self.threshold),
+            "shield_break_event": ScaleTracker("shield_break", SHIELD_BREAK_SCALES, resolution, store, confidence=self.threshold),
+        }
+
+    # Method to scan the whole video without any display
+    def detect(self, start_frame=0, end_frame=None, save_scales=True):
+        """
+        Run every detector over the video as fast as decoding and matching allow.
+
+        :param start_frame: First frame to scan.
+        :param end_frame: Frame to stop before, or None to scan to the end.
+        :param save_scales: Whether to persist the learned template scales afterwards.
+        :return: A list of detections, one dict per event and frame with the frame
+                 number, time in milliseconds, event type, location and score.
+                 The hits merged into EventIntervals are kept in ``self.intervals``.
+        """
+        # Open the video file; frames are decoded on a background thread while we run detection
+        source = self.open_source(self.frames_to_skip + 1, start_frame, end_frame)
+        # Track the template scales that produce confident hits, starting from earlier runs at this resolution
+        scale_trackers = self.create_scale_trackers(source.width, source.height)
+
+        self.detections = []
+        # Merge the per-frame scores into one interval per on-screen event
+        aggregator = EventAggregator(self.rules, self.threshold, (self.frames_to_skip + 1) * 1000.0 / self.fps)
+        # Keep the raw scores so the threshold can be changed later without rescanning
+        recorder = TimelineRecorder()
+        stopped = False
+        try:
+            # Loop through each decoded frame of the video (frames_to_skip frames are skipped in between)
+            for frame_number, timestamp_ms, context, matches in self.score_frames(source, scale_trackers):
+                recorder.add(frame_number, matches)
+                for interval in aggregator.update(timestamp_ms, matches):
+                    self.report(interval)
+                if self.record(frame_number, timestamp_ms, context, matches):
+                    stopped = True
+                    break
+        finally:
+            # Report how well decoding kept ahead of detection
+            logging.info(f"Frame source metrics: {source.metrics()}")
+            source.close()
+            self.finish(aggregator, scale_trackers if save_scales else {})
+
+        # Only a scan of the whole video is worth keeping
+        if not stopped and start_frame == 0 and end_frame is None:
+            self.store_timeline(recorder, self.frames_to_skip + 1, self.full_scan())
+        return self.detections
+
+    # Method to scan sparsely and only look at every frame around likely events
+    def detect_adaptive(self, coarse_stride=10, policies=None, save_scales=True):
+        """
+        Scan every ``coarse_stride``-th frame, then re-scan frame by frame around the
+        samples whose score reaches their event type's ScanPolicy interest level.
+
+        Frames outside those windows are only matched once per stride, while the
+        event boundaries are still found to the frame. Subscribers see the coarse
+        pass first and then each dense window, so frames don't arrive in order.
+
+        :return: The detections, as for detect(); the intervals are in ``self.intervals``.
+        """
+        source = self.open_source(coarse_stride)
+        scale_trackers = self.create_scale_trackers(source.width, source.height)
+        self.detections = []
+        aggregator = EventAggregator(self.rules, self.threshold, coarse_stride * 1000.0 / self.fps)
+        recorder = TimelineRecorder()
+        samples = recorder.rows
+        stopped = False
+        try:
+            # Coarse pass: cheap scores over the whole video
+            for frame_number, timestamp_ms, context, matches in self.score_frames(source, scale_trackers):
+                recorder.add(frame_number, matches)
+                if self.notify(frame_number, timestamp_ms, context, self.threshold_events(matches)):
+                    stopped = True
+                    break
+            logging.info(f"Frame source metrics: {source.metrics()}")
+            source.close()
+
+            # Dense pass over the neighbourhood of every interesting sample
+            windows = [] if stopped else plan_dense_windows(sorted(samples.items()), coarse_stride, policies, source.frame_count or None)
+            dense_frames = 0
+            for start, end in windows:
+                source = self.open_source(1, start, end)
+                for frame_number, timestamp_ms, context, matches in self.score_frames(source, scale_trackers):
+                    recorder.add(frame_number, matches)
+                    dense_frames += 1
+                    if self.notify(frame_number, timestamp_ms, context, self.threshold_events(matches)):
+                        stopped = True
+                        break
+                logging.info(f"Frame source metrics: {source.metrics()}")
+                source.close()
+                if stopped:
+                    break
+            logging.info(f"Adaptive scan: {len(samples) - dense_frames} coarse and {dense_frames} dense frames "
+                         f"in {len(windows)} windows")
+
+            # Build the detections and intervals from all scored frames in time order
+            for frame_number in sorted(samples):
+                timestamp_ms = frame_number * 1000.0 / self.fps
+                for interval in aggregator.update(timestamp_ms, samples[frame_number]):
+                    self.report(interval)
+                self.collect(frame_number, timestamp_ms, samples[frame_number])
+        finally:
+            source.close()
+            self.finish(aggregator, scale_trackers if save_scales else {})
+
+        if not stopped:
+            self.store_timeline(recorder, coarse_stride, self.adaptive_scan(coarse_stride, policies))
+        return self.detections
+
+    # Methods describing a scan, for the cache key
+    def full_scan(self):
+        return {"scan": "full", "stride": self.frames_to_skip + 1}
+
+    def adaptive_scan(self, coarse_stride=10, policies=None):
+        policies = dict(DEFAULT_SCAN_POLICIES, **(policies or {}))
+        return {"scan": "adaptive", "stride": coarse_stride,
+                "policies": {name: vars(policy) for name, policy in sorted(policies.items())}}
+
+    # Method to describe everything that affects the per-frame scores
+    def timeline_config(self, scan):
+        matcher = self.matcher or get_default_matcher()
+        return dict(scan, **{
+            "detectors": self.detectors,
+            "templates": {spec.templates: TemplateManager.instance().digest(spec.templates)
+                          for spec in map(get_detector, self.detectors) if spec.templates},
+            "matcher": type(matcher).__name__,
+            "matcher_options": {key: value for key, value in vars(matcher).items() if isinstance(value, (int, float, str, bool))},
+            "change_threshold": self.change_threshold,
+            "roi_preprocessing": self.preprocessing.config(),
+        })
+
+    # Method to keep the per-frame scores of a complete scan
+    def store_timeline(self, recorder, stride, scan):
+        config = self.timeline_config(scan)
+        self.timeline = recorder.build(self.fps, stride * 1000.0 / self.fps, config)
+        if self.cache is not None:
+            events = {"threshold": self.threshold, "detections": self.detections,
+                      "intervals": [interval._asdict() for interval in self.intervals]}
+            path = self.cache.put(self.video_path, config, self.timeline, events)
+            logging.info(f"Cached score timeline of {len(self.timeline)} frames in {path}")
+
+    # Method to reuse an earlier scan of the same video with the same settings
+    def load_cached(self, scan=None):
+        """
+        Load the result of an earlier identical scan from the cache.
+
+        :param scan: The scan description (full_scan() by default, or adaptive_scan(...)).
+        :return: True on a cache hit, with the detections and intervals re-thresholded
+                 at the current threshold; False when the video has to be scanned.
+        """
+        if self.cache is None:
+            return False
+        entry = self.cache.get(self.video_path, self.timeline_config(scan or self.full_scan()))
+        if entry is None:
+            return False
+        logging.info(f"Using cached detection results from {entry.path}")
+        self.timeline = entry.timeline
+        self.fps = entry.timeline.fps
+        self.rethreshold(self.threshold)
+        return True
+
+    # Method to re-threshold the last complete scan without touching the video
+    def rethreshold(self, threshold):
+        """Change the threshold and rebuild the detections and intervals from the stored timeline."""
+        self.threshold = threshold
+        if self.timeline is not None:
+            self.detections = self.timeline.detections(threshold)
+            self.intervals = self.timeline.intervals(threshold, self.rules)
+        return self.intervals
+
+    # Method to open the video with the decode-ahead reader
+    def open_source(self, stride, start_frame=0, end_frame=None):
+        source = ThreadedFrameSource(self.video_path, stride=stride, skip_mode=self.skip_mode,
+                                     start_frame=start_frame, end_frame=end_frame)
+        if self.fps is None:
+            logging.info(f"Video resolution: {source.width}x{source.height}")
+        self.fps = source.fps or 30.0
+        return source
+
+    # Method to create one change gate per detector, keyed like the scale trackers
+    def create_gates(self):
+        if self.change_threshold is None:
+            return {}
+        return {name: ChangeGate(get_detector(name).roi, self.change_threshold) for name in self.detectors}
+
+    # Method to set up the per-scan detector state (change gates, scheduler)
+    def prepare_scan(self):
+        if not self.gates:
+            self.gates = self.create_gates()
+        if self.scheduler is None:
+            self.scheduler = DetectorScheduler(self.fps)
+
+    # Method to score one frame; prepare_scan() must have been called
+    def score_frame(self, frame_number, frame, scale_trackers):
+        executor = get_detector_pool(self.detector_threads) if self.detector_threads else None
+        # Score every detector on the full frame; the detectors crop their own ROIs from the shared context
+        context = FrameContext(frame, frame_number)
+        matches = score_all_events(context, scale_trackers, self.matcher, self.gates, self.detectors, self.scheduler,
+                                   executor, self.preprocessing)
+        return frame_number, frame_number * 1000.0 / self.fps, context, matches
+
+    # Generator that scores every frame of a source
+    def score_frames(self, source, scale_trackers):
+        self.prepare_scan()
+        for frame_number, frame in source:
+            yield self.score_frame(frame_number, frame, scale_trackers)
+
+    # Method to keep the matches that pass the threshold
+    def threshold_events(self, matches):
+        return {event_type: match.location for event_type, match in matches.items() if match.score > self.threshold}
+
+    # Method to add the detections of one frame
+    def collect(self, frame_number, timestamp_ms, matches):
+        events = self.threshold_events(matches)
+        for event_type, location in events.items():
+            self.detections.append({
+                "frame": frame_number,
+                "time_ms": round(timestamp_ms, 3),
+                "event_type": event_type,
+                "location": [int(value) for value in location],
+                "score": round(float(matches[event_type].score), 4),
+            })
+        return events
+
+    # Method to call every subscriber, returning True if any of them asks to stop
+    def notify(self, frame_number, timestamp_ms, context, events):
+        return True in [subscriber(frame_number, timestamp_ms, context, events) for subscriber in self.subscribers]
+
+    # Method to collect the detections of one frame and notify the subscribers
+    def record(self, frame_number, timestamp_ms, context, matches):
+        return self.notify(frame_number, timestamp_ms, context, self.collect(frame_number, timestamp_ms, matches))
+
+    # Method to wrap up a scan
+    def finish(self, aggregator, scale_trackers):
+        # Close the events still on screen when the scan stopped
+        for interval in aggregator.close():
+            self.report(interval)
+        self.intervals = aggregator.finish()
+
+        # Save the learned scales so later runs start already narrowed
+        for tracker in scale_trackers.values():
+            tracker.save()
+
+        # Report how often the change gates saved a detector run, to tune change_threshold
+        for event_type, gate in self.gates.items():
+            logging.info(f"Change gate for {event_type}: {gate.stats()}")
+        self.gates = {}
+
+        # Report how often each detector actually ran, and what it cost
+        if self.scheduler is not None:
+            for event_type, stats in self.scheduler.stats().items():
+                logging.info(f"Detector {event_type}: {stats}")
+            self.scheduler = None
 
+    # Method to print one detected event
+    def report(self, interval):
+        start = int(interval.start_ms // 1000)
+        end = int(interval.end_ms // 1000)
+        print(f"Event detected at {start // 60}:{start % 60:02} - {end // 60}:{end % 60:02} "
+              f"({interval.event_type}, peak {interval.peak_score:.2f})")
 
     # Method to play and process the video
     def play_video(self):
-        # Open the video file
-        cap = cv2.VideoCapture(self.video_path)
-        # Print video resolution
-        print(f"Video resolution: {cap.get(cv2.CAP_PROP_FRAME_WIDTH)}x{cap.get(cv2.CAP_PROP_FRAME_HEIGHT)}")   
-        # Get the frame rate of the video
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        # Initialize the frame number to 0
-        frame_number = 0
-
-        # Loop through each frame of the video
-        while cap.isOpened():
-            # Increment the frame number
-            frame_number += 1
-            # Read the next frame from the video
-            ret, frame = cap.read()
-            print("auto_detector.py: frame read")
-            # If there's no frame left, exit the loop
-            if not ret:
-                break
-
-            # Extract the region of interest from the frame
-            _, top_left, bottom_right = get_center_roi(frame)
-            roi = frame[top_left[1]:bottom_right[1], top_left[0]:bottom_right[0]]
-
-
-            # Draw a green rectangle around the region of interest on the frame
-            cv2.rectangle(frame, top_left, bottom_right, (0, 255, 0), 2)
-
-            # Detect events in the frame
-            events = detect_all_events(roi, self.threshold)
-
-            # If a "down_event" is detected, draw a blue rectangle on the frame
-            if "down_event" in events:
-                event_top_left = events["down_event"]
-                event_bottom_right = (event_top_left[0] + 50, event_top_left[1] + 50)
-                cv2.rectangle(frame, event_top_left, event_bottom_right, (255, 0, 0), 2)
-
-                # Print the timestamp of the detected event
-                timestamp = frame_number / fps
-                minutes = int(timestamp // 60)
-                seconds = int(timestamp % 60)
-                print(f"Event detected at {minutes}:{seconds:02}")
-
-            if "shield_break_event" in events:
-                event_top_left = events["shield_break_event"]
-                event_bottom_right = (event_top_left[0] + 50, event_top_left[1] + 50)
-                cv2.rectangle(frame, event_top_left, event_bottom_right, (0, 0, 255), 2)
-
-                # Print the timestamp of the detected event
-                timestamp = frame_number / fps
-                minutes = int(timestamp // 60)
-                seconds = int(timestamp % 60)
-                print(f"Event detected at {minutes}:{seconds:02}")
-
-            # Display the frame
-            cv2.imshow('Video Playback', frame)
-         #   print(f"Frame {frame_number}")
-            if frame.shape != (1080, 1920, 3):
-                print(f"Warning: Frame {frame_number} has unexpected dimensions: {frame.shape}")
-
-            # If frames are being skipped, jump to the specified frame number
-            if self.frames_to_skip > 0:
-                frame_number += self.frames_to_skip
-                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
-         #       print(f"Jumped to frame {frame_number}")
-
-            # If the 'q' key is pressed, exit the loop
-            if cv2.waitKey(30) & 0xFF == ord('q'):
-                break
-
-        # Release the video capture object and close all OpenCV windows
-        cap.release()
-        cv2.destroyAllWindows()
\ No newline at end of file
+        # The interactive preview is just a subscriber of the same detection loop
+        preview = PreviewWindow()
+        self.subscribe(preview)
+        try:
+            return self.detect()
+        finally:
+            self.unsubscribe(preview)
+            preview.close()
@@ -0,0 +1,150 @@
+# benchmark.py
+#
+# Compare the template matching engines on ROI-sized inputs, or the per-frame and
+# batched preprocessing paths.
+# Run from the ui directory:
+#     python -m video_processors.event_detection.benchmark --templates 1 4 8
+#     python -m video_processors.event_detection.benchmark --preprocessing settings.json --batch-size 32 --roi-size 30x30 190x150
+
+import argparse
+import json
+import time
+import cv2
+import numpy as np
+
+from .matching import ExhaustiveMatcher, MATCHERS, create_matcher, results_agree
+from .template_manager import TemplateManager
+from .template_pyramid import TemplatePyramid
+from .events.down_event import DOWN_SCALES
+from .preprocessing_pipeline import PreprocessingPipeline, stack_frames
+
+# Preprocessing benchmarked when no settings file is given
+DEFAULT_BENCHMARK_SETTINGS = {
+    "normalize_image": {},
+    "reduce_noise": {"kernel_size": 5},
+    "adaptive_histogram_equalization": {},
+    "adaptive_thresholding": {"block_size": 11, "C_value": 2},
+    "morphological_closing": {},
+}
+
+
+def make_synthetic_templates(count, size=(50, 48), seed=0):
+    """Return ``count`` smooth random BGR templates of the given (height, width)."""
+    rng = np.random.default_rng(seed)
+    return [cv2.GaussianBlur(rng.integers(0, 256, size + (3,), dtype=np.uint8), (5, 5), 0) for _ in range(count)]
+
+
+def make_frames(templates, scales, roi_shape, count, seed=1):
+    """Return ``count`` noisy ROIs, each with one scaled template pasted at a random position."""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(count):
+        roi = cv2.GaussianBlur(rng.integers(0, 256, roi_shape, dtype=np.uint8), (5, 5), 0)
+        template = templates[rng.integers(len(templates))]
+        scale = scales[rng.integers(len(scales))]
+        width = int(template.shape[1] * scale / 100)
+        height = int(template.shape[0] * scale / 100)
+        if 0 < height <= roi_shape[0] and 0 < width <= roi_shape[1]:
+            y = rng.integers(roi_shape[0] - height + 1)
+            x = rng.integers(roi_shape[1] - width + 1)
+            roi[y:y + height, x:x + width] = cv2.resize(template, (width, height))
+        frames.append(roi)
+    return frames
+
+
+def benchmark_matchers(templates, scales=DOWN_SCALES, roi_shape=(190, 150, 3), frames=20, engines=None):
+    """
+    Time every matching engine on the same frames.
+
+    :return: A dict mapping engine name to (milliseconds per frame, fraction of
+             frames agreeing with the exhaustive OpenCV loop).
+    """
+    pyramid = TemplatePyramid(templates, scales, roi_shape)
+    inputs = make_frames(templates, scales, roi_shape, frames)
+    reference = [ExhaustiveMatcher().match(roi, pyramid) for roi in inputs]
+
+    results = {}
+    for name in engines or MATCHERS:
+        matcher = create_matcher(name)
+        # Warm up once so one-off precomputation isn't counted per frame
+        matcher.match(inputs[0], pyramid)
+        start = time.perf_counter()
+        matches = [matcher.match(roi, pyramid) for roi in inputs]
+        elapsed = time.perf_counter() - start
+        agreement = sum(results_agree(match, ref) for match, ref in zip(matches, reference)) / len(inputs)
+        results[name] = (elapsed * 1000 / len(inputs), agreement)
+    return results
+
+
+def benchmark_preprocessing(settings, roi_shape=(290, 240, 3), batch_size=32, batches=5):
+    """
+    Time a preprocessing pipeline frame by frame and in batches on the same crops.
+
+    :return: (per-frame milliseconds per crop, batched milliseconds per crop,
+             whether both paths produced the pixels of the unfused steps).
+    """
+    crops = make_frames(make_synthetic_templates(3), DOWN_SCALES, roi_shape, batch_size)
+    stack = stack_frames(crops)
+    per_frame = PreprocessingPipeline(settings)
+    batched = PreprocessingPipeline(settings)
+    reference = PreprocessingPipeline(settings, fuse=False)
+    expected = np.stack([reference.apply(crop).copy() for crop in crops])
+    # Warm up once so the buffer allocation isn't counted
+    identical = (np.array_equal(expected, np.stack([per_frame.apply(crop).copy() for crop in crops]))
+                 and np.array_equal(expected, batched.apply_batch(stack)))
+
+    start = time.perf_counter()
+    for _ in range(batches):
+        for crop in crops:
+            per_frame.apply(crop)
+    frame_ms = (time.perf_counter() - start) * 1000 / (batches * batch_size)
+
+    start = time.perf_counter()
+    for _ in range(batches):
+        batched.apply_batch(stack_frames(crops, stack))
+    batch_ms = (time.perf_counter() - start) * 1000 / (batches * batch_size)
+    return frame_ms, batch_ms, identical
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the template matching engines.")
+    parser.add_argument("--templates", type=int, nargs="+", default=[1, 3, 6, 10], help="Template counts to test.")
+    parser.add_argument("--event-type", help="Use the real templates of this event type instead of synthetic ones.")
+    parser.add_argument("--frames", type=int, default=20, help="Frames per measurement.")
+    parser.add_argument("--preprocessing", nargs="?", const="", help="Benchmark preprocessing instead, with the settings "
+                                                                       "of this JSON file (default: a typical chain).")
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[8, 32, 128], help="Batch sizes for --preprocessing.")
+    parser.add_argument("--roi-size", nargs="+", default=["290x240"], help="Crop sizes (HEIGHTxWIDTH) for --preprocessing.")
+    args = parser.parse_args()
+
+    if args.preprocessing is not None:
+        settings = DEFAULT_BENCHMARK_SETTINGS
+        if args.preprocessing:
+            with open(args.preprocessing) as file:
+                settings = json.load(file)
+        steps = PreprocessingPipeline(settings).steps
+        print(f"Steps: {', '.join(step.name + (' (whole batch)' if step.vectorized else '') for step in steps)}")
+        for roi_size in args.roi_size:
+            height, width = (int(side) for side in roi_size.split("x"))
+            for batch_size in args.batch_size:
+                frame_ms, batch_ms, identical = benchmark_preprocessing(settings, (height, width, 3), batch_size)
+                print(f"  {roi_size:>9} batch {batch_size:>4}: {frame_ms:6.3f} ms/crop per frame, "
+                      f"{batch_ms:6.3f} ms/crop batched{'' if identical else ', OUTPUTS DIFFER'}")
+        return
+
+    for count in args.templates:
+        if args.event_type:
+            templates = TemplateManager.instance().get_templates(args.event_type)[:count]
+        else:
+            templates = make_synthetic_templates(count)
+        if not templates:
+            print(f"No templates found for {args.event_type}.")
+            return
+        pyramid = TemplatePyramid(templates, DOWN_SCALES, (190, 150, 3))
+        print(f"{len(templates)} templates, {len(pyramid)} pyramid entries:")
+        for name, (milliseconds, agreement) in benchmark_matchers(templates, frames=args.frames).items():
+            print(f"  {name:>15}: {milliseconds:8.2f} ms/frame, {agreement * 100:5.1f}% agree with OpenCV loop")
+
+
+if __name__ == "__main__":
+    main()
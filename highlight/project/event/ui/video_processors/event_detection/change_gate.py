@@ -0,0 +1,86 @@
+# change_gate.py
+
+import functools
+import cv2
+from .frame_context import FrameContext
+
+
+class ChangeGate:
+    """
+    Skip a detector while its ROI looks the same as when the detector last ran.
+
+    The ROI is reduced to a tiny grayscale signature (see FrameContext.signature)
+    and compared with the signature of the last frame the detector actually ran
+    on, so slow drift still adds up and triggers a run. When no cell of the
+    signature moved by more than ``threshold`` gray levels the previous result is
+    returned; the largest cell difference is used rather than the mean so a small
+    icon appearing in a large ROI isn't averaged away. ``max_skips`` forces a run
+    after that many skips in a row.
+    """
+
+    def __init__(self, roi_name, threshold=8.0, signature_size=(16, 16), max_skips=None):
+        self.roi_name = roi_name
+        self.threshold = threshold
+        self.signature_size = signature_size
+        self.max_skips = max_skips
+        self.reset()
+
+    def reset(self):
+        self.last_signature = None
+        self.last_result = None
+        self.consecutive_skips = 0
+        self.checks = 0
+        self.skips = 0
+
+    def changed(self, context):
+        """Return whether the ROI changed enough since the last run to run the detector again."""
+        signature = context.signature(self.roi_name, self.signature_size)
+        if self.last_signature is None or self.last_signature.shape != signature.shape:
+            return True
+        if self.max_skips is not None and self.consecutive_skips >= self.max_skips:
+            return True
+        return cv2.norm(signature, self.last_signature, cv2.NORM_INF) > self.threshold
+
+    def run(self, detector, frame, *args, **kwargs):
+        """Call ``detector(context, *args, **kwargs)`` unless the ROI is unchanged, and return its (possibly cached) result."""
+        context = FrameContext.wrap(frame)
+        self.checks += 1
+        if self.changed(context):
+            self.last_result = detector(context, *args, **kwargs)
+            self.last_signature = context.signature(self.roi_name, self.signature_size)
+            self.consecutive_skips = 0
+        else:
+            self.skips += 1
+            self.consecutive_skips += 1
+        return self.last_result
+
+    @property
+    def skip_ratio(self):
+        return self.skips / self.checks if self.checks else 0.0
+
+    def stats(self):
+        return {"roi": self.roi_name, "checks": self.checks, "skips": self.skips, "skip_ratio": round(self.skip_ratio, 3)}
+
+
+def gated(detector, roi_name, gate=None, **gate_options):
+    """
+    Wrap a detector that takes a frame (or FrameContext) first so it only runs when its ROI changes.
+
+    For example::
+
+        detect = gated(detect_down_event, 'center')
+        notification = KillNotificationText()
+        notification.detect_kill_notification_event = gated(notification.detect_kill_notification_event, 'kill_notification')
+        counter = KillCounter()
+        counter.detect_kill_event = gated(counter.detect_kill_event, 'kill_counter')
+
+    The ChangeGate is available as ``wrapped.gate`` to read its skip ratio.
+    """
+    gate = gate or ChangeGate(roi_name, **gate_options)
+
+    @functools.wraps(detector)
+    def wrapped(frame, *args, **kwargs):
+        return gate.run(detector, frame, *args, **kwargs)
+
+    wrapped.gate = gate
+    return wrapped
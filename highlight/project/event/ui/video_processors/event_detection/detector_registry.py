@@ -0,0 +1,192 @@
+# detector_registry.py
+
+import bisect
+import re
+import time
+from .matching import MatchResult, NO_MATCH
+from .events.down_event import match_down_event
+from .events.shield_break import match_shield_break_event
+from .events.kill_event import KillEvent
+
+# Detectors at or below this estimated cost run on every scanned frame
+EVERY_FRAME_COST = 5.0
+
+# One kill feed line as OCR reads it: two player names around a kill verb, or around
+# the few symbols the weapon icon between them comes out as
+KILL_FEED_LINE = re.compile(r'^\s*[\w.\-]{3,16}\s*(?:[^\w\s]{1,4}|\b(?:killed|knocked(?: down)?|downed|eliminated)\b)\s*[\w.\-]{3,16}\s*$',
+                            re.IGNORECASE | re.MULTILINE)
+
+
+class DetectorSpec:
+    """
+    A registered detector.
+
+    :param name: Event type the detector reports, used as its key everywhere.
+    :param roi: Name of the ROI (see roi_registry) the detector reads.
+    :param score: ``score(context, matcher=None, scale_tracker=None, state=None)`` returning a
+                  MatchResult in frame coordinates (NO_MATCH when nothing was found).
+                  ``state`` is a dict the detector keeps between the frames of one
+                  scan (see DetectorScheduler.state); it is empty on every call when
+                  no scheduler is used.
+    :param cost: Estimated milliseconds per 1080p frame.
+    :param min_fps: Lowest rate the detector still catches its events at; expensive
+                    detectors are only run this often.
+    :param templates: Template folder the detector matches, for cache keys.
+    :param default: Whether the detector runs when no detector list is given.
+    :param preprocessing: Preprocessing settings (see PreprocessingHandler) applied
+                          to the detector's ROI before it reads it, or None.
+    """
+
+    def __init__(self, name, roi, score, cost=1.0, min_fps=None, templates=None, default=False, preprocessing=None):
+        self.name = name
+        self.roi = roi
+        self.score = score
+        self.cost = cost
+        self.min_fps = min_fps
+        self.templates = templates
+        self.default = default
+        self.preprocessing = preprocessing
+
+
+# Registered detectors, in the order their results are reported
+DETECTORS = {}
+
+
+def register_detector(name, roi, score, cost=1.0, min_fps=None, templates=None, default=False, preprocessing=None):
+    """Register a detector (see DetectorSpec), replacing any detector of the same name."""
+    DETECTORS[name] = DetectorSpec(name, roi, score, cost, min_fps, templates, default, preprocessing)
+    return DETECTORS[name]
+
+
+def get_detector(name):
+    if name not in DETECTORS:
+        raise KeyError(f"Unknown detector '{name}'. Registered detectors: {', '.join(DETECTORS)}")
+    return DETECTORS[name]
+
+
+def default_detectors():
+    """Return the names of the detectors run by default, in registration order."""
+    return [name for name, spec in DETECTORS.items() if spec.default]
+
+
+class DetectorScheduler:
+    """
+    Decide which detectors run on a frame.
+
+    Detectors whose estimated cost is at most ``every_frame_cost`` (or that have
+    no ``min_fps``) run on every frame. The others run once every 1/min_fps
+    seconds of video, and their last result is reused in between. The measured
+    time of every detector is kept to check the cost estimates.
+
+    A scheduler lives for one scan, so it also holds the state the detectors keep
+    between frames; nothing carries over to the next scan or video.
+    """
+
+    def __init__(self, fps, every_frame_cost=EVERY_FRAME_COST):
+        self.fps = fps or 30.0
+        self.every_frame_cost = every_frame_cost
+        self.states = {}
+        self.last_run_ms = {}
+        self.last_result = {}
+        self.runs = {}
+        self.skips = {}
+        self.seconds = {}
+
+    def due(self, spec, timestamp_ms):
+        if spec.min_fps is None or spec.cost <= self.every_frame_cost:
+            return True
+        last = self.last_run_ms.get(spec.name)
+        # Frames of an adaptive scan can go back in time; always run then
+        return last is None or timestamp_ms < last or timestamp_ms - last >= 1000.0 / spec.min_fps - 0.5
+
+    def state(self, name):
+        """Return the dict detector ``name`` keeps between the frames of this scan."""
+        return self.states.setdefault(name, {})
+
+    def run(self, spec, frame_number, detector):
+        """Call ``detector()`` if ``spec`` is due at this frame, else return its previous result."""
+        timestamp_ms = frame_number * 1000.0 / self.fps
+        if not self.due(spec, timestamp_ms):
+            self.skips[spec.name] = self.skips.get(spec.name, 0) + 1
+            return self.last_result.get(spec.name, NO_MATCH)
+
+        start = time.perf_counter()
+        result = detector()
+        self.seconds[spec.name] = self.seconds.get(spec.name, 0.0) + time.perf_counter() - start
+        self.runs[spec.name] = self.runs.get(spec.name, 0) + 1
+        self.last_run_ms[spec.name] = timestamp_ms
+        self.last_result[spec.name] = result
+        return result
+
+    def stats(self):
+        """Return the runs, skips and measured milliseconds per run of every detector."""
+        return {name: {"runs": runs, "skips": self.skips.get(name, 0),
+                       "ms_per_run": round(1000.0 * self.seconds[name] / runs, 3)}
+                for name, runs in self.runs.items()}
+
+
+def _score_down(context, matcher=None, scale_tracker=None, state=None):
+    return match_down_event(context, context.frame_number, matcher, scale_tracker)
+
+
+def _score_shield_break(context, matcher=None, scale_tracker=None, state=None):
+    return match_shield_break_event(context, matcher, scale_tracker)
+
+
+def _score_kill(context, matcher=None, scale_tracker=None, state=None):
+    return KillEvent(matcher=matcher).match_kill_event(context)
+
+
+def _roi_origin(context, roi):
+    x_start, y_start, _, _ = context.box(roi)
+    return (x_start, y_start)
+
+
+def _score_kill_notification(context, matcher=None, scale_tracker=None, state=None):
+    # pytesseract is only needed once an OCR detector is actually used; one reader per scan
+    state = {} if state is None else state
+    if 'reader' not in state:
+        from .regions.kill_notification import KillNotificationText
+        state['reader'] = KillNotificationText()
+    detected, _ = state['reader'].detect_kill_notification_event(context)
+    return MatchResult(1.0 if detected else 0.0, _roi_origin(context, 'kill_notification'), None, None)
+
+
+def _score_kill_counter(context, matcher=None, scale_tracker=None, state=None):
+    # Scores 1 when the counter is higher than on the closest earlier frame read in the same scan
+    state = {} if state is None else state
+    if 'reader' not in state:
+        from .regions.kill_counter import KillCounter
+        state['reader'] = KillCounter()
+    count = state['reader'].read_kill_count(context)
+    if count is None:
+        return NO_MATCH
+    # An adaptive scan goes back in time for its dense windows, so the count is
+    # compared with the reading of the closest earlier frame, not the last one read
+    readings = state.setdefault('readings', [])
+    index = bisect.bisect_left(readings, (context.frame_number,))
+    previous_count = readings[index - 1][1] if index else None
+    readings.insert(index, (context.frame_number, count))
+    increased = previous_count is not None and count > previous_count
+    return MatchResult(1.0 if increased else 0.0, _roi_origin(context, 'kill_counter'), None, None)
+
+
+def _score_kill_feed(context, matcher=None, scale_tracker=None, state=None):
+    # Scores 1 while the kill feed shows a kill line; other HUD text and OCR noise score 0
+    state = {} if state is None else state
+    if 'reader' not in state:
+        from .regions.kill_feed_extractor import KillFeedExtractor
+        state['reader'] = KillFeedExtractor()
+    text = state['reader'].extract_text_from_frame(context)
+    return MatchResult(1.0 if KILL_FEED_LINE.search(text) else 0.0, _roi_origin(context, 'kill_feed'), None, None)
+
+
+# Template matchers on the center of the screen, run on every frame
+register_detector("down_event", 'center', _score_down, cost=3.0, templates='center_down_icon', default=True)
+register_detector("shield_break_event", 'center', _score_shield_break, cost=3.0, templates='shield_break', default=True)
+# Single-scale grayscale match around the crosshair
+register_detector("kill_event", 'kill_center', _score_kill, cost=1.0, templates='kill')
+# Tesseract OCR, far too slow for every frame; the HUD text stays up for a second or more
+register_detector("kill_notification_event", 'kill_notification', _score_kill_notification, cost=60.0, min_fps=2)
+register_detector("kill_counter_event", 'kill_counter', _score_kill_counter, cost=40.0, min_fps=2)
+register_detector("kill_feed_event", 'kill_feed', _score_kill_feed, cost=80.0, min_fps=1)
@@ -0,0 +1,184 @@
+# event_intervals.py
+
+from collections import namedtuple
+
+# One event as ClipExtractor.extract_clip(start_time, end_time, event_type) takes it, plus its best match score
+EventInterval = namedtuple('EventInterval', ['start_ms', 'end_ms', 'event_type', 'peak_score'])
+
+
+class EventRules:
+    """
+    Thresholds and timings that turn per-frame scores of one event type into intervals.
+
+    :param enter: Score at which an event starts.
+    :param exit: Score below which an active event counts as gone (hysteresis);
+                 defaults to ``enter`` minus 0.1.
+    :param min_duration_ms: Events shorter than this are dropped as flickers.
+    :param max_gap_ms: How long the score may stay below ``exit`` (missed or
+                       skipped frames) before the event is closed.
+    :param cooldown_ms: After an event closes, new starts are ignored for this long.
+    """
+
+    def __init__(self, enter=0.8, exit=None, min_duration_ms=100, max_gap_ms=250, cooldown_ms=1000):
+        self.enter = enter
+        self.exit = enter - 0.1 if exit is None else exit
+        self.min_duration_ms = min_duration_ms
+        self.max_gap_ms = max_gap_ms
+        self.cooldown_ms = cooldown_ms
+
+    def with_threshold(self, threshold):
+        """Return a copy of these rules entering at ``threshold``, keeping the same hysteresis width."""
+        return EventRules(threshold, threshold - (self.enter - self.exit), self.min_duration_ms,
+                          self.max_gap_ms, self.cooldown_ms)
+
+
+# The down icon stays on screen for a second or more; the shield break flash is short
+DEFAULT_RULES = {
+    "down_event": EventRules(min_duration_ms=100),
+    "shield_break_event": EventRules(min_duration_ms=0, cooldown_ms=500),
+}
+
+
+class EventStateMachine:
+    """
+    Idle / active / cooldown state of one event type.
+
+    Feed it the score of every scanned frame with update(); it returns an
+    EventInterval when an event closes, and None otherwise. ``frame_interval_ms``
+    is the time between two scanned frames; the allowed gap is never shorter, and
+    an event seen on a single frame lasts that long instead of ending where it starts.
+    """
+
+    def __init__(self, event_type, rules=None, frame_interval_ms=0):
+        self.event_type = event_type
+        self.rules = rules or EventRules()
+        self.frame_interval_ms = frame_interval_ms
+        self.max_gap_ms = max(self.rules.max_gap_ms, frame_interval_ms)
+        self.start_ms = None
+        self.last_hit_ms = None
+        self.peak_score = None
+        self.cooldown_until = None
+
+    @property
+    def active(self):
+        return self.start_ms is not None
+
+    def update(self, timestamp_ms, score):
+        if self.active:
+            if timestamp_ms - self.last_hit_ms <= self.max_gap_ms:
+                if score >= self.rules.exit:
+                    self.last_hit_ms = timestamp_ms
+                    self.peak_score = max(self.peak_score, float(score))
+                return None
+            interval = self._close()
+        else:
+            interval = None
+
+        if score >= self.rules.enter and (self.cooldown_until is None or timestamp_ms >= self.cooldown_until):
+            self.start_ms = self.last_hit_ms = timestamp_ms
+            self.peak_score = float(score)
+        return interval
+
+    def finish(self):
+        """Close the event still active at the end of the video, if any."""
+        return self._close() if self.active else None
+
+    def _close(self):
+        interval = EventInterval(self.start_ms, self.last_hit_ms, self.event_type, self.peak_score)
+        self.cooldown_until = self.last_hit_ms + self.rules.cooldown_ms
+        self.start_ms = self.last_hit_ms = self.peak_score = None
+        if interval.end_ms - interval.start_ms < self.rules.min_duration_ms:
+            return None
+        if interval.end_ms == interval.start_ms:
+            # A clip from start to end would hold no frame at all
+            interval = interval._replace(end_ms=interval.start_ms + self.frame_interval_ms)
+        return interval
+
+
+class EventAggregator:
+    """
+    Turn the per-frame scores of every detector into event intervals.
+
+    :param rules: Dict of EventRules keyed by event type; missing types use DEFAULT_RULES.
+    :param threshold: When given, every event type enters at this score instead of its own.
+    :param frame_interval_ms: Time between two scanned frames.
+    """
+
+    def __init__(self, rules=None, threshold=None, frame_interval_ms=0):
+        self.frame_interval_ms = frame_interval_ms
+        self.threshold = threshold
+        self.rules = dict(DEFAULT_RULES, **(rules or {}))
+        if threshold is not None:
+            self.rules = {event_type: rule.with_threshold(threshold) for event_type, rule in self.rules.items()}
+        self.machines = {}
+        self.intervals = []
+
+    def machine(self, event_type):
+        if event_type not in self.machines:
+            rules = self.rules.get(event_type)
+            if rules is None:
+                rules = EventRules() if self.threshold is None else EventRules().with_threshold(self.threshold)
+            self.machines[event_type] = EventStateMachine(event_type, rules, self.frame_interval_ms)
+        return self.machines[event_type]
+
+    def update(self, timestamp_ms, scores):
+        """
+        Add the scores of one frame.
+
+        :param scores: Dict mapping event types to a score, or to a MatchResult.
+        :return: The intervals closed by this frame.
+        """
+        closed = []
+        for event_type, score in scores.items():
+            score = getattr(score, 'score', score)
+            interval = self.machine(event_type).update(timestamp_ms, score)
+            if interval is not None:
+                closed.append(interval)
+        self.intervals.extend(closed)
+        return closed
+
+    def close(self):
+        """Close all active events and return the intervals this produced."""
+        closed = [interval for interval in (machine.finish() for machine in self.machines.values()) if interval is not None]
+        self.intervals.extend(closed)
+        return closed
+
+    def finish(self):
+        """Close all active events and return every interval, ordered by start time."""
+        self.close()
+        self.intervals.sort(key=lambda interval: (interval.start_ms, interval.event_type))
+        return self.intervals
+
+
+def intervals_from_detections(detections, rules=None, threshold=None):
+    """
+    Build intervals from detection records (see AutoEventDetector.detect()).
+
+    The records only hold the hits, so a gap longer than ``max_gap_ms`` between
+    two hits of the same type ends the event; the gap is at least the sampling
+    step, taken as the smallest time between two records, or the duration of
+    one frame when all records are on the same frame. Hits from different
+    chunks of a parallel scan that straddle a chunk boundary merge into one interval.
+    """
+    detections = sorted(detections, key=lambda detection: detection["time_ms"])
+    steps = [b["time_ms"] - a["time_ms"] for a, b in zip(detections, detections[1:]) if b["time_ms"] > a["time_ms"]]
+    if not steps:
+        steps = [detection["time_ms"] / detection["frame"] for detection in detections if detection["frame"] > 0]
+    aggregator = EventAggregator(rules, threshold, min(steps, default=0))
+    for detection in detections:
+        aggregator.update(detection["time_ms"], {detection["event_type"]: detection["score"]})
+    return aggregator.finish()
+
+
+def interval_to_metadata_event(interval, fps):
+    """Return an interval as a MetadataManager event dict (frame based)."""
+    start_frame = round(interval.start_ms * fps / 1000)
+    end_frame = round(interval.end_ms * fps / 1000)
+    return {
+        "event_type": interval.event_type,
+        "start_frame": start_frame,
+        "end_frame": end_frame,
+        "total_frames": end_frame - start_frame,
+        "peak_score": interval.peak_score,
+        "roi_data": [],
+    }
@@ -1,78 +1,83 @@
 # Import necessary libraries and modules
 import cv2  # OpenCV library for computer vision tasks
-import os  # Library for interacting with the operating system
 from ...event_detection.regions.center_roi import get_center_roi  # Import the function to get the center region of interest (ROI)
+from ...event_detection.template_manager import TemplateManager  # Process-wide template cache
+from ...event_detection.matching import get_default_matcher, NO_MATCH  # Template matching engine
+from ...event_detection.frame_context import FrameContext  # Shared per-frame ROI cache
 import logging  # Library for logging information
 
 # Set the logging level to INFO to display informational messages
 logging.basicConfig(level=logging.INFO)
 
+# Range of scales (in percent) to resize the templates for matching
+DOWN_SCALES = list(range(25, 251, 10))
+
+# Write every ROI to debug_roi_frame_<n>.png when set
+DEBUG_SAVE_ROI = False
+
 # Define a function to get templates of the "down" icon
 def get_down_icon_templates():
-    # Get the directory path of the current script
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    # Construct the path to the directory containing "down" icon templates
-    template_dir = os.path.join(script_dir, 'thumbnail', 'center_down_icon')
-    
-    # Read all the image templates from the directory and store them in a list
-    templates = [cv2.imread(os.path.join(template_dir, f)) for f in os.listdir(template_dir) if f.endswith('.png')]
-
-    # Return the list of templates
-    return templates
-
-# Define a function to detect the "down" event in a video frame
-def detect_down_event(frame, threshold=0.8, frame_number=0):
+    # The templates are read from thumbnail/center_down_icon once and cached by the TemplateManager
+    return TemplateManager.instance().get_templates('center_down_icon')
+
+# Define a function to find the best "down" icon match in a video frame or FrameContext
+def match_down_event(frame, frame_number=0, matcher=None, scale_tracker=None):
+    """Return the best "down" icon MatchResult, located in frame coordinates (NO_MATCH for an empty ROI)."""
+    context = FrameContext.wrap(frame, frame_number)
+
+    # Extract the center region of interest (ROI) from the frame
+    roi, top_left, _ = get_center_roi(context)
+    if roi.size == 0:
+        return NO_MATCH
+
+    # Save the ROI for debugging
+    if DEBUG_SAVE_ROI:
+        cv2.imwrite(f"debug_roi_frame_{context.frame_number}.png", roi)
+
+    # Get the "down" icon templates pre-resized to the given scales, keeping those that fit inside the ROI;
+    # preprocessing such as contrast enhancement or thresholding leaves a single channel, matched against gray templates
+    def get_pyramid(scales):
+        return TemplateManager.instance().get_pyramid('center_down_icon', scales, roi.shape, grayscale=roi.ndim == 2)
+
+    # Shrunk copies of the ROI are shared with the other center detectors
+    def downscale(factor):
+        return context.downscaled('center', factor)
+
+    # Find the best match over all scales, or only the learned ones when a scale tracker is given
+    matcher = matcher or get_default_matcher()
+    if scale_tracker is not None:
+        match = scale_tracker.match(roi, get_pyramid, matcher, downscale)
+    else:
+        match = matcher.match(roi, get_pyramid(DOWN_SCALES), downscale)
+
+    # Convert the location from ROI to frame coordinates
+    if match.location is None:
+        return match
+    return match._replace(location=(match.location[0] + top_left[0], match.location[1] + top_left[1]))
+
+# Define a function to detect the "down" event in a video frame or FrameContext
+def detect_down_event(frame, threshold=0.8, frame_number=0, matcher=None, scale_tracker=None):
     # Check if the frame is valid
-    if frame is None or frame.size == 0:
+    context = FrameContext.wrap(frame, frame_number) if frame is not None else None
+    if context is None or context.frame.size == 0:
         print("Warning: Input frame is empty or None!")
         return False, None
 
     # Print the dimensions of the frame
-    print(f"Frame dimensions: {frame.shape}")
+    print(f"Frame dimensions: {context.shape}")
 
-    # Extract the center region of interest (ROI) from the frame
-    roi, top_left, bottom_right = get_center_roi(frame)
-
-    # Check the dimensions of the extracted ROI
+    # Check the dimensions of the center region of interest (ROI)
+    roi, top_left, bottom_right = get_center_roi(context)
     if roi.size == 0 or roi.shape[0] <= 0 or roi.shape[1] <= 0:
         print(f"Warning: Invalid ROI dimensions! Top-left: {top_left}, Bottom-right: {bottom_right}")
         return False, None
     else:
         print(f"ROI dimensions: {roi.shape}")
-    
-    #Save the ROI for debugging
-    cv2.imwrite(f"debug_roi_frame_{frame_number}.png", roi)  # Save the ROI
-    # Get the list of "down" icon templates
-    templates = get_down_icon_templates()
-    print(f"Number of templates loaded: {len(templates)}")
-
-    # Initialize variables to store the best match value and location
-    best_match_val = -1
-    best_match_loc = None
-
-    # Define a range of scales to resize the templates for matching
-    scales = [i for i in range(25, 251, 10)]  # Scales from 0.5x to 1.5x in steps of 0.1x
-
-    # Loop through each scale and template to find the best match
-    for scale in scales:
-        for template in templates:
-            # Resize the template based on the current scale
-            resized_template = cv2.resize(template, (int(template.shape[1] * scale / 100), int(template.shape[0] * scale / 100)))
-
-            # Skip the template if it's larger than the ROI
-            if roi.shape[0] < resized_template.shape[0] or roi.shape[1] < resized_template.shape[1]:
-                print(f"Warning: Skipping template with shape {resized_template.shape} because it's larger than the ROI with shape {roi.shape}")
-                continue
-
-            # Perform template matching to find the location of the template in the ROI
-            result = cv2.matchTemplate(roi, resized_template, cv2.TM_CCOEFF_NORMED)
-            _, max_val, _, max_loc = cv2.minMaxLoc(result)
-
-            # Update the best match value and location if the current match is better
-            if max_val > best_match_val:
-                best_match_val = max_val
-                best_match_loc = (max_loc[0] + top_left[0], max_loc[1] + top_left[1])
+
+    # Find the best match of the "down" icon templates
+    match = match_down_event(context, frame_number, matcher, scale_tracker)
+    best_match_val = match.score
+    best_match_loc = match.location
 
     # Check if the best match value exceeds the given threshold
     if best_match_val > threshold:
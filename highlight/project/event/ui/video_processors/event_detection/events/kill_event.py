@@ -1,30 +1,42 @@
 # kill_event.py
 
-import os
 import cv2
+from ..template_manager import TemplateManager
+from ..matching import get_default_matcher
+from ..frame_context import FrameContext
+
+# The kill templates are matched at their native size only
+KILL_SCALES = [100]
 
 class KillEvent:
-    def __init__(self, threshold=0.7):
+    def __init__(self, threshold=0.7, matcher=None):
         self.threshold = threshold
-        self.templates = {
-            "Kill": [cv2.imread(path, cv2.IMREAD_GRAYSCALE) for path in self._load_templates("kill")]
+        self.matcher = matcher
+
+    @property
+    def templates(self):
+        # Served from the shared TemplateManager cache instead of being read per instance
+        return {
+            "Kill": TemplateManager.instance().get_templates("kill", grayscale=True)
         }
 
-    def _load_templates(self, event_type):
-        template_dir = os.path.join("thumbnail", event_type)
-        return [os.path.join(template_dir, file) for file in os.listdir(template_dir) if file.endswith('.png')]
+    def match_kill_event(self, frame):
+        """Return the best kill marker MatchResult, located in frame coordinates."""
+        context = FrameContext.wrap(frame)
+        roi_gray = self._get_roi_gray(context)
+        pyramid = TemplateManager.instance().get_pyramid("kill", KILL_SCALES, roi_gray.shape, grayscale=True)
+        match = (self.matcher or get_default_matcher()).match(roi_gray, pyramid)
+        if match.location is None:
+            return match
+        x_start, y_start, _, _ = context.box('kill_center')
+        return match._replace(location=(match.location[0] + x_start, match.location[1] + y_start))
 
     def detect_kill_event(self, frame):
-        roi_gray = self._get_roi_gray(frame)
-        for template in self.templates["Kill"]:
-            result = cv2.matchTemplate(roi_gray, template, cv2.TM_CCOEFF_NORMED)
-            _, max_val, _, max_loc = cv2.minMaxLoc(result)
-            if max_val > self.threshold:
-                return True, max_loc
+        match = self.match_kill_event(frame)
+        if match.score > self.threshold:
+            return True, match.location
         return False, None
 
     def _get_roi_gray(self, frame):
         # Assuming the ROI for kill event is the center of the frame
-        height, width = frame.shape[:2]
-        roi = frame[int(height*0.45):int(height*0.55), int(width*0.45):int(width*0.55)]
-        return cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
\ No newline at end of file
+        return FrameContext.wrap(frame).gray('kill_center')
\ No newline at end of file
@@ -1,53 +1,52 @@
-import cv2
-import os
 from ...event_detection.regions.center_roi import get_center_roi
+from ...event_detection.template_manager import TemplateManager
+from ...event_detection.matching import get_default_matcher, NO_MATCH
+from ...event_detection.frame_context import FrameContext
 import logging
 
 logging.basicConfig(level=logging.INFO)
 
+SHIELD_BREAK_SCALES = list(range(25, 200, 10))
+
+# Print the best matching value of every frame when set
+DEBUG_MATCHES = False
+
 def get_shield_break_templates():
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    template_dir = os.path.join(script_dir, 'thumbnail', 'shield_break')
-    
-    templates = [cv2.imread(os.path.join(template_dir, f)) for f in os.listdir(template_dir) if f.endswith('.png')]
-    
-    # Debugging: Check Template Loading
-    print(f"Loaded {len(templates)} shield break templates.")
+    # Loaded once per process by the TemplateManager, which logs the template count
+    return TemplateManager.instance().get_templates('shield_break')
+
+def match_shield_break_event(frame, matcher=None, scale_tracker=None):
+    """Return the best shield break MatchResult, located in frame coordinates (NO_MATCH for an empty ROI)."""
+    context = FrameContext.wrap(frame)
+    roi, top_left, bottom_right = get_center_roi(context)
+    if roi.size == 0:
+        return NO_MATCH
     
-    return templates
+    # A preprocessed ROI may have a single channel left; match it against the gray templates then
+    def get_pyramid(scales):
+        return TemplateManager.instance().get_pyramid('shield_break', scales, roi.shape, grayscale=roi.ndim == 2)
 
-def detect_shield_break_event(frame, threshold=0.8):
-    roi, top_left, bottom_right = get_center_roi(frame)
-    roi = frame[top_left[1]:bottom_right[1], top_left[0]:bottom_right[0]]
-    
-    templates = get_shield_break_templates()
-    
-    best_match_val = -1
-    best_match_loc = None
-    
-    scales = [i for i in range(25, 200, 10)]
-    
-    for scale in scales:
-        for template in templates:
-            resized_template = cv2.resize(template, (int(template.shape[1] * scale / 100), int(template.shape[0] * scale / 100)))
-            
-            if roi.shape[0] < resized_template.shape[0] or roi.shape[1] < resized_template.shape[1]:
-                continue
-
-            result = cv2.matchTemplate(roi, resized_template, cv2.TM_CCOEFF_NORMED)
-            _, max_val, _, max_loc = cv2.minMaxLoc(result)
-
-            # Debugging: Visualize Template Matching
-            cv2.imshow(f"Matching for scale {scale}", result)
-            cv2.waitKey(0)
-            cv2.destroyAllWindows()
-
-            # Debugging: Print Matching Values
-            print(f"Matching value for scale {scale}: {max_val:.3f}")
-
-            if max_val > best_match_val:
-                best_match_val = max_val
-                best_match_loc = (max_loc[0] + top_left[0], max_loc[1] + top_left[1])
+    def downscale(factor):
+        return context.downscaled('center', factor)
+
+    matcher = matcher or get_default_matcher()
+    if scale_tracker is not None:
+        match = scale_tracker.match(roi, get_pyramid, matcher, downscale)
+    else:
+        match = matcher.match(roi, get_pyramid(SHIELD_BREAK_SCALES), downscale)
+
+    if match.location is None:
+        return match
+    return match._replace(location=(match.location[0] + top_left[0], match.location[1] + top_left[1]))
+
+def detect_shield_break_event(frame, threshold=0.8, matcher=None, scale_tracker=None):
+    match = match_shield_break_event(frame, matcher, scale_tracker)
+    best_match_val = match.score
+    best_match_loc = match.location
+
+    # Debugging: Print Matching Values
+    if DEBUG_MATCHES:
+        print(f"Best matching value {best_match_val:.3f} at scale {match.scale}")
 
     if best_match_val > threshold:
         print(f"***Shield_break detected at location: {best_match_loc}")
@@ -1,10 +1,11 @@
 # shield_break_event.py
 
 import cv2
+from ..frame_context import FrameContext
 
 
 def detect_shield_break_event(frame, templates, threshold):
-    center_roi_gray = cv2.cvtColor(frame[440:730, 900:1140], cv2.COLOR_BGR2GRAY)
+    center_roi_gray = FrameContext.wrap(frame).gray('center_region')
 
     for template in templates['shield_break']:
         result = cv2.matchTemplate(center_roi_gray, template, cv2.TM_CCOEFF_NORMED)
@@ -0,0 +1,84 @@
+# frame_context.py
+
+import cv2
+from .regions.roi_registry import get_roi_box
+
+
+class FrameContext:
+    """
+    Per-frame cache of ROI crops and their color conversions.
+
+    Detectors ask for a named ROI and the variant they need (BGR crop,
+    grayscale, HSV or a downscaled copy). Each variant is computed on first use
+    and shared with every other detector reading the same ROI of this frame.
+    """
+
+    def __init__(self, frame, frame_number=0):
+        self.frame = frame
+        self.frame_number = frame_number
+        self._boxes = {}
+        self._cache = {}
+
+    @classmethod
+    def wrap(cls, frame, frame_number=0):
+        """Return ``frame`` itself if it already is a FrameContext, else a new context around it."""
+        return frame if isinstance(frame, cls) else cls(frame, frame_number)
+
+    @property
+    def shape(self):
+        return self.frame.shape
+
+    def box(self, name, box=None):
+        """
+        Return the (x_start, y_start, x_end, y_end) box of a named ROI.
+
+        Unless an explicit box is given on first use, it is resolved from the
+        ROI registry for this frame's resolution, and then kept for the frame.
+        """
+        if name not in self._boxes:
+            if box is None:
+                box = get_roi_box(name, self.frame.shape)
+            self._boxes[name] = tuple(int(value) for value in box)
+        return self._boxes[name]
+
+    def roi(self, name, box=None):
+        """Return the BGR crop of a named ROI (a view into the frame)."""
+        return self._get((name, 'bgr'), box, lambda: self._crop(name))
+
+    def gray(self, name, box=None):
+        """Return the grayscale version of a named ROI."""
+        return self._get((name, 'gray'), box, lambda: cv2.cvtColor(self.roi(name), cv2.COLOR_BGR2GRAY))
+
+    def hsv(self, name, box=None):
+        """Return the HSV version of a named ROI."""
+        return self._get((name, 'hsv'), box, lambda: cv2.cvtColor(self.roi(name), cv2.COLOR_BGR2HSV))
+
+    def downscaled(self, name, factor, grayscale=False, box=None):
+        """Return a named ROI shrunk by an integer ``factor`` (area interpolation)."""
+        def shrink():
+            source = self.gray(name) if grayscale else self.roi(name)
+            height, width = source.shape[:2]
+            return cv2.resize(source, (width // factor, height // factor), interpolation=cv2.INTER_AREA)
+        return self._get((name, 'gray' if grayscale else 'bgr', factor), box, shrink)
+
+    def signature(self, name, size=(16, 16), box=None):
+        """Return a tiny float32 grayscale thumbnail of a named ROI, cheap to compare between frames."""
+        def shrink():
+            return cv2.resize(self.gray(name), size, interpolation=cv2.INTER_AREA).astype('float32')
+        return self._get((name, 'signature', size), box, shrink)
+
+    def cached(self, key, compute):
+        """Return a per-frame value computed on first use and shared with every other reader of this frame."""
+        if key not in self._cache:
+            # Detectors running on other threads may compute the same variant; all of them get the first one stored
+            return self._cache.setdefault(key, compute())
+        return self._cache[key]
+
+    def _get(self, key, box, compute):
+        if box is not None:
+            self.box(key[0], box)
+        return self.cached(key, compute)
+
+    def _crop(self, name):
+        x_start, y_start, x_end, y_end = self.box(name)
+        return self.frame[y_start:y_end, x_start:x_end]
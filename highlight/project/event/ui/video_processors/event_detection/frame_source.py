@@ -0,0 +1,203 @@
+# frame_source.py
+
+import queue
+import threading
+import time
+import cv2
+import numpy as np
+
+# Marks the end of the stream in the ready queue
+_END = None
+
+
+class SkipPolicy:
+    """
+    Choose how to skip the frames between two samples from measured costs.
+
+    ``grab`` advances with ``cap.grab()`` (demux and decode without the
+    conversion to BGR) and is cheap for short strides. ``seek`` jumps with
+    ``CAP_PROP_POS_FRAMES``, which re-decodes from the previous keyframe and
+    only pays off when the stride is longer than the GOP. In ``auto`` mode both
+    are tried once, the cheaper one is used from then on, and the other is
+    re-measured every ``reprobe_every`` skips in case the content changed.
+    """
+
+    METHODS = ('grab', 'seek')
+
+    def __init__(self, mode='auto', reprobe_every=100, smoothing=0.2):
+        if mode not in self.METHODS + ('auto',):
+            raise ValueError(f"Unknown skip mode '{mode}'. Choose from: auto, grab, seek")
+        self.mode = mode
+        self.reprobe_every = reprobe_every
+        self.smoothing = smoothing
+        self.costs = {method: None for method in self.METHODS}
+        self.counts = {method: 0 for method in self.METHODS}
+
+    def choose(self):
+        if self.mode != 'auto':
+            return self.mode
+        for method in self.METHODS:
+            if self.costs[method] is None:
+                return method
+        cheaper = min(self.METHODS, key=self.costs.get)
+        if sum(self.counts.values()) % self.reprobe_every == 0:
+            return 'seek' if cheaper == 'grab' else 'grab'
+        return cheaper
+
+    def record(self, method, seconds):
+        """Record the time one skip plus the following read took with ``method``."""
+        previous = self.costs[method]
+        self.costs[method] = seconds if previous is None else previous + self.smoothing * (seconds - previous)
+        self.counts[method] += 1
+
+
+class ThreadedFrameSource:
+    """
+    Decode a video on a background thread, ahead of the detection loop.
+
+    Frames are decoded into a ring of ``buffer_size`` preallocated arrays. The
+    consumer iterates over ``(frame_number, frame)`` pairs; a yielded frame stays
+    valid until the next one is requested, after which its buffer is handed back
+    to the decoder. ``metrics()`` reports how full the ring ran and how long
+    either side waited for the other.
+
+    With ``stride > 1`` only every stride-th frame is yielded; the frames in
+    between are skipped as chosen by a SkipPolicy (``skip_mode``). Decoding
+    starts at ``start_frame`` and stops before ``end_frame`` when given, so a
+    worker can read one chunk of a longer video.
+    """
+
+    def __init__(self, video_path, buffer_size=8, stride=1, skip_mode='auto', start_frame=0, end_frame=None):
+        self.video_path = video_path
+        self.stride = max(1, stride)
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        self.skip_policy = SkipPolicy(skip_mode)
+        self.cap = cv2.VideoCapture(video_path)
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+        self._buffers = [np.empty((self.height, self.width, 3), dtype=np.uint8) for _ in range(buffer_size)]
+        self._free = queue.Queue()
+        for slot in range(buffer_size):
+            self._free.put(slot)
+        self._ready = queue.Queue(maxsize=buffer_size)
+        self._stop = threading.Event()
+        self._error = None
+        self._thread = None
+
+        self._frames = 0
+        self._depth_total = 0
+        self._depth_max = 0
+        self._consumer_stall = 0.0
+        self._producer_stall = 0.0
+        self._decode_time = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._decode_loop, name="frame-decoder", daemon=True)
+            self._thread.start()
+
+    def __iter__(self):
+        self.start()
+        slot = None
+        while True:
+            if slot is not None:
+                self._free.put(slot)
+
+            depth = self._ready.qsize()
+            self._depth_total += depth
+            self._depth_max = max(self._depth_max, depth)
+
+            start = time.perf_counter()
+            item = self._ready.get()
+            self._consumer_stall += time.perf_counter() - start
+
+            if item is _END:
+                if self._error is not None:
+                    raise self._error
+                return
+            frame_number, slot = item
+            self._frames += 1
+            yield frame_number, self._buffers[slot]
+
+    def _decode_loop(self):
+        try:
+            frame_number = self.start_frame
+            if frame_number > 0:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+            while not self._stop.is_set():
+                if self.end_frame is not None and frame_number >= self.end_frame:
+                    break
+                start = time.perf_counter()
+                slot = self._free.get()
+                self._producer_stall += time.perf_counter() - start
+
+                start = time.perf_counter()
+                method = None
+                if frame_number > self.start_frame and self.stride > 1:
+                    method = self.skip_policy.choose()
+                    self._skip_to(method, frame_number)
+                ret, image = self.cap.read(self._buffers[slot])
+                elapsed = time.perf_counter() - start
+                self._decode_time += elapsed
+                if method is not None and ret:
+                    self.skip_policy.record(method, elapsed)
+                if not ret:
+                    break
+                if image is not self._buffers[slot]:
+                    # The decoder allocated a new array (e.g. unexpected frame size); keep it for the slot
+                    self._buffers[slot] = image
+                self._ready.put((frame_number, slot))
+
+                frame_number += self.stride
+        except Exception as error:
+            self._error = error
+        finally:
+            self._ready.put(_END)
+
+    def _skip_to(self, method, frame_number):
+        if method == 'grab':
+            # The previous read left the decoder just after the last sample
+            for _ in range(self.stride - 1):
+                if not self.cap.grab():
+                    break
+        else:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+
+    def metrics(self):
+        """Return the decode-ahead statistics gathered so far."""
+        return {
+            "frames": self._frames,
+            "buffer_size": len(self._buffers),
+            "queue_depth_avg": self._depth_total / self._frames if self._frames else 0.0,
+            "queue_depth_max": self._depth_max,
+            "consumer_stall_s": self._consumer_stall,
+            "producer_stall_s": self._producer_stall,
+            "decode_s": self._decode_time,
+            "skip_cost_s": dict(self.skip_policy.costs),
+            "skips": dict(self.skip_policy.counts),
+        }
+
+    def close(self):
+        """Stop the decoder thread and release the video."""
+        self._stop.set()
+        if self._thread is not None:
+            # Unblock the decoder if it is waiting for a free buffer or a ready slot
+            while self._thread.is_alive():
+                try:
+                    self._ready.get_nowait()
+                except queue.Empty:
+                    pass
+                self._free.put(0)
+                self._thread.join(timeout=0.05)
+            self._thread = None
+        self.cap.release()
@@ -0,0 +1,115 @@
+# headless.py
+#
+# Scan a video for events without opening any window and write the detections to a file.
+# Run from the ui directory:
+#     python -m video_processors.event_detection.headless match.mp4 -o events.jsonl
+#     python -m video_processors.event_detection.headless match.mp4 --format json --processes 4
+
+import argparse
+import json
+import os
+
+import cv2
+
+from .auto_detector import AutoEventDetector
+from .matching import MATCHERS, create_matcher
+from .detector_registry import DETECTORS
+from ..parallel_processing import scan_video_parallel
+
+OUTPUT_FORMATS = ('jsonl', 'json')
+
+
+def write_detections(detections, output_path, video_path, fps, fmt='jsonl', intervals=None):
+    """
+    Write detections to ``output_path``.
+
+    ``jsonl`` writes one detection per line, ``json`` a single object with the
+    video path, its frame rate, the list of events and, when given, the merged
+    event intervals.
+    """
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{fmt}'. Choose from: {', '.join(OUTPUT_FORMATS)}")
+    with open(output_path, 'w') as file:
+        if fmt == 'jsonl':
+            for detection in detections:
+                file.write(json.dumps(detection) + '\n')
+        else:
+            output = {"video": video_path, "fps": fps, "events": detections}
+            if intervals is not None:
+                output["intervals"] = [interval._asdict() for interval in intervals]
+            json.dump(output, file, indent=4)
+
+
+def detect_events_headless(video_path, output_path=None, threshold=0.8, frames_to_skip=0, engine=None, fmt='jsonl', coarse_stride=None,
+                           change_threshold=None, detectors=None, detector_threads=0, processes=None):
+    """
+    Run the auto detector over a whole video with no preview.
+
+    :param video_path: Video to scan.
+    :param output_path: File to write the detections to; defaults to the video path with a .jsonl/.json suffix.
+    :param threshold: Minimum match score for a detection.
+    :param frames_to_skip: Frames skipped between two scanned frames.
+    :param engine: Name of the matching engine (see MATCHERS); None uses the default.
+    :param fmt: 'jsonl' or 'json'.
+    :param coarse_stride: When given, scan adaptively: every coarse_stride-th frame, then
+                          frame by frame around likely events (frames_to_skip is ignored).
+    :param change_threshold: When given, skip detectors whose ROI changed less than this (gray levels).
+    :param detectors: Names of the registered detectors to run; None runs the default ones.
+    :param detector_threads: Threads the detectors of each frame run on in parallel (0 for none).
+    :param processes: When given, scan keyframe-aligned chunks of the video on this many
+                      processes (see scan_video_parallel); only for full scans of the default detectors.
+    :return: The list of detections.
+    """
+    if not os.path.exists(video_path):
+        raise FileNotFoundError(f"Video not found: {video_path}")
+    if output_path is None:
+        output_path = f"{os.path.splitext(video_path)[0]}_events.{fmt}"
+
+    if processes:
+        if coarse_stride or change_threshold is not None or detectors or detector_threads:
+            raise ValueError("A scan on several processes only supports the threshold, skip and engine options")
+        detections, intervals = scan_video_parallel(video_path, threshold, frames_to_skip, processes, engine)
+        cap = cv2.VideoCapture(video_path)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        cap.release()
+        write_detections(detections, output_path, video_path, fps, fmt, intervals)
+        print(f"Wrote {len(detections)} detections to {output_path}")
+        return detections
+
+    matcher = create_matcher(engine) if engine else None
+    detector = AutoEventDetector(video_path, threshold, frames_to_skip, matcher=matcher, change_threshold=change_threshold,
+                                 detectors=detectors, detector_threads=detector_threads)
+    scan = detector.adaptive_scan(coarse_stride) if coarse_stride else detector.full_scan()
+    if detector.load_cached(scan):
+        detections = detector.detections
+    else:
+        detections = detector.detect_adaptive(coarse_stride) if coarse_stride else detector.detect()
+    write_detections(detections, output_path, video_path, detector.fps, fmt, detector.intervals)
+    print(f"Wrote {len(detections)} detections to {output_path}")
+    return detections
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect events in a video without a preview window.")
+    parser.add_argument("video", help="Video file to scan.")
+    parser.add_argument("-o", "--output", help="Output file (default: <video>_events.<format>).")
+    parser.add_argument("--threshold", type=float, default=0.8, help="Minimum match score.")
+    parser.add_argument("--skip", type=int, default=0, help="Frames to skip between scanned frames.")
+    parser.add_argument("--engine", choices=sorted(MATCHERS), help="Template matching engine.")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default='jsonl', help="Output format.")
+    parser.add_argument("--coarse-stride", type=int, help="Scan adaptively with this stride, densely around likely events.")
+    parser.add_argument("--change-threshold", type=float, help="Skip detectors whose ROI changed less than this (gray levels).")
+    parser.add_argument("--detectors", nargs='+', choices=list(DETECTORS), help="Detectors to run (default: the default ones).")
+    parser.add_argument("--detector-threads", type=int, default=0, help="Run the detectors of each frame on this many threads.")
+    parser.add_argument("--processes", type=int, help="Scan chunks of the video on this many processes.")
+    args = parser.parse_args()
+
+    try:
+        detect_events_headless(args.video, args.output, args.threshold, args.skip, args.engine, args.format, args.coarse_stride,
+                               args.change_threshold, args.detectors, args.detector_threads, args.processes)
+    except ValueError as error:
+        parser.error(str(error))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+# matching.py
+
+from collections import namedtuple
+import weakref
+import cv2
+import numpy as np
+
+# Best match of a pyramid against an ROI. The location is relative to the ROI;
+# scale and template_index identify the pyramid entry that produced it.
+MatchResult = namedtuple('MatchResult', ['score', 'location', 'scale', 'template_index'])
+
+NO_MATCH = MatchResult(-1, None, None, None)
+
+
+class ExhaustiveMatcher:
+    """Match every pyramid entry against the full-resolution ROI (the original detector behaviour)."""
+
+    def match(self, roi, pyramid, downscale=None):
+        best = NO_MATCH
+        for entry in pyramid:
+            result = cv2.matchTemplate(roi, entry.image, cv2.TM_CCOEFF_NORMED)
+            _, max_val, _, max_loc = cv2.minMaxLoc(result)
+            if max_val > best.score:
+                best = MatchResult(max_val, max_loc, entry.scale, entry.template_index)
+        return best
+
+
+class CoarseToFineMatcher:
+    """
+    Two-pass matcher for the center ROI detectors.
+
+    The ROI and the pyramid are first shrunk and searched there: every entry by
+    ``factor`` if it keeps at least ``min_size`` pixels a side, else by the
+    largest of ``factor // 2``, ``factor // 4``, ... that does, so small
+    templates still carry enough detail to be found. Only the ``top_k`` best
+    entries are then re-scored at full resolution, in a window of the entry's
+    shrink factor plus ``margin`` pixels around their coarse location. Entries
+    too small for any shrink are matched at full resolution directly.
+
+    Every engine's ``match`` accepts an optional ``downscale`` callable
+    returning the ROI shrunk by a given factor (e.g. a FrameContext accessor),
+    so detectors reading the same ROI share one shrunk copy per frame.
+    """
+
+    def __init__(self, factor=4, top_k=8, margin=3, min_size=5):
+        self.factor = factor
+        self.top_k = top_k
+        self.margin = margin
+        self.min_size = min_size
+
+    def match(self, roi, pyramid, downscale=None):
+        roi_height, roi_width = roi.shape[:2]
+        factors = []
+        factor = self.factor
+        while factor > 1:
+            factors.append(factor)
+            factor //= 2
+        small_templates = {factor: pyramid.downsampled(factor, self.min_size) for factor in factors}
+        small_rois = {}
+
+        candidates = []
+        best = NO_MATCH
+        for index, entry in enumerate(pyramid.entries):
+            factor = next((factor for factor in factors if small_templates[factor][index] is not None), None)
+            if factor is None:
+                # Too small to search coarsely, so score it exactly right away
+                result = cv2.matchTemplate(roi, entry.image, cv2.TM_CCOEFF_NORMED)
+                _, max_val, _, max_loc = cv2.minMaxLoc(result)
+                if max_val > best.score:
+                    best = MatchResult(max_val, max_loc, entry.scale, entry.template_index)
+                continue
+            if factor not in small_rois:
+                if downscale is not None:
+                    small_rois[factor] = downscale(factor)
+                else:
+                    small_rois[factor] = cv2.resize(roi, (roi_width // factor, roi_height // factor), interpolation=cv2.INTER_AREA)
+            result = cv2.matchTemplate(small_rois[factor], small_templates[factor][index], cv2.TM_CCOEFF_NORMED)
+            _, max_val, _, max_loc = cv2.minMaxLoc(result)
+            candidates.append((max_val, index, max_loc, factor))
+
+        # Re-score the strongest coarse candidates in entry order so ties resolve like the exhaustive search
+        candidates = sorted(candidates, reverse=True)[:self.top_k]
+        for _, index, (coarse_x, coarse_y), factor in sorted(candidates, key=lambda candidate: candidate[1]):
+            entry = pyramid.entries[index]
+            template_height, template_width = entry.image.shape[:2]
+            radius = factor + self.margin
+            x0 = max(0, coarse_x * factor - radius)
+            y0 = max(0, coarse_y * factor - radius)
+            x1 = min(roi_width - template_width, coarse_x * factor + radius)
+            y1 = min(roi_height - template_height, coarse_y * factor + radius)
+            window = roi[y0:y1 + template_height, x0:x1 + template_width]
+            result = cv2.matchTemplate(window, entry.image, cv2.TM_CCOEFF_NORMED)
+            _, max_val, _, max_loc = cv2.minMaxLoc(result)
+            if max_val > best.score:
+                best = MatchResult(max_val, (max_loc[0] + x0, max_loc[1] + y0), entry.scale, entry.template_index)
+        return best
+
+
+class FFTMatcher:
+    """
+    Batched normalized cross-correlation of a whole pyramid in the frequency domain.
+
+    The ROI is transformed once per frame and multiplied with the precomputed
+    spectra of every pyramid entry; all correlation surfaces then come back from
+    a single batched inverse FFT. Window means and energies for the
+    normalization are read from integral images, so the scores equal
+    ``cv2.TM_CCOEFF_NORMED`` up to float32 rounding.
+    """
+
+    def __init__(self, eps=1e-6):
+        self.eps = eps
+        # Template spectra per pyramid and ROI shape, dropped with the pyramid
+        self._spectra = weakref.WeakKeyDictionary()
+
+    def match(self, roi, pyramid, downscale=None):
+        if not len(pyramid):
+            return NO_MATCH
+        roi = roi if roi.ndim == 3 else roi[:, :, np.newaxis]
+        roi_height, roi_width, channels = roi.shape
+        spectra, template_energy = self._get_spectra(pyramid, roi.shape)
+
+        # One forward transform of the ROI, then one batched inverse transform for every entry
+        roi_float = roi.astype(np.float32)
+        roi_spectrum = np.fft.rfft2(roi_float, axes=(0, 1))
+        product = spectra[0] * roi_spectrum[np.newaxis, :, :, 0]
+        for channel in range(1, channels):
+            product += spectra[channel] * roi_spectrum[np.newaxis, :, :, channel]
+        correlations = np.fft.irfft2(product, s=(roi_height, roi_width), axes=(1, 2))
+
+        # Integral images of the ROI and its square for the per-window statistics
+        roi_double = roi.astype(np.float64)
+        integral = np.zeros((roi_height + 1, roi_width + 1, channels))
+        integral[1:, 1:] = roi_double.cumsum(0).cumsum(1)
+        integral_sq = np.zeros((roi_height + 1, roi_width + 1, channels))
+        integral_sq[1:, 1:] = (roi_double * roi_double).cumsum(0).cumsum(1)
+
+        window_variance = {}
+        best = NO_MATCH
+        for index, entry in enumerate(pyramid.entries):
+            height, width = entry.image.shape[:2]
+            if (height, width) not in window_variance:
+                sums = self._window_sums(integral, height, width)
+                sums_sq = self._window_sums(integral_sq, height, width)
+                window_variance[(height, width)] = (sums_sq - sums * sums / (height * width)).sum(axis=2)
+            variance = window_variance[(height, width)]
+            numerator = correlations[index, :roi_height - height + 1, :roi_width - width + 1]
+            denominator = np.sqrt(np.maximum(variance, 0) * template_energy[index])
+            scores = np.where(denominator > self.eps, numerator / np.maximum(denominator, self.eps), 0)
+            y, x = np.unravel_index(np.argmax(scores), scores.shape)
+            max_val = min(float(scores[y, x]), 1.0)
+            if max_val > best.score:
+                best = MatchResult(max_val, (int(x), int(y)), entry.scale, entry.template_index)
+        return best
+
+    @staticmethod
+    def _window_sums(integral, height, width):
+        return integral[height:, width:] - integral[:-height, width:] - integral[height:, :-width] + integral[:-height, :-width]
+
+    def _get_spectra(self, pyramid, roi_shape):
+        per_shape = self._spectra.setdefault(pyramid, {})
+        if roi_shape not in per_shape:
+            roi_height, roi_width, channels = roi_shape
+            padded = np.zeros((channels, len(pyramid), roi_height, roi_width), dtype=np.float32)
+            template_energy = np.empty(len(pyramid))
+            for index, entry in enumerate(pyramid.entries):
+                image = entry.image if entry.image.ndim == 3 else entry.image[:, :, np.newaxis]
+                height, width = image.shape[:2]
+                # Zero-mean per channel, so the ROI window mean drops out of the numerator
+                centered = image.astype(np.float64) - image.reshape(-1, channels).mean(axis=0)
+                template_energy[index] = (centered * centered).sum()
+                padded[:, index, :height, :width] = centered.transpose(2, 0, 1)
+            # Conjugate spectra turn the frequency-domain product into a correlation
+            spectra = np.conj(np.fft.rfft2(padded, axes=(2, 3)))
+            per_shape[roi_shape] = (spectra, template_energy)
+        return per_shape[roi_shape]
+
+
+def results_agree(result, reference, score_tolerance=0.02, location_tolerance=2):
+    """Return True if ``result`` reports the same best match as ``reference`` within the given tolerances."""
+    if result.location is None or reference.location is None:
+        return result.location is None and reference.location is None
+    return (abs(result.score - reference.score) <= score_tolerance
+            and abs(result.location[0] - reference.location[0]) <= location_tolerance
+            and abs(result.location[1] - reference.location[1]) <= location_tolerance)
+
+
+# Matching engines selectable by name, e.g. from the command line
+MATCHERS = {
+    'exhaustive': ExhaustiveMatcher,
+    'coarse_to_fine': CoarseToFineMatcher,
+    'fft': FFTMatcher,
+}
+
+
+def create_matcher(name):
+    """Return a new matcher of the engine registered under ``name``."""
+    if name not in MATCHERS:
+        raise ValueError(f"Unknown matching engine '{name}'. Choose from: {', '.join(MATCHERS)}")
+    return MATCHERS[name]()
+
+
+# The exhaustive search stays the default: the coarse-to-fine engine agrees with it on the
+# benchmark frames but only re-scores a few candidates, so it is opt-in through create_matcher
+_default_matcher = ExhaustiveMatcher()
+
+
+def get_default_matcher():
+    """Return the matcher used by detectors that aren't given one explicitly."""
+    return _default_matcher
+
+
+def set_default_matcher(matcher):
+    """Change the matcher used by detectors that aren't given one explicitly."""
+    global _default_matcher
+    _default_matcher = matcher
@@ -1,6 +1,7 @@
 import os
 import sys
 import json  # Ensure json is imported
+import numpy as np
 
 # Import the necessary preprocessing functions.
 # These are the functions you've defined in your preprocessing.py module.
@@ -19,6 +20,8 @@ from .preprocessing import (
     # ... Add other preprocessing functions as needed
 )
 
+from .preprocessing_pipeline import PreprocessingPipeline, stack_frames
+
 # ... [same imports as before]
 
 """class PreprocessingHandler:
@@ -65,11 +68,18 @@ from .preprocessing import (
 class PreprocessingHandler:
     CONFIG_FILE = 'settings.json'
 
-    def __init__(self):
+    def __init__(self, settings=None):
         """
-        Initialize the PreprocessingHandler and load the settings.
+        Initialize the PreprocessingHandler and compile its pipeline.
+
+        :param settings: A dictionary of preprocessing methods and their parameters;
+                         the saved settings are loaded when None.
+        :raises ValueError: If the settings name an unknown method or an impossible order.
         """
-        self.settings = self.load_preprocessing_settings()
+        self.settings = self.load_preprocessing_settings() if settings is None else settings
+        self.pipeline = PreprocessingPipeline(self.settings)
+        # Stack the batches are copied into, reused while the batch shape stays the same
+        self._stack = None
         print("Initialized PreprocessingHandler with settings:", self.settings)
 
     @staticmethod
@@ -81,23 +91,33 @@ class PreprocessingHandler:
         print("No preprocessing settings found in config file.")
         return {}
 
-    def apply_preprocessing(self, frame):
+    def apply_preprocessing(self, frame, out=None):
         """
         Apply preprocessing methods to the frame based on the settings.
 
         :param frame: The input frame (image) to be preprocessed.
-        :return: The preprocessed frame.
+        :param out: Optional array to write the result to.
+        :return: The preprocessed frame. Unless ``out`` is given it is a buffer of
+                 the pipeline, overwritten by the next call.
         """
-        for method, params in self.settings.items():
-            if method in dir(preprocessing):  # Check if the method exists in the preprocessing module
-                func = getattr(preprocessing, method)
-                if params:
-                    frame = func(frame, **params)
-                    print(f"Applied {method} with parameters: {params}.")
-                else:
-                    frame = func(frame)
-                    print(f"Applied {method}.")
-            else:
-                print(f"Warning: Unknown preprocessing method '{method}' in settings.")
-        
-        return frame
+        return self.pipeline.apply(frame, out)
+
+    def apply_preprocessing_batch(self, frames, out=None):
+        """
+        Apply the preprocessing to a batch of equally sized frames or ROI crops at once.
+
+        Meant for offline scans that can read ahead: the frames are stacked into
+        one contiguous (N, H, W[, 3]) array and the pipeline runs over the stack
+        (see PreprocessingPipeline.apply_batch). It is opt-in; apply_preprocessing
+        stays the default. The stack only runs as one call for pixel-wise steps,
+        so it pays off on many small crops; on ROI-sized crops the stacking copy
+        costs more than the calls it saves (see benchmark.py --preprocessing).
+
+        :param frames: A list of images, or an already stacked array.
+        :param out: Optional array to write the (N, ...) result to.
+        :return: The preprocessed stack. Unless ``out`` is given it is a buffer of
+                 the pipeline, overwritten by the next batch.
+        """
+        if not isinstance(frames, np.ndarray):
+            frames = self._stack = stack_frames(frames, self._stack)
+        return self.pipeline.apply_batch(frames, out)
@@ -6,32 +6,32 @@ def convert_to_uint8(img):
     """Convert the image to uint8 format."""
     if img.dtype != np.uint8:
         img = (img * 255).astype(np.uint8)
-    print("Converted image to uint8 format.")
     return img
 
 def normalize_image(img):
     """Normalize the image to [0, 255] range."""
     normalized_img = cv2.normalize(img, None, 0, 255, cv2.NORM_MINMAX)
-    print("Applied normalization.")
     return convert_to_uint8(normalized_img)
 
 def enhance_contrast(img):
     """Enhance the contrast of the image using histogram equalization."""
     img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
     equalized_img = cv2.equalizeHist(img_gray)
-    print("Enhanced contrast using histogram equalization.")
     return convert_to_uint8(equalized_img)
 
+def global_thresholding(img, thresh=127, max_value=255):
+    """Set the pixels above the threshold to max_value and the others to 0."""
+    _, thresholded_img = cv2.threshold(img, thresh, max_value, cv2.THRESH_BINARY)
+    return convert_to_uint8(thresholded_img)
+
 def reduce_noise(img, kernel_size=(5, 5)):
     """Reduce noise in the image using Gaussian blur."""
     blurred_img = cv2.GaussianBlur(img, kernel_size, 0)
-    print("Reduced noise using Gaussian blur.")
     return convert_to_uint8(blurred_img)
 
 def detect_edges(img, low_threshold=50, high_threshold=150):
     """Detect edges in the image using Canny edge detection."""
     edges = cv2.Canny(img, low_threshold, high_threshold)
-    print("Detected edges using Canny edge detection.")
     return convert_to_uint8(edges)
 
 def adaptive_histogram_equalization(img, tile_grid_size=(8, 8), clip_limit=2.0):
@@ -42,7 +42,6 @@ def adaptive_histogram_equalization(img, tile_grid_size=(8, 8), clip_limit=2.0):
         img_gray = img  # Image is already grayscale
     clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=tile_grid_size)
     clahe_img = clahe.apply(img_gray)
-    print("Applied adaptive histogram equalization.")
     return convert_to_uint8(clahe_img)
 
 def adaptive_thresholding(img, max_value=255, block_size=11, C=2):
@@ -52,21 +51,18 @@ def adaptive_thresholding(img, max_value=255, block_size=11, C=2):
     else:
         img_gray = img  # Image is already grayscale
     thresholded_img = cv2.adaptiveThreshold(img_gray, max_value, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, block_size, C)
-    print("Applied adaptive thresholding.")
     return convert_to_uint8(thresholded_img)
 
 def morphological_dilation(img, kernel_size=(5, 5)):
     """Apply morphological dilation to the image."""
     kernel = np.ones(kernel_size, np.uint8)
     dilated_img = cv2.dilate(img, kernel, iterations=1)
-    print("Applied morphological dilation.")
     return convert_to_uint8(dilated_img)
 
 def morphological_closing(img, kernel_size=(5, 5)):
     """Apply morphological closing to the image."""
     kernel = np.ones(kernel_size, np.uint8)
     closed_img = cv2.morphologyEx(img, cv2.MORPH_CLOSE, kernel)
-    print("Applied morphological closing.")
     return convert_to_uint8(closed_img)
 
 def histogram_backprojection(img, template):
@@ -76,7 +72,6 @@ def histogram_backprojection(img, template):
     hist_template = cv2.calcHist([hsv_template], [0, 1], None, [180, 256], [0, 180, 0, 256])
     cv2.normalize(hist_template, hist_template, 0, 255, cv2.NORM_MINMAX)
     backprojected_img = cv2.calcBackProject([hsv_img], [0, 1], hist_template, [0, 180, 0, 256], 1)
-    print("Applied histogram backprojection.")
     return convert_to_uint8(backprojected_img)
 
 def sharpen_image(img):
@@ -85,23 +80,22 @@ def sharpen_image(img):
                        [-1,  9, -1],
                        [-1, -1, -1]])
     sharpened_img = cv2.filter2D(img, -1, kernel)
-    print("Sharpened the image.")
     return convert_to_uint8(sharpened_img)
 
 def convert_to_hsv(img):
     """Convert the image to HSV color space."""
     hsv_img = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-    print("Converted image to HSV color space.")
     return convert_to_uint8(hsv_img)
 
 
-# Note: For each function, I've added a print statement for debugging and 
-# called the convert_to_uint8 function at the end to ensure the image is in the right format.
+# Note: Each function calls convert_to_uint8 at the end to ensure the image is in the right format.
+# These functions allocate new images on every call; to run the same steps on many frames,
+# compile them once with preprocessing_pipeline.PreprocessingPipeline.
 
 # Inline Notation:
-# 1. When adding a new preprocessing function, ensure to add a print statement for debugging.
-# 2. Call the convert_to_uint8 function at the end of each preprocessing function to ensure the image is in the right format.
-# 3. If the new preprocessing function requires parameters, ensure to provide default values and allow them to be overridden when the function is called.
+# 1. Call the convert_to_uint8 function at the end of each preprocessing function to ensure the image is in the right format.
+# 2. If the new preprocessing function requires parameters, ensure to provide default values and allow them to be overridden when the function is called.
+# 3. Add a matching PreprocessingStep to preprocessing_pipeline.STEPS so it can be used from the settings.
 
 
 # Define a preprocessing pipeline
@@ -125,5 +119,4 @@ def apply_preprocessing(img, pipeline=PREPROCESSING_PIPELINE):
     """Apply a series of preprocessing steps to an image."""
     for func in pipeline:
         img = func(img)
-    print("Completed preprocessing pipeline.")
     return convert_to_uint8(img)
\ No newline at end of file
@@ -0,0 +1,570 @@
+# preprocessing_pipeline.py
+
+import cv2
+import numpy as np
+
+# Color spaces of the images passed between steps
+BGR = 'bgr'
+GRAY = 'gray'
+HSV = 'hsv'
+
+# Parameter names written by PreprocessingSettingsDialog that differ from the preprocessing functions
+PARAMETER_ALIASES = {"C_value": "C"}
+
+# Point-wise steps are fused from this many in a run; a single one is already one OpenCV pass
+FUSED_LOOKUP_MIN_STEPS = 2
+# Chains needing a histogram only pay for calcHist and building the table in numpy (~25 us)
+# from about this many pixels on; below it equalizeHist and the other steps run faster one by one
+FUSED_HISTOGRAM_MIN_PIXELS = 1280 * 720
+
+# Every uint8 value once, in order; running a point-wise OpenCV call on it gives that call's lookup table
+_RAMP = np.arange(256, dtype=np.uint8).reshape(1, 256)
+
+
+def _kernel_size(value, odd=False):
+    """Return a (width, height) kernel size from an int or a pair; ``odd`` rounds even sizes up."""
+    size = (int(value), int(value)) if np.isscalar(value) else tuple(int(side) for side in value)
+    if odd:
+        size = tuple(side | 1 for side in size)
+    return size
+
+
+def _stacked(images):
+    """Return an (N, H, W[, 3]) stack as one (N * H, W[, 3]) image, without copying."""
+    count, height = images.shape[:2]
+    return images.reshape((count * height,) + images.shape[2:])
+
+
+class PreprocessingStep:
+    """
+    One step of a compiled pipeline, equivalent to the function of the same name in preprocessing.py.
+
+    ``accepts`` lists the color spaces the step reads. Steps with ``gray_input``
+    work on one channel; the compiler puts a BGR to gray conversion before them
+    when needed. ``apply`` writes into ``dst``, preallocated by the pipeline.
+
+    ``apply_batch`` does the same for a stack of N images of the same size. It
+    loops over the items unless the result of every pixel only depends on that
+    pixel, in which case the stack is processed as one tall image.
+    """
+
+    name = None
+    accepts = (BGR, GRAY, HSV)
+    gray_input = False
+    # Whether apply_batch handles the whole stack without a per-item loop
+    vectorized = False
+
+    def output_space(self, space):
+        return space
+
+    def apply(self, src, dst):
+        raise NotImplementedError
+
+    def apply_batch(self, src, dst):
+        for item, item_dst in zip(src, dst):
+            self.apply(item, item_dst)
+        return dst
+
+
+class PixelConversion(PreprocessingStep):
+    """A per-pixel color conversion, run over a batch as one image with the items stacked vertically."""
+
+    code = None
+    vectorized = True
+
+    def apply(self, src, dst):
+        return cv2.cvtColor(src, self.code, dst)
+
+    def apply_batch(self, src, dst):
+        self.apply(_stacked(src), _stacked(dst))
+        return dst
+
+
+class ToGray(PixelConversion):
+    name = "to_gray"
+    accepts = (BGR,)
+    code = cv2.COLOR_BGR2GRAY
+
+    def output_space(self, space):
+        return GRAY
+
+
+class PointwiseStep(PreprocessingStep):
+    """
+    A step mapping every uint8 value to another through a 256-entry table.
+
+    The table may depend on the image, but only through its histogram or its
+    value range, so consecutive point-wise steps are fused by the compiler
+    into one FusedLookup. ``table`` must give the same result as ``apply``, and
+    be non-decreasing over the values present, so the range of its output is
+    the table at the ends of the input range.
+    """
+
+    # What table() reads of the image: None, 'range' or 'histogram'
+    statistics = None
+
+    def table(self, histogram, low, high):
+        """
+        Return the uint8 lookup table of the step for an input image.
+
+        :param histogram: 256-bin histogram of the input, only given to steps that ask for it.
+        :param low: Smallest value of the input.
+        :param high: Largest value of the input.
+        """
+        raise NotImplementedError
+
+
+class NormalizeImage(PointwiseStep):
+    name = "normalize_image"
+    statistics = 'range'
+
+    def apply(self, src, dst):
+        return cv2.normalize(src, dst, 0, 255, cv2.NORM_MINMAX)
+
+    def table(self, histogram, low, high):
+        # Same scale and shift as cv2.normalize, applied by the same conversion
+        scale = 255 * (1.0 / (high - low)) if high > low else 0.0
+        table = cv2.convertScaleAbs(_RAMP, alpha=scale, beta=-low * scale)
+        table[0, :low] = 0
+        return table
+
+
+class EnhanceContrast(PointwiseStep):
+    name = "enhance_contrast"
+    accepts = (BGR, GRAY)
+    gray_input = True
+    statistics = 'histogram'
+
+    def apply(self, src, dst):
+        return cv2.equalizeHist(src, dst)
+
+    def table(self, histogram, low, high):
+        # The table cv2.equalizeHist builds, from the lowest present value up
+        total = histogram.sum()
+        if histogram[low] == total:
+            return np.full((1, 256), low, dtype=np.uint8)
+        scale = np.float32(255) / np.float32(total - histogram[low])
+        cumulative = (np.cumsum(histogram) - histogram[low]).astype(np.float32)
+        return np.clip(np.rint(cumulative * scale), 0, 255).astype(np.uint8).reshape(1, 256)
+
+
+class GlobalThresholding(PointwiseStep):
+    name = "global_thresholding"
+    vectorized = True
+
+    def __init__(self, thresh=127, max_value=255):
+        self.thresh = thresh
+        self.max_value = max_value
+        self._table = cv2.threshold(_RAMP, thresh, max_value, cv2.THRESH_BINARY)[1]
+
+    def apply(self, src, dst):
+        return cv2.threshold(src, self.thresh, self.max_value, cv2.THRESH_BINARY, dst)[1]
+
+    def apply_batch(self, src, dst):
+        self.apply(_stacked(src), _stacked(dst))
+        return dst
+
+    def table(self, histogram, low, high):
+        return self._table
+
+
+class ReduceNoise(PreprocessingStep):
+    name = "reduce_noise"
+
+    def __init__(self, kernel_size=(5, 5)):
+        # GaussianBlur only takes odd sizes; the settings slider can stop on even ones
+        self.kernel_size = _kernel_size(kernel_size, odd=True)
+
+    def apply(self, src, dst):
+        return cv2.GaussianBlur(src, self.kernel_size, 0, dst)
+
+
+class DetectEdges(PreprocessingStep):
+    name = "detect_edges"
+
+    def __init__(self, low_threshold=50, high_threshold=150):
+        self.low_threshold = low_threshold
+        self.high_threshold = high_threshold
+
+    def output_space(self, space):
+        return GRAY
+
+    def apply(self, src, dst):
+        return cv2.Canny(src, self.low_threshold, self.high_threshold, dst)
+
+
+class AdaptiveHistogramEqualization(PreprocessingStep):
+    name = "adaptive_histogram_equalization"
+    accepts = (BGR, GRAY)
+    gray_input = True
+
+    def __init__(self, tile_grid_size=(8, 8), clip_limit=2.0):
+        self.clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=_kernel_size(tile_grid_size))
+
+    def apply(self, src, dst):
+        return self.clahe.apply(src, dst)
+
+
+class AdaptiveThresholding(PreprocessingStep):
+    name = "adaptive_thresholding"
+    accepts = (BGR, GRAY)
+    gray_input = True
+
+    def __init__(self, max_value=255, block_size=11, C=2):
+        self.max_value = max_value
+        # The block size must be odd and larger than 1
+        self.block_size = max(3, int(block_size) | 1)
+        self.C = C
+
+    def apply(self, src, dst):
+        return cv2.adaptiveThreshold(src, self.max_value, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY,
+                                     self.block_size, self.C, dst)
+
+
+class MorphologicalDilation(PreprocessingStep):
+    name = "morphological_dilation"
+
+    def __init__(self, kernel_size=(5, 5)):
+        self.kernel = np.ones(_kernel_size(kernel_size), np.uint8)
+
+    def apply(self, src, dst):
+        return cv2.dilate(src, self.kernel, dst, iterations=1)
+
+
+class MorphologicalClosing(PreprocessingStep):
+    name = "morphological_closing"
+
+    def __init__(self, kernel_size=(5, 5)):
+        self.kernel = np.ones(_kernel_size(kernel_size), np.uint8)
+
+    def apply(self, src, dst):
+        return cv2.morphologyEx(src, cv2.MORPH_CLOSE, self.kernel, dst)
+
+
+class SharpenImage(PreprocessingStep):
+    name = "sharpen_image"
+
+    kernel = np.array([[-1, -1, -1],
+                       [-1,  9, -1],
+                       [-1, -1, -1]])
+
+    def apply(self, src, dst):
+        return cv2.filter2D(src, -1, self.kernel, dst)
+
+
+class ConvertToHSV(PixelConversion):
+    name = "convert_to_hsv"
+    accepts = (BGR,)
+    code = cv2.COLOR_BGR2HSV
+
+    def output_space(self, space):
+        return HSV
+
+
+class TableChain:
+    """
+    Consecutive point-wise steps of one color space, composed into one table.
+
+    The statistics the steps need are measured once on the input (nothing,
+    its range, or its histogram) and carried through the tables of the steps
+    before, so the composed table is exact. A single step runs as itself. A
+    chain ending in a global threshold runs as one cv2.threshold, OpenCV's
+    fastest point-wise call: the tables before it are non-decreasing over the
+    values present, so the values they push over the threshold are the top ones.
+
+    Chains reading the histogram run their steps one by one, in place in the
+    output buffer, on images smaller than ``histogram_min_pixels``.
+    """
+
+    def __init__(self, steps, histogram_min_pixels=FUSED_HISTOGRAM_MIN_PIXELS):
+        self.steps = steps
+        last = steps[-1]
+        self.threshold = last if len(steps) > 1 and isinstance(last, GlobalThresholding) else None
+        self.table_steps = steps[:-1] if self.threshold is not None else steps
+        needed = [step.statistics for step in self.table_steps]
+        self.statistics = 'histogram' if 'histogram' in needed else 'range' if 'range' in needed else None
+        # The histogram is carried through the tables up to the last step reading it
+        self._histogram_steps = max((index + 1 for index, need in enumerate(needed) if need == 'histogram'), default=0)
+        self._table = self.table(None, 0, 255) if self.statistics is None else None
+        self.min_pixels = histogram_min_pixels if self.statistics == 'histogram' else 0
+
+    def table(self, histogram, low, high):
+        """Return the composed table of the steps (but a final threshold) for an input with this histogram and range."""
+        table = _RAMP
+        for index, step in enumerate(self.table_steps):
+            step_table = step.table(histogram, low, high)
+            table = step_table[0, table]
+            if index + 1 < self._histogram_steps:
+                histogram = np.bincount(step_table[0], weights=histogram, minlength=256).astype(np.int64)
+            low, high = int(step_table[0, low]), int(step_table[0, high])
+        return table
+
+    def measure(self, src):
+        """Return the (histogram, low, high) of ``src`` the steps need."""
+        if self.statistics is None:
+            return None, 0, 255
+        if self.statistics == 'histogram':
+            histogram = cv2.calcHist([src], [0], None, [256], [0, 256]).ravel().astype(np.int64)
+            present = np.flatnonzero(histogram)
+            return histogram, int(present[0]), int(present[-1])
+        # minMaxLoc reads one channel; the range of a color image covers all three
+        low, high = cv2.minMaxLoc(src)[:2] if src.ndim == 2 else (src.min(), src.max())
+        return None, int(low), int(high)
+
+    def apply(self, src, dst):
+        if len(self.steps) == 1 or src.size < self.min_pixels:
+            image = src
+            for step in self.steps:
+                image = step.apply(image, dst)
+            return image
+        histogram, low, high = self.measure(src)
+        table = self._table if self._table is not None else self.table(histogram, low, high)
+        if self.threshold is None:
+            return cv2.LUT(src, table, dst)
+        # The present values from low up to the cut are the ones the table keeps at or under the threshold
+        cut = low - 1 + np.count_nonzero(table[0, low:high + 1] <= self.threshold.thresh)
+        return cv2.threshold(src, cut, self.threshold.max_value, cv2.THRESH_BINARY, dst)[1]
+
+
+class FusedLookup(PreprocessingStep):
+    """
+    A run of point-wise steps, and the color conversions between them, run as few passes as possible.
+
+    The point-wise steps on each side of a conversion are composed into one
+    TableChain. A conversion is still a cvtColor: the steps before it change
+    every channel, so they are not equivalent to a table on its output. The
+    dialog's normalize, to gray, equalize and threshold thus run as normalize,
+    cvtColor and, on images large enough for the histogram to pay off, one
+    cv2.threshold at the value the equalized image would be cut at. The
+    intermediate images before the conversion are written to a buffer of the
+    step, the rest in place in the output buffer.
+    """
+
+    def __init__(self, steps):
+        self.steps = steps
+        self.name = "+".join(step.name for step in steps)
+        self.accepts = steps[0].accepts
+        # Table chains and the conversions between them, in order
+        groups = []
+        for step in steps:
+            if isinstance(step, PointwiseStep) and groups and isinstance(groups[-1], list):
+                groups[-1].append(step)
+            else:
+                groups.append([step] if isinstance(step, PointwiseStep) else step)
+        self.stages = [TableChain(group) if isinstance(group, list) else group for group in groups]
+        self._last_conversion = max((index for index, stage in enumerate(self.stages) if isinstance(stage, PixelConversion)),
+                                    default=-1)
+        self.vectorized = all(isinstance(stage, PixelConversion) or stage.statistics is None for stage in self.stages)
+        self._scratch = None
+
+    def output_space(self, space):
+        for step in self.steps:
+            space = step.output_space(space)
+        return space
+
+    def apply(self, src, dst):
+        image = src
+        for index, stage in enumerate(self.stages):
+            if index < self._last_conversion:
+                if self._scratch is None or self._scratch.shape != src.shape:
+                    self._scratch = np.empty_like(src)
+                image = stage.apply(image, self._scratch)
+            else:
+                image = stage.apply(image, dst)
+        return image
+
+    def apply_batch(self, src, dst):
+        if not self.vectorized:
+            return super().apply_batch(src, dst)
+        # Every table is fixed, so the whole stack goes through each stage at once
+        stacked = _stacked(src)
+        if self._scratch is None or self._scratch.shape != stacked.shape:
+            self._scratch = np.empty_like(stacked)
+        image = stacked
+        for index, stage in enumerate(self.stages):
+            image = stage.apply(image, self._scratch if index < self._last_conversion else _stacked(dst))
+        return dst
+
+
+# Steps that can be compiled from a settings dict, keyed by their name in the settings
+STEPS = {step.name: step for step in (
+    NormalizeImage, EnhanceContrast, GlobalThresholding, ReduceNoise, DetectEdges, AdaptiveHistogramEqualization,
+    AdaptiveThresholding, MorphologicalDilation, MorphologicalClosing, SharpenImage, ConvertToHSV,
+)}
+
+
+def fuse_pointwise(steps, min_steps=FUSED_LOOKUP_MIN_STEPS):
+    """
+    Replace every run of consecutive PointwiseSteps with a FusedLookup.
+
+    Color conversions between two point-wise steps, like the to gray conversion
+    put before histogram equalization, belong to the run. Runs with fewer than
+    ``min_steps`` point-wise steps are left as they are.
+    """
+    fused = []
+    run = []
+
+    def close_run():
+        # Conversions after the last point-wise step of the run stay outside of it
+        trailing = []
+        while run and not isinstance(run[-1], PointwiseStep):
+            trailing.insert(0, run.pop())
+        if sum(isinstance(step, PointwiseStep) for step in run) >= min_steps:
+            fused.append(FusedLookup(list(run)))
+        else:
+            fused.extend(run)
+        fused.extend(trailing)
+        run.clear()
+
+    for step in steps:
+        if isinstance(step, PointwiseStep) or (run and isinstance(step, PixelConversion)):
+            run.append(step)
+            continue
+        close_run()
+        fused.append(step)
+    close_run()
+    return fused
+
+
+def compile_steps(settings, input_space=BGR, fuse=True):
+    """
+    Turn a settings dict into the list of steps to run, in the order of the settings.
+
+    :param settings: {method name: parameters or None}, as PreprocessingSettingsDialog produces.
+    :param input_space: Color space of the frames the pipeline will receive.
+    :param fuse: Run consecutive point-wise steps as one lookup table (see FusedLookup).
+    :return: (steps, output color space).
+    :raises ValueError: For an unknown step, bad parameters, or a step that can't
+                        read the output of the step before it.
+    """
+    steps = []
+    space = input_space
+    for method, params in (settings or {}).items():
+        if method == "histogram_backprojection":
+            raise ValueError("histogram_backprojection needs a template image and can't be set from the settings")
+        if method not in STEPS:
+            raise ValueError(f"Unknown preprocessing method '{method}'. Known methods: {', '.join(STEPS)}")
+        params = {PARAMETER_ALIASES.get(key, key): value for key, value in (params or {}).items()}
+        try:
+            step = STEPS[method](**params)
+        except TypeError as error:
+            raise ValueError(f"Invalid parameters for {method}: {params} ({error})")
+
+        if step.gray_input and space == BGR:
+            steps.append(ToGray())
+            space = GRAY
+        if space not in step.accepts:
+            previous = steps[-1].name if steps else "the input"
+            raise ValueError(f"{method} can't read the {space.upper()} image produced by {previous}")
+        steps.append(step)
+        space = step.output_space(space)
+    return (fuse_pointwise(steps) if fuse else steps), space
+
+
+class PreprocessingPipeline:
+    """
+    Preprocessing steps compiled once from a settings dict and run on many frames.
+
+    The settings are validated when the pipeline is built. Kernels and the CLAHE
+    object are created once, and every step writes into an output buffer that
+    is allocated on the first frame and reused while the frame size stays the
+    same, so running the pipeline allocates nothing per frame. Chains of
+    point-wise steps (normalization, histogram equalization, global
+    thresholding) are fused into one lookup table or threshold pass (see FusedLookup).
+
+    The returned image is one of those buffers: it is overwritten by the next
+    call, so copy it (or pass ``out``) to keep it. A pipeline must not be shared
+    between threads.
+    """
+
+    def __init__(self, settings=None, input_space=BGR, fuse=True):
+        self.settings = dict(settings or {})
+        self.input_space = input_space
+        self.steps, self.output_space = compile_steps(self.settings, input_space, fuse)
+        self._input_shape = None
+        self._buffers = []
+        self._batch_shape = None
+        self._batch_buffers = []
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __call__(self, frame, out=None):
+        return self.apply(frame, out)
+
+    def apply(self, frame, out=None):
+        """
+        Run the steps on ``frame``.
+
+        :param frame: uint8 image in the pipeline's input color space.
+        :param out: Optional array to write the result to; must have the output shape.
+        :return: The preprocessed image (``frame`` itself when there are no steps).
+        """
+        if not self.steps:
+            return frame
+        if frame.dtype != np.uint8:
+            frame = (frame * 255).astype(np.uint8)
+        if frame.shape != self._input_shape:
+            self._allocate(frame.shape)
+
+        image = frame
+        last = len(self.steps) - 1
+        for index, (step, buffer) in enumerate(zip(self.steps, self._buffers)):
+            image = step.apply(image, out if index == last and out is not None else buffer)
+        return image
+
+    def apply_batch(self, frames, out=None):
+        """
+        Run the steps on a stack of images of the same size.
+
+        Pixel-wise steps (color conversions, global thresholding, fused lookup
+        tables that don't depend on the image) process the whole stack in one
+        call; the others loop over the items, writing into stacked buffers that
+        are reused from batch to batch. Like ``apply``, the result is a reused
+        buffer unless ``out`` is given.
+
+        :param frames: (N, H, W[, 3]) uint8 array, see stack_frames().
+        :param out: Optional array for the result, of shape (N,) + output_shape((H, W[, 3])).
+        :return: The (N, ...) preprocessed stack.
+        """
+        if not self.steps:
+            return frames
+        if frames.shape != self._batch_shape:
+            self._batch_buffers = [np.empty((len(frames),) + shape, dtype=np.uint8) for shape in self._shapes(frames.shape[1:])]
+            self._batch_shape = frames.shape
+
+        images = frames
+        last = len(self.steps) - 1
+        for index, (step, buffer) in enumerate(zip(self.steps, self._batch_buffers)):
+            dst = out if index == last and out is not None else buffer
+            images = step.apply_batch(images, dst)
+        return images
+
+    def output_shape(self, input_shape):
+        """Return the shape of the result for frames of ``input_shape``."""
+        return self._shapes(input_shape)[-1] if self.steps else input_shape
+
+    def _shapes(self, input_shape):
+        shapes = []
+        space = self.input_space
+        for step in self.steps:
+            space = step.output_space(space)
+            shapes.append(input_shape[:2] if space == GRAY else input_shape[:2] + (3,))
+        return shapes
+
+    def _allocate(self, input_shape):
+        self._buffers = [np.empty(shape, dtype=np.uint8) for shape in self._shapes(input_shape)]
+        self._input_shape = input_shape
+
+
+def stack_frames(frames, out=None):
+    """
+    Stack equally sized images into one contiguous (N, H, W[, 3]) array.
+
+    :param out: Optional preallocated array to stack into, reused between batches.
+    """
+    if out is None or out.shape != (len(frames),) + frames[0].shape:
+        out = np.empty((len(frames),) + frames[0].shape, dtype=np.uint8)
+    for index, frame in enumerate(frames):
+        out[index] = frame
+    return out
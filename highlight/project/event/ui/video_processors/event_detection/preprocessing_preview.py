@@ -0,0 +1,124 @@
+# preprocessing_preview.py
+
+import time
+from collections import namedtuple
+import cv2
+import numpy as np
+from .detector_registry import get_detector
+from .frame_context import FrameContext
+from .matching import MatchResult, NO_MATCH
+from .preprocessing_pipeline import BGR, compile_steps
+from .roi_preprocessing import settings_key
+from .template_manager import TemplateManager
+
+# Template scales (in percent) matched for the preview heatmap; a coarse subset of the detector scales
+HEATMAP_SCALES = (50, 75, 100, 125, 150, 200)
+
+# Output of one preprocessing method: the settings up to and including it, the image and its color space
+Stage = namedtuple('Stage', ['key', 'image', 'space'])
+
+
+class PreprocessingPreview:
+    """
+    Preprocessing settings and template matching run on one ROI, for tuning the settings.
+
+    Every method of the settings is a stage whose output is kept. When the
+    settings change, the stages before the first changed method are reused and
+    only the ones from there on are recomputed, so moving the slider of a late
+    step doesn't rerun CLAHE or morphology before it. The match heatmap is
+    cached the same way, on the settings that produced its input.
+
+    :param roi: BGR crop the settings are previewed on.
+    :param event_type: Template folder matched for the heatmap, or None for no heatmap.
+    :param scales: Template scales of the heatmap.
+    """
+
+    def __init__(self, roi, event_type=None, scales=HEATMAP_SCALES):
+        self.event_type = event_type
+        self.scales = scales
+        self.set_roi(roi)
+
+    @classmethod
+    def for_detector(cls, frame, detector_name, scales=HEATMAP_SCALES):
+        """Preview the settings on the ROI a registered detector reads in ``frame``, with its templates."""
+        spec = get_detector(detector_name)
+        return cls(FrameContext(frame).roi(spec.roi), spec.templates, scales)
+
+    def set_roi(self, roi):
+        """Preview on another crop (e.g. after seeking the video); every stage is recomputed."""
+        self.roi = roi
+        self.stages = []
+        self.recomputed = 0
+        self.milliseconds = 0.0
+        self._heatmap = None
+
+    def process(self, settings):
+        """
+        Return the ROI preprocessed with ``settings``.
+
+        Afterwards ``recomputed`` holds the number of stages that were run and
+        ``milliseconds`` the time they took.
+
+        :raises ValueError: For settings the pipeline compiler rejects (see compile_steps);
+                            the stages before the bad method stay cached.
+        """
+        start = time.perf_counter()
+        # Compiling the whole settings first reports errors with the step before the bad one
+        compile_steps(settings)
+        items = list(settings.items())
+        image, space = self.roi, BGR
+        self.recomputed = 0
+        for index, (method, params) in enumerate(items):
+            key = settings_key(dict(items[:index + 1]))
+            if index < len(self.stages) and self.stages[index].key == key:
+                _, image, space = self.stages[index]
+                continue
+
+            del self.stages[index:]
+            steps, space = compile_steps({method: params}, space)
+            # Without a destination every step writes a new image, leaving the cached outputs untouched
+            for step in steps:
+                image = step.apply(image, None)
+            self.stages.append(Stage(key, image, space))
+            self.recomputed += 1
+        del self.stages[len(items):]
+        self.milliseconds = (time.perf_counter() - start) * 1000
+        return image
+
+    def heatmap(self):
+        """
+        Return (scores, best MatchResult) of the templates matched against the ROI
+        preprocessed with the settings last given to ``process``.
+
+        ``scores`` has the size of the ROI: every pixel holds the best
+        TM_CCOEFF_NORMED score of a template centered on it, -1 where none fits.
+        The templates are matched in grayscale when the preprocessing leaves one channel.
+        """
+        processed = self.stages[-1].image if self.stages else self.roi
+        if self.event_type is None:
+            return None, NO_MATCH
+        template_set = TemplateManager.instance().get_template_set(self.event_type)
+        key = (self.stages[-1].key if self.stages else None, template_set.version)
+        if self._heatmap is not None and self._heatmap[0] == key:
+            return self._heatmap[1]
+
+        grayscale = processed.ndim == 2
+        pyramid = TemplateManager.instance().get_pyramid(self.event_type, self.scales, processed.shape, grayscale)
+        scores = np.full(processed.shape[:2], -1, dtype=np.float32)
+        best = NO_MATCH
+        for entry in pyramid.entries:
+            result = cv2.matchTemplate(processed, entry.image, cv2.TM_CCOEFF_NORMED)
+            height, width = entry.image.shape[:2]
+            centered = scores[height // 2:height // 2 + result.shape[0], width // 2:width // 2 + result.shape[1]]
+            np.maximum(centered, result, out=centered)
+            _, max_val, _, max_loc = cv2.minMaxLoc(result)
+            if max_val > best.score:
+                best = MatchResult(max_val, max_loc, entry.scale, entry.template_index)
+
+        self._heatmap = (key, (scores, best))
+        return scores, best
+
+
+def colorize_scores(scores):
+    """Return a BGR image of match scores, from blue at 0 or less to red at 1."""
+    return cv2.applyColorMap(np.uint8(np.clip(scores, 0, 1) * 255), cv2.COLORMAP_JET)
@@ -1,12 +1,38 @@
 import os
 import sys
-from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QCheckBox, QSlider, QLabel, QPushButton, QHBoxLayout, QToolTip)
-from PyQt5.QtCore import Qt
+import numpy as np
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QCheckBox, QSlider, QLabel, QPushButton, QHBoxLayout, QToolTip, QComboBox)
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QImage, QPixmap
 from .preprocess_handler import PreprocessingHandler
+from .preprocessing_preview import PreprocessingPreview, colorize_scores
+from .detector_registry import DETECTORS
 from . import preprocessing
 
+# Milliseconds without a settings change before the preview is rendered again
+PREVIEW_DEBOUNCE_MS = 150
+
+# Size the preview images are scaled up to fit in
+PREVIEW_SIZE = 320
+
+
+def to_pixmap(image):
+    """Convert a BGR or grayscale uint8 image to a QPixmap."""
+    image = np.ascontiguousarray(image)
+    height, width = image.shape[:2]
+    if image.ndim == 2:
+        q_img = QImage(image.data, width, height, width, QImage.Format_Grayscale8).copy()
+    else:
+        q_img = QImage(image.data, width, height, 3 * width, QImage.Format_RGB888).rgbSwapped()
+    return QPixmap.fromImage(q_img)
+
+
 class PreprocessingSettingsDialog(QDialog):
-    def __init__(self):
+    def __init__(self, frame=None, detector_name="down_event"):
+        """
+        :param frame: Current video frame; when given, a live preview of the settings on it is shown.
+        :param detector_name: Registered detector whose ROI and templates the preview starts with.
+        """
         super().__init__()
 
         layout = QVBoxLayout()
@@ -20,6 +46,7 @@ class PreprocessingSettingsDialog(QDialog):
             ("normalize_image", "Normalize the image to [0, 255] range."),
             ("reduce_noise", "Reduce noise using Gaussian blur. Adjust the kernel size; larger kernels will blur more, reducing more noise but also reducing detail."),
             ("enhance_contrast", "Enhance the contrast using histogram equalization."),
+            ("global_thresholding", "Turn the image black and white around a fixed threshold. Adjust the threshold."),
             ("adaptive_histogram_equalization", "Enhance contrast using adaptive histogram equalization. Adjust the tile grid size and clip limit."),
             ("adaptive_thresholding", "Apply adaptive thresholding. Adjust block size and C value."),
             ("detect_edges", "Detect edges using Canny edge detection. Adjust low and high thresholds."),
@@ -64,6 +91,15 @@ class PreprocessingSettingsDialog(QDialog):
                 layout.addWidget(kernel_size_slider)
                 self.widgets["kernel_size"] = kernel_size_slider
 
+            elif func_name == "global_thresholding":
+                thresh_slider = QSlider(Qt.Horizontal)
+                thresh_slider.setRange(0, 255)
+                thresh_slider.setValue(127)
+                thresh_slider.setToolTip("Adjust the threshold. Pixels brighter than it turn white, the others black.")
+                layout.addWidget(QLabel("Threshold:"))
+                layout.addWidget(thresh_slider)
+                self.widgets["thresh"] = thresh_slider
+
             # ... Add widgets for other functions as needed
 
         # Buttons
@@ -80,7 +116,73 @@ class PreprocessingSettingsDialog(QDialog):
         button_layout.addWidget(reset_button)
         layout.addLayout(button_layout)
 
-        self.setLayout(layout)
+        self.frame = frame
+        self.preview = None
+        if frame is None:
+            self.setLayout(layout)
+            return
+
+        # Preview pane: the processed ROI and the template match heatmap of the current frame
+        preview_layout = QVBoxLayout()
+        self.detector_combo_box = QComboBox()
+        self.detector_combo_box.setToolTip("Detector whose ROI and templates are previewed.")
+        self.detector_combo_box.addItems([name for name, spec in DETECTORS.items() if spec.templates])
+        self.detector_combo_box.setCurrentText(detector_name)
+        self.detector_combo_box.currentTextChanged.connect(self.select_preview_detector)
+        preview_layout.addWidget(self.detector_combo_box)
+        preview_layout.addWidget(QLabel("Processed ROI:"))
+        self.processed_label = QLabel()
+        preview_layout.addWidget(self.processed_label)
+        preview_layout.addWidget(QLabel("Match heatmap:"))
+        self.heatmap_label = QLabel()
+        preview_layout.addWidget(self.heatmap_label)
+        self.preview_status_label = QLabel()
+        self.preview_status_label.setWordWrap(True)
+        preview_layout.addWidget(self.preview_status_label)
+        preview_layout.addStretch()
+
+        main_layout = QHBoxLayout()
+        main_layout.addLayout(layout)
+        main_layout.addLayout(preview_layout)
+        self.setLayout(main_layout)
+
+        # Every change restarts the timer, so dragging a slider renders once it pauses
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(PREVIEW_DEBOUNCE_MS)
+        self.preview_timer.timeout.connect(self.update_preview)
+        for checkbox in self.checkboxes.values():
+            checkbox.stateChanged.connect(self.preview_timer.start)
+        for widget in self.widgets.values():
+            widget.valueChanged.connect(self.preview_timer.start)
+
+        self.select_preview_detector(self.detector_combo_box.currentText())
+
+    def select_preview_detector(self, detector_name):
+        """Preview on the ROI of another detector; its stages start over."""
+        self.preview = PreprocessingPreview.for_detector(self.frame, detector_name)
+        self.update_preview()
+
+    def update_preview(self):
+        """Render the current settings on the preview ROI, recomputing only the stages after the first change."""
+        if self.preview is None:
+            return
+        settings = self.get_selected_settings()
+        try:
+            processed = self.preview.process(settings)
+        except ValueError as error:
+            # Keep the last valid preview on screen
+            self.preview_status_label.setText(str(error))
+            return
+        scores, best = self.preview.heatmap()
+
+        self.processed_label.setPixmap(to_pixmap(processed).scaled(PREVIEW_SIZE, PREVIEW_SIZE, Qt.KeepAspectRatio))
+        if scores is not None:
+            self.heatmap_label.setPixmap(to_pixmap(colorize_scores(scores)).scaled(PREVIEW_SIZE, PREVIEW_SIZE, Qt.KeepAspectRatio))
+        status = f"{self.preview.recomputed} of {len(settings)} steps recomputed in {self.preview.milliseconds:.1f} ms"
+        if best.location is not None:
+            status += f", best match {best.score:.2f} at {best.scale}%"
+        self.preview_status_label.setText(status)
 
     def reset_to_default(self):
         """Reset settings to default values."""
@@ -92,6 +194,8 @@ class PreprocessingSettingsDialog(QDialog):
             self.widgets["C_value"].setValue(2)
         if "kernel_size" in self.widgets:
             self.widgets["kernel_size"].setValue(5)
+        if "thresh" in self.widgets:
+            self.widgets["thresh"].setValue(127)
         # ... Reset other settings to their default values
 
     def get_selected_settings(self):
@@ -110,6 +214,13 @@ class PreprocessingSettingsDialog(QDialog):
                 kernel_size = self.widgets["kernel_size"].value()
                 settings[method] = {"kernel_size": kernel_size}
 
+            elif method == "global_thresholding":
+                settings[method] = {"thresh": self.widgets["thresh"].value()}
+
+            # Methods without sliders (normalize, enhance contrast, ...) run with their defaults
+            else:
+                settings[method] = {}
+
           # Add more conditions for other methods as needed...
             # For instance:
             # elif method == "another_method_name":
@@ -1,13 +1,14 @@
 #center_region.py
 import cv2
+from ..frame_context import FrameContext
 
 class CenterRegion:
     @staticmethod
     def get_roi(frame, grayscale=True):
-        """Extract the center region of interest (ROI) from the frame."""
-        top_left_x, top_left_y, bottom_right_x, bottom_right_y = 900, 440, 1140, 730
-        roi = frame[top_left_y:bottom_right_y, top_left_x:bottom_right_x]
+        """Extract the center region of interest (ROI) from the frame or FrameContext."""
+        context = FrameContext.wrap(frame)
+        top_left_x, top_left_y, _, _ = context.box('center_region')
         
         if grayscale:
-            return cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY), (top_left_x, top_left_y)
-        return roi, (top_left_x, top_left_y)
+            return context.gray('center_region'), (top_left_x, top_left_y)
+        return context.roi('center_region'), (top_left_x, top_left_y)
@@ -6,14 +6,21 @@ import os  # Library for interacting with the operating system
 # This can be useful if you want to import modules from the parent directory.
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-# Define a function to get the center region of interest (ROI) from a video frame
+from ..frame_context import FrameContext  # Shared per-frame ROI cache
+from .roi_registry import get_roi_box  # Resolution independent ROI boxes
+
+# Define a function to get the center region of interest (ROI) from a video frame or FrameContext
 def get_center_roi(frame):
-    # Define the top-left and bottom-right coordinates of the ROI
-    top_left = (950, 525)
-    bottom_right = (1100, 715)
+    # Resolve the top-left and bottom-right coordinates of the ROI for this frame's resolution
+    x_start, y_start, x_end, y_end = get_roi_box('center', frame.shape)
+    top_left = (x_start, y_start)
+    bottom_right = (x_end, y_end)
     
-    # Extract the ROI from the frame using the defined coordinates
-    roi = frame[top_left[1]:bottom_right[1], top_left[0]:bottom_right[0]]
+    # Extract the ROI from the frame using the defined coordinates, registering it as "center" on a FrameContext
+    if isinstance(frame, FrameContext):
+        roi = frame.roi('center')
+    else:
+        roi = frame[top_left[1]:bottom_right[1], top_left[0]:bottom_right[0]]
     
     # Return the extracted ROI and its coordinates
     return roi, top_left, bottom_right
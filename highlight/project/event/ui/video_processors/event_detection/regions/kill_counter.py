@@ -1,27 +1,36 @@
 # kill_counter.py
+import re
 import cv2
+import pytesseract
+from ..frame_context import FrameContext
+from .roi_registry import get_roi_box
 
 class KillCounter:
     def __init__(self):
         pass
 
-    def _get_roi_gray(self, frame, coords):
-        x_start, y_start, x_end, y_end = coords
-        roi = frame[y_start:y_end, x_start:x_end]
-        return cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+    def _get_roi_gray(self, frame, roi_name):
+        # The grayscale crop is shared with other detectors through the FrameContext
+        return FrameContext.wrap(frame).gray(roi_name)
 
     def detect_kill_event(self, frame):
-        # Define the kill_counter region
-        kill_counter_coords = (1685, 5, 1910, 100)
-        kill_counter_gray = self._get_roi_gray(frame, kill_counter_coords)
+        # The kill_counter region is defined in the ROI registry
+        kill_counter_gray = self._get_roi_gray(frame, 'kill_counter')
 
         # Here, you can add the template matching or any other logic specific to the kill_counter region
         # For now, I'm just returning the grayscale ROI for the kill_counter
         return kill_counter_gray
 
+    def read_kill_count(self, frame):
+        """Read the number shown in the kill_counter region, or None if no digits are found."""
+        kill_counter_gray = self._get_roi_gray(frame, 'kill_counter')
+        text = pytesseract.image_to_string(kill_counter_gray, config='--psm 7 -c tessedit_char_whitelist=0123456789')
+        digits = re.findall(r'\d+', text)
+        return int(digits[0]) if digits else None
+
     def visualize_roi(self, frame):
         """Visualize the kill_counter ROI on the frame."""
-        x_start, y_start, x_end, y_end = (1685, 5, 1910, 100)
+        x_start, y_start, x_end, y_end = get_roi_box('kill_counter', frame.shape)
         cv2.rectangle(frame, (x_start, y_start), (x_end, y_end), (0, 255, 0), 2)
         cv2.putText(frame, "kill_counter", (x_start, y_start - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
 
@@ -1,6 +1,8 @@
 #kill_feed_extractor.py
 import os
 import cv2
+import pytesseract
+from ..frame_context import FrameContext
 
 class KillFeedExtractor:
 
@@ -11,16 +13,14 @@ class KillFeedExtractor:
         """
         Extract the kill feed region of interest (ROI) from the frame and return the ROI and its grayscale version.
         """
-        # Define the coordinates for the kill feed ROI
-        x_start, y_start, x_end, y_end = (5, 500, 435, 830)
-        roi = frame[y_start:y_end, x_start:x_end]
-        roi_gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-        return roi, roi_gray
+        # The kill feed coordinates are defined in the ROI registry
+        context = FrameContext.wrap(frame)
+        return context.roi('kill_feed'), context.gray('kill_feed')
 
     def extract_text_from_frame(self, frame):
         """
         Extract text from the kill feed ROI of the frame.
         """
         roi_gray = self.extract_kill_feed(frame)[1]
-        text = cv2.image_to_string(roi_gray)
+        text = pytesseract.image_to_string(roi_gray)
         return text
@@ -2,22 +2,19 @@
 import os
 import cv2
 import pytesseract
+from ..frame_context import FrameContext
 
 class KillNotificationText:
     def __init__(self):
         pass
 
-    def _get_roi_gray(self, frame, coords):
-        x_start, y_start, x_end, y_end = coords
-        roi = frame[y_start:y_end, x_start:x_end]
-        return cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+    def _get_roi_gray(self, frame, roi_name):
+        # The grayscale crop is shared with other detectors through the FrameContext
+        return FrameContext.wrap(frame).gray(roi_name)
 
     def extract_kill_notification_text(self, frame):
-        # Define the ROI coordinates for kill_notification_text
-        coords = (520, 880, 1385, 960)
-        
-        # Extract the grayscale ROI
-        roi_gray = self._get_roi_gray(frame, coords)
+        # Extract the grayscale ROI; its coordinates are defined in the ROI registry
+        roi_gray = self._get_roi_gray(frame, 'kill_notification')
         
         # Extract text using Tesseract
         text = pytesseract.image_to_string(roi_gray)
@@ -0,0 +1,53 @@
+# roi_registry.py
+
+from functools import lru_cache
+
+# Resolution the HUD boxes were originally measured on
+BASE_RESOLUTION = (1920, 1080)
+
+# Normalized (x_start, y_start, x_end, y_end) boxes, as fractions of the frame width and height
+ROI_REGISTRY = {}
+
+
+def register_roi(name, box, resolution=BASE_RESOLUTION):
+    """
+    Register a named ROI.
+
+    :param name: Name the detectors use to refer to the ROI.
+    :param box: (x_start, y_start, x_end, y_end) in pixels of ``resolution``,
+                or already normalized to 0..1 when ``resolution`` is None.
+    :param resolution: (width, height) the pixel box was measured on.
+    """
+    if resolution is not None:
+        width, height = resolution
+        box = (box[0] / width, box[1] / height, box[2] / width, box[3] / height)
+    ROI_REGISTRY[name] = tuple(box)
+    resolve_roi.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def resolve_roi(name, width, height):
+    """Return the pixel (x_start, y_start, x_end, y_end) box of a named ROI for a frame size."""
+    if name not in ROI_REGISTRY:
+        raise KeyError(f"Unknown ROI '{name}'. Registered ROIs: {', '.join(sorted(ROI_REGISTRY))}")
+    x_start, y_start, x_end, y_end = ROI_REGISTRY[name]
+    return (round(x_start * width), round(y_start * height), round(x_end * width), round(y_end * height))
+
+
+def get_roi_box(name, frame_shape):
+    """Return the pixel box of a named ROI for a frame of the given (height, width[, channels]) shape."""
+    return resolve_roi(name, frame_shape[1], frame_shape[0])
+
+
+# Down and shield-break icons in the middle of the screen
+register_roi('center', (950, 525, 1100, 715))
+# Wider center area used by CenterRegion and the older shield-break detector
+register_roi('center_region', (900, 440, 1140, 730))
+# Kill marker around the crosshair
+register_roi('kill_center', (0.45, 0.45, 0.55, 0.55), resolution=None)
+# Kill counter in the top right corner
+register_roi('kill_counter', (1685, 5, 1910, 100))
+# "KILLED:" notification text above the bottom HUD
+register_roi('kill_notification', (520, 880, 1385, 960))
+# Kill feed on the left edge
+register_roi('kill_feed', (5, 500, 435, 830))
@@ -0,0 +1,158 @@
+# result_cache.py
+
+import hashlib
+import json
+import os
+import shutil
+import cv2
+from .score_timeline import ScoreTimeline
+
+# Default location and disk budget of the detection result cache
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.highlight', 'cache')
+DEFAULT_CACHE_BUDGET = 2 * 1024 ** 3
+
+# Frames decoded across the video for its fingerprint
+FINGERPRINT_SAMPLES = 8
+
+EVENTS_FILE = 'events.json'
+TIMELINE_SUBDIR = 'timeline'
+
+# Fingerprints already computed in this process, keyed by (path, size, mtime)
+_fingerprints = {}
+
+
+def video_fingerprint(video_path, samples=FINGERPRINT_SAMPLES):
+    """
+    Return a content hash of a video.
+
+    The file size, frame count and frame rate are hashed together with small
+    grayscale thumbnails of ``samples`` frames spread over the video. Only a
+    few frames are decoded, so it is cheap on multi-hour recordings, and it
+    doesn't change when the file is renamed or copied.
+    """
+    stat = os.stat(video_path)
+    memo_key = (os.path.abspath(video_path), stat.st_size, stat.st_mtime_ns)
+    if memo_key in _fingerprints:
+        return _fingerprints[memo_key]
+
+    cap = cv2.VideoCapture(video_path)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    content = hashlib.sha1(f"{stat.st_size}:{frame_count}:{fps:.3f}".encode())
+    for index in range(samples):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_count * (index + 1) // (samples + 1))
+        ret, frame = cap.read()
+        if ret:
+            thumbnail = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (32, 18), interpolation=cv2.INTER_AREA)
+            content.update(thumbnail.tobytes())
+    cap.release()
+
+    _fingerprints[memo_key] = content.hexdigest()
+    return _fingerprints[memo_key]
+
+
+def config_key(config):
+    """Return a short stable hash of a JSON-serializable configuration."""
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
+
+class CacheEntry:
+    """A cached scan: its score timeline and the detections and intervals found at the scan threshold."""
+
+    def __init__(self, path, timeline, events):
+        self.path = path
+        self.timeline = timeline
+        self.events = events
+
+
+class ResultCache:
+    """
+    Content-addressed cache of detection results with LRU eviction.
+
+    Each entry is a directory named after the video fingerprint and a hash of
+    the detector configuration (templates, matcher, preprocessing settings...),
+    holding the ScoreTimeline and an events.json. Reading an entry refreshes its
+    modification time; after every store the least recently used entries are
+    removed until the cache fits in ``budget_bytes``.
+    """
+
+    def __init__(self, root=CACHE_DIR, budget_bytes=DEFAULT_CACHE_BUDGET):
+        self.root = root
+        self.budget_bytes = budget_bytes
+
+    def path_for(self, video_path, config):
+        return os.path.join(self.root, f"{video_fingerprint(video_path)}_{config_key(config)}")
+
+    def get(self, video_path, config):
+        """Return the CacheEntry of a video and configuration, or None on a miss."""
+        path = self.path_for(video_path, config)
+        events_path = os.path.join(path, EVENTS_FILE)
+        if not os.path.exists(events_path):
+            return None
+        timeline = ScoreTimeline.load(os.path.join(path, TIMELINE_SUBDIR))
+        try:
+            with open(events_path) as file:
+                events = json.load(file)
+        except (OSError, json.JSONDecodeError):
+            events = None
+        if timeline is None or events is None:
+            print(f"Warning: Discarding damaged cache entry {path}")
+            shutil.rmtree(path, ignore_errors=True)
+            return None
+        os.utime(path)
+        return CacheEntry(path, timeline, events)
+
+    def put(self, video_path, config, timeline, events):
+        """
+        Store a scan.
+
+        :param timeline: The ScoreTimeline of the scan.
+        :param events: JSON-serializable detections and intervals at the scan threshold.
+        :return: The entry directory.
+        """
+        path = self.path_for(video_path, config)
+        # Write next to the final directory and rename it into place, so readers never see half an entry
+        temp_path = f"{path}.tmp{os.getpid()}"
+        shutil.rmtree(temp_path, ignore_errors=True)
+        timeline.save(os.path.join(temp_path, TIMELINE_SUBDIR))
+        with open(os.path.join(temp_path, EVENTS_FILE), 'w') as file:
+            json.dump(dict(events, video=os.path.abspath(video_path), config=config), file)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(temp_path, path)
+        self.evict(keep=path)
+        return path
+
+    def entries(self):
+        """Return (last_used, size_bytes, path) of every complete entry, least recently used first."""
+        if not os.path.isdir(self.root):
+            return []
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if not os.path.exists(os.path.join(path, EVENTS_FILE)):
+                continue
+            size = sum(os.path.getsize(os.path.join(directory, file))
+                       for directory, _, files in os.walk(path) for file in files)
+            entries.append((os.path.getmtime(path), size, path))
+        return sorted(entries)
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep=None):
+        """Remove least recently used entries until the cache fits in the budget; ``keep`` is never removed."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.budget_bytes:
+                break
+            if path == keep:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            print(f"Evicted {path} from the result cache")
+        return total
+
+    def clear(self):
+        for _, _, path in self.entries():
+            shutil.rmtree(path, ignore_errors=True)
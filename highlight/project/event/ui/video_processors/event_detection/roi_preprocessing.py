@@ -0,0 +1,151 @@
+# roi_preprocessing.py
+
+import json
+import threading
+import cv2
+from .frame_context import FrameContext
+from .preprocessing_pipeline import PreprocessingPipeline
+
+
+def settings_key(settings):
+    """Return a hashable key of a preprocessing settings dict; the order of the steps is kept, since it matters."""
+    return json.dumps([[method, params or {}] for method, params in settings.items()], sort_keys=True)
+
+
+def _overlap(box, other):
+    return box[0] < other[2] and other[0] < box[2] and box[1] < other[3] and other[1] < box[3]
+
+
+def _union(box, other):
+    return (min(box[0], other[0]), min(box[1], other[1]), max(box[2], other[2]), max(box[3], other[3]))
+
+
+def merge_boxes(boxes):
+    """Return the bounding boxes of the groups of overlapping boxes."""
+    merged = []
+    for box in boxes:
+        # Grow the box until it overlaps none of the boxes kept so far
+        overlapping = [other for other in merged if _overlap(box, other)]
+        while overlapping:
+            for other in overlapping:
+                merged.remove(other)
+                box = _union(box, other)
+            overlapping = [other for other in merged if _overlap(box, other)]
+        merged.append(box)
+    return merged
+
+
+class PreprocessedContext(FrameContext):
+    """
+    View of a FrameContext in which some ROIs read as their preprocessed pixels.
+
+    ``roi(name)`` returns the preprocessed crop for the overridden ROIs, and the
+    gray, HSV and downscaled variants are derived from it. Boxes, the frame
+    number and the change signatures come from the underlying context, so
+    change gates still compare the raw pixels and skip the preprocessing too.
+    """
+
+    def __init__(self, context, preprocess):
+        super().__init__(context.frame, context.frame_number)
+        self.context = context
+        self._boxes = context._boxes
+        # {roi name: callable returning the preprocessed crop}
+        self._preprocess = preprocess
+
+    def roi(self, name, box=None):
+        if name not in self._preprocess:
+            return self.context.roi(name, box)
+        return self._get((name, 'bgr'), box, self._preprocess[name])
+
+    def gray(self, name, box=None):
+        if name not in self._preprocess:
+            return self.context.gray(name, box)
+        # Steps like thresholding or edge detection already leave a single channel
+        return self._get((name, 'gray'), box, lambda: self._to_gray(self.roi(name)))
+
+    def hsv(self, name, box=None):
+        if name not in self._preprocess:
+            return self.context.hsv(name, box)
+        return super().hsv(name, box)
+
+    def downscaled(self, name, factor, grayscale=False, box=None):
+        if name not in self._preprocess:
+            return self.context.downscaled(name, factor, grayscale, box)
+        return super().downscaled(name, factor, grayscale, box)
+
+    def signature(self, name, size=(16, 16), box=None):
+        return self.context.signature(name, size, box)
+
+    @staticmethod
+    def _to_gray(image):
+        return image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+class RoiPreprocessing:
+    """
+    Preprocessing declared per detector, run only on the pixels each detector reads.
+
+    On each frame the settings of a detector run over its ROI only. When ROIs
+    of detectors with the same settings overlap, the settings run once over
+    their bounding box and every detector gets its slice, so pixels read by
+    several detectors are processed once. The results are cached on the frame's
+    FrameContext. Every preprocessed box has its own compiled
+    PreprocessingPipeline, whose buffers keep their size from frame to frame.
+
+    The preprocessed crops are pipeline buffers, valid until the same ROIs of the
+    next frame are preprocessed.
+
+    :param settings: {detector name: preprocessing settings} (see PreprocessingHandler).
+    :param rois: {detector name: ROI name} of the detectors in ``settings``.
+    """
+
+    def __init__(self, settings, rois):
+        self.settings = {name: dict(detector_settings) for name, detector_settings in settings.items() if detector_settings}
+        self.rois = {name: rois[name] for name in self.settings}
+        # Compiling once up front reports bad settings before the scan starts
+        for detector_settings in self.settings.values():
+            PreprocessingPipeline(detector_settings)
+        # {(settings key, box): PreprocessingPipeline}
+        self.pipelines = {}
+        self._groups = {}
+        self._lock = threading.Lock()
+
+    def __bool__(self):
+        return bool(self.settings)
+
+    def config(self):
+        """Return the settings as part of a scan configuration (see AutoEventDetector.timeline_config)."""
+        return {name: {"roi": self.rois[name], "settings": self.settings[name]} for name in sorted(self.settings)}
+
+    def context_for(self, detector_name, context):
+        """Return the context ``detector_name`` should read: a PreprocessedContext, or ``context`` when it has no preprocessing."""
+        if detector_name not in self.settings:
+            return context
+        roi_name = self.rois[detector_name]
+        key = settings_key(self.settings[detector_name])
+        return PreprocessedContext(context, {roi_name: lambda: self.crop(context, roi_name, key)})
+
+    def crop(self, context, roi_name, key):
+        """Return the preprocessed pixels of ``roi_name``, cut from the preprocessed box covering it."""
+        x_start, y_start, x_end, y_end = context.box(roi_name)
+        union = self.union_box(context, roi_name, key)
+        processed = context.cached(('preprocessed', union, key), lambda: self.preprocess(context, union, key))
+        return processed[y_start - union[1]:y_end - union[1], x_start - union[0]:x_end - union[0]]
+
+    def preprocess(self, context, box, key):
+        x_start, y_start, x_end, y_end = box
+        # The pipeline's buffers are shared by every frame; detectors may run on several threads
+        with self._lock:
+            if (key, box) not in self.pipelines:
+                self.pipelines[(key, box)] = PreprocessingPipeline(dict(json.loads(key)))
+            return self.pipelines[(key, box)].apply(context.frame[y_start:y_end, x_start:x_end])
+
+    def union_box(self, context, roi_name, key):
+        """Return the bounding box of the overlapping ROIs using the same settings as ``roi_name``."""
+        group_key = (key, context.shape[:2])
+        if group_key not in self._groups:
+            boxes = sorted({context.box(self.rois[name]) for name, detector_settings in self.settings.items()
+                            if settings_key(detector_settings) == key})
+            self._groups[group_key] = merge_boxes(boxes)
+        box = context.box(roi_name)
+        return next(union for union in self._groups[group_key] if union == box or _overlap(box, union))
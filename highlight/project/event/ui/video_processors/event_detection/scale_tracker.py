@@ -0,0 +1,196 @@
+# scale_tracker.py
+
+import contextlib
+import json
+import os
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Sidecar file written next to the videos, holding scale hit counts per resolution and event type
+SCALE_STATS_FILE = 'scale_stats.json'
+
+# Serializes saves between the threads of one process (the ingest pipeline scans several videos at once);
+# saves from other processes (the batch runner's worker pool) are serialized by locking a sidecar file
+_save_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def _file_lock(path):
+    """Hold an exclusive OS lock on ``path`` (created if needed), shared by every process on the machine."""
+    with open(path, 'a+') as file:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        else:
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class ScaleStatsStore:
+    """
+    Read and write the per-resolution scale statistics sidecar file.
+
+    Several scans can share the file, from threads or processes. ``save``
+    locks ``<file>.lock``, re-reads the file, only replaces the entries this
+    store changed, and writes it atomically, so concurrent scans neither
+    truncate it nor drop each other's statistics.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.stats = self._load()
+        # (resolution, event type) entries changed since the file was read
+        self._changed = set()
+
+    @classmethod
+    def for_video(cls, video_path):
+        """Return the store kept alongside the given video."""
+        return cls(os.path.join(os.path.dirname(os.path.abspath(video_path)), SCALE_STATS_FILE))
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r') as file:
+                return json.load(file)
+        except (OSError, json.JSONDecodeError):
+            print(f"Warning: Could not read scale statistics from {self.path}")
+            return {}
+
+    def get_hits(self, resolution, event_type):
+        """Return the {scale: hits} counts recorded for a resolution and event type."""
+        hits = self.stats.get(resolution, {}).get(event_type, {})
+        return {int(scale): count for scale, count in hits.items()}
+
+    def set_hits(self, resolution, event_type, hits):
+        self.stats.setdefault(resolution, {})[event_type] = {str(scale): count for scale, count in sorted(hits.items())}
+        self._changed.add((resolution, event_type))
+
+    def save(self):
+        with _save_lock, _file_lock(self.path + '.lock'):
+            stats = self._load()
+            for resolution, event_type in self._changed:
+                stats.setdefault(resolution, {})[event_type] = self.stats[resolution][event_type]
+            # Write next to the file and rename it into place, so readers never see half a file
+            handle, temp_path = tempfile.mkstemp(prefix=SCALE_STATS_FILE, dir=os.path.dirname(self.path) or '.')
+            try:
+                with os.fdopen(handle, 'w') as file:
+                    json.dump(stats, file, indent=2)
+                os.replace(temp_path, self.path)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+            self.stats = stats
+            self._changed = set()
+
+
+class ScaleTracker:
+    """
+    Learn which template scales produce confident hits and narrow the search to them.
+
+    The full scale range is searched until ``warmup`` confident detections were
+    seen. From then on only the hit scales, padded by ``band`` steps on either
+    side, are searched. A match scoring between ``widen_threshold`` and
+    ``confidence`` suggests the icon may be at a scale outside the band, so that
+    frame is re-searched over the full range; after ``miss_limit`` such frames in
+    a row the tracker unlocks and learns the scales again.
+    """
+
+    def __init__(self, event_type, scales, resolution=None, store=None, warmup=20,
+                 band=1, confidence=0.8, widen_threshold=0.5, miss_limit=10):
+        self.event_type = event_type
+        self.scales = list(scales)
+        self.resolution = resolution
+        self.store = store
+        self.warmup = warmup
+        self.band = band
+        self.confidence = confidence
+        self.widen_threshold = widen_threshold
+        self.miss_limit = miss_limit
+
+        self.hits = {}
+        self.detections = 0
+        self.near_misses = 0
+        self.band_scales = None
+
+        if store is not None and resolution is not None:
+            self.hits = store.get_hits(resolution, event_type)
+            self.detections = sum(self.hits.values())
+            if self.detections >= self.warmup:
+                self._lock()
+
+    @property
+    def locked(self):
+        return self.band_scales is not None
+
+    def active_scales(self):
+        """Return the scales that should be searched on the next frame."""
+        return self.band_scales if self.locked else self.scales
+
+    def match(self, roi, get_pyramid, matcher, downscale=None):
+        """
+        Match ``roi`` over the active scales, widening to the full range on low confidence.
+
+        :param roi: The region of interest to search.
+        :param get_pyramid: Callable returning a TemplatePyramid for a list of scales.
+        :param matcher: The matching engine to use.
+        :param downscale: Optional shared ROI downscaler passed on to the matcher.
+        :return: The best MatchResult.
+        """
+        match = matcher.match(roi, get_pyramid(self.active_scales()), downscale)
+        if self.locked and self.widen_threshold <= match.score < self.confidence:
+            wide_match = matcher.match(roi, get_pyramid(self.scales), downscale)
+            if wide_match.score > match.score:
+                match = wide_match
+        self.record(match)
+        return match
+
+    def record(self, match):
+        """Update the statistics with the best match of a frame."""
+        if match.score >= self.confidence and match.scale is not None:
+            self.hits[match.scale] = self.hits.get(match.scale, 0) + 1
+            self.detections += 1
+            self.near_misses = 0
+            if not self.locked and self.detections >= self.warmup:
+                self._lock()
+            elif self.locked and match.scale not in self.band_scales:
+                self._lock()
+        elif self.locked and match.score >= self.widen_threshold:
+            self.near_misses += 1
+            if self.near_misses >= self.miss_limit:
+                self.unlock()
+
+    def unlock(self):
+        """Go back to searching every scale until ``warmup`` new confident detections were seen."""
+        print(f"Scale tracker for {self.event_type}: confidence dropped, searching all scales again.")
+        self.band_scales = None
+        self.detections = 0
+        self.near_misses = 0
+
+    def save(self):
+        """Persist the hit counts to the sidecar store."""
+        if self.store is not None and self.resolution is not None and self.hits:
+            self.store.set_hits(self.resolution, self.event_type, self.hits)
+            self.store.save()
+
+    def _lock(self):
+        indices = [self.scales.index(scale) for scale in self.hits if scale in self.scales]
+        if not indices:
+            return
+        first = max(0, min(indices) - self.band)
+        last = min(len(self.scales), max(indices) + self.band + 1)
+        self.band_scales = self.scales[first:last]
+        print(f"Scale tracker for {self.event_type}: narrowed search to scales {self.band_scales}.")
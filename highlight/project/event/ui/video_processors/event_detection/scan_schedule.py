@@ -0,0 +1,55 @@
+# scan_schedule.py
+
+
+class ScanPolicy:
+    """
+    How the adaptive scan treats one event type.
+
+    :param interest: Score at which a coarse sample is worth a closer look; keep
+                     it well below the detection threshold so the rising edge of
+                     an event isn't missed between two samples.
+    :param padding: Frames re-scanned densely on each side of an interesting
+                    sample; defaults to the coarse stride, which covers the whole
+                    gap to the neighbouring samples.
+    """
+
+    def __init__(self, interest=0.5, padding=None):
+        self.interest = interest
+        self.padding = padding
+
+
+DEFAULT_SCAN_POLICIES = {
+    "down_event": ScanPolicy(interest=0.5),
+    "shield_break_event": ScanPolicy(interest=0.5),
+}
+
+
+def plan_dense_windows(samples, coarse_stride, policies=None, frame_count=None):
+    """
+    Return the (start_frame, end_frame) ranges to re-scan frame by frame.
+
+    :param samples: Iterable of (frame_number, {event_type: score or MatchResult}) from the coarse pass.
+    :param coarse_stride: Frames between two coarse samples.
+    :param policies: Dict of ScanPolicy keyed by event type; missing types use DEFAULT_SCAN_POLICIES.
+    :param frame_count: Number of frames in the video, to clip the last window.
+    :return: Sorted, non-overlapping ranges; end_frame is exclusive.
+    """
+    policies = dict(DEFAULT_SCAN_POLICIES, **(policies or {}))
+    windows = []
+    for frame_number, scores in samples:
+        padding = 0
+        for event_type, score in scores.items():
+            policy = policies.get(event_type)
+            if policy is not None and getattr(score, 'score', score) >= policy.interest:
+                padding = max(padding, coarse_stride if policy.padding is None else policy.padding)
+        if padding:
+            end = frame_number + padding
+            windows.append((max(0, frame_number - padding + 1), end if frame_count is None else min(end, frame_count)))
+
+    merged = []
+    for start, end in sorted(windows):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
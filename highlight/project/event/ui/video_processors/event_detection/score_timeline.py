@@ -0,0 +1,122 @@
+# score_timeline.py
+
+import json
+import os
+import numpy as np
+from .event_intervals import EventAggregator
+
+
+class TimelineRecorder:
+    """Collect the best match of every detector on every scanned frame."""
+
+    def __init__(self):
+        self.event_types = None
+        self.rows = {}
+
+    def add(self, frame_number, matches):
+        """Record the {event_type: MatchResult} of a frame; a frame scanned twice keeps its last scores."""
+        if self.event_types is None:
+            self.event_types = list(matches)
+        self.rows[frame_number] = matches
+
+    def __len__(self):
+        return len(self.rows)
+
+    def build(self, fps, frame_interval_ms, config=None):
+        """Return the recorded scores as a ScoreTimeline ordered by frame."""
+        event_types = self.event_types or []
+        frames = np.array(sorted(self.rows), dtype=np.int64)
+        scores = np.full((len(frames), len(event_types)), -1.0, dtype=np.float32)
+        locations = np.full((len(frames), len(event_types), 2), -1, dtype=np.int32)
+        for row, frame_number in enumerate(frames):
+            matches = self.rows[frame_number]
+            for column, event_type in enumerate(event_types):
+                match = matches.get(event_type)
+                if match is not None and match.location is not None:
+                    scores[row, column] = match.score
+                    locations[row, column] = match.location
+        return ScoreTimeline(event_types, frames, scores, locations, fps, frame_interval_ms, config)
+
+
+class ScoreTimeline:
+    """
+    Raw best-match score and location of every detector on every scanned frame.
+
+    The columns are stored as .npy files next to a meta.json (see ResultCache
+    for where) and loaded as memory maps, so thresholding a whole match only
+    touches the score column.
+    Missing matches have a score of -1 and a location of (-1, -1).
+    """
+
+    META_FILE = 'meta.json'
+
+    def __init__(self, event_types, frames, scores, locations, fps, frame_interval_ms, config=None):
+        self.event_types = list(event_types)
+        self.frames = frames
+        self.scores = scores
+        self.locations = locations
+        self.fps = fps
+        self.frame_interval_ms = frame_interval_ms
+        self.config = config or {}
+
+    def __len__(self):
+        return len(self.frames)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load a timeline directory, or return None if it is missing or incomplete."""
+        meta_path = os.path.join(path, cls.META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path) as file:
+                meta = json.load(file)
+            mode = 'r' if mmap else None
+            columns = [np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode) for name in ('frames', 'scores', 'locations')]
+        except (OSError, ValueError):
+            print(f"Warning: Could not read score timeline from {path}")
+            return None
+        return cls(meta["event_types"], *columns, meta["fps"], meta["frame_interval_ms"], meta.get("config"))
+
+    def save(self, path):
+        """Write the timeline; meta.json goes last so a partly written directory is never loaded."""
+        os.makedirs(path, exist_ok=True)
+        for name in ('frames', 'scores', 'locations'):
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        meta = {"event_types": self.event_types, "fps": self.fps,
+                "frame_interval_ms": self.frame_interval_ms, "config": self.config}
+        with open(os.path.join(path, self.META_FILE), 'w') as file:
+            json.dump(meta, file, indent=2)
+        return path
+
+    def timestamps_ms(self):
+        return self.frames * (1000.0 / self.fps)
+
+    def detections(self, threshold):
+        """Return the detection records (as AutoEventDetector.detect() does) of the frames scoring above ``threshold``."""
+        timestamps = self.timestamps_ms()
+        rows, columns = np.nonzero(np.asarray(self.scores) > threshold)
+        return [{
+            "frame": int(self.frames[row]),
+            "time_ms": round(float(timestamps[row]), 3),
+            "event_type": self.event_types[column],
+            "location": [int(value) for value in self.locations[row, column]],
+            "score": round(float(self.scores[row, column]), 4),
+        } for row, column in zip(rows, columns)]
+
+    def intervals(self, threshold, rules=None):
+        """
+        Return the EventIntervals at ``threshold``, as the detector would have produced them.
+
+        Only the frames scoring at or above each type's exit level are fed to
+        the state machines. The frames below it can only close an event, and the
+        next hit or the end of the timeline closes it at the same point.
+        """
+        aggregator = EventAggregator(rules, threshold, self.frame_interval_ms)
+        timestamps = self.timestamps_ms()
+        for column, event_type in enumerate(self.event_types):
+            column_scores = np.asarray(self.scores[:, column])
+            machine = aggregator.machine(event_type)
+            for row in np.nonzero(column_scores >= machine.rules.exit)[0]:
+                aggregator.update(float(timestamps[row]), {event_type: float(column_scores[row])})
+        return aggregator.finish()
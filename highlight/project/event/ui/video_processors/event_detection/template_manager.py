@@ -2,30 +2,156 @@
 
 import sys
 import cv2
+import hashlib
 import os
+import time
+import threading
+from .template_pyramid import TemplatePyramid
 
 sys.path.append("/Users/ronschmidt/Applications/highlight/project/event/ui/video_processors")
 
+# Directory holding one sub-folder of .png templates per event type
+THUMBNAIL_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'events', 'thumbnail')
+
+
+class TemplateSet:
+    """The decoded templates of a single event type, in color and grayscale."""
+
+    def __init__(self, event_type, paths, mtimes, color, gray, version):
+        self.event_type = event_type
+        self.paths = paths
+        self.mtimes = mtimes
+        self.color = color
+        self.gray = gray
+        # Bumped on every (re)load so derived caches know when to rebuild
+        self.version = version
+        # Content hash of the images, computed on first use by TemplateManager.digest()
+        self.digest = None
+
+    def __len__(self):
+        return len(self.color)
+
+
 class TemplateManager:
-    def __init__(self):
-        self.templates = self.load_all_templates()
+    """
+    Process-wide cache of the detection templates.
+
+    Each event type is read from disk once and kept in memory in both color
+    and grayscale. The template folder is re-checked at most once every
+    ``refresh_interval`` seconds and an event type is only reloaded when a
+    template file was added, removed or its mtime changed.
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, thumbnail_dir=THUMBNAIL_DIR, refresh_interval=2.0):
+        self.thumbnail_dir = thumbnail_dir
+        self.refresh_interval = refresh_interval
+        self.templates = {}
+        self.pyramids = {}
+        self._last_checked = {}
+        self._version = 0
+        self._lock = threading.RLock()
+
+    @classmethod
+    def instance(cls):
+        """Return the shared TemplateManager of this process."""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def get_templates(self, event_type, grayscale=False):
+        """
+        Return the list of templates for an event type.
+
+        :param event_type: Name of the sub-folder of the thumbnail directory.
+        :param grayscale: Return the grayscale variants instead of BGR.
+        :return: A list of images (may be empty if the folder is missing).
+        """
+        template_set = self.get_template_set(event_type)
+        return template_set.gray if grayscale else template_set.color
+
+    def get_template_set(self, event_type):
+        """Return the cached TemplateSet of an event type, reloading it if stale."""
+        with self._lock:
+            template_set = self.templates.get(event_type)
+            now = time.monotonic()
+            if template_set is not None and now - self._last_checked.get(event_type, 0) < self.refresh_interval:
+                return template_set
+
+            self._last_checked[event_type] = now
+            paths, mtimes = self._scan_templates(event_type)
+            if template_set is None or template_set.paths != paths or template_set.mtimes != mtimes:
+                template_set = self._load_template_set(event_type, paths, mtimes)
+                self.templates[event_type] = template_set
+            return template_set
+
+    def get_pyramid(self, event_type, scales, roi_shape, grayscale=False):
+        """
+        Return the TemplatePyramid of an event type for the given scales and ROI size.
+
+        Pyramids are built on first use and rebuilt only when the templates are reloaded.
+
+        :param event_type: Name of the sub-folder of the thumbnail directory.
+        :param scales: Template scales in percent.
+        :param roi_shape: Shape of the ROI the pyramid will be matched against.
+        :param grayscale: Build the pyramid from the grayscale variants.
+        """
+        with self._lock:
+            template_set = self.get_template_set(event_type)
+            key = (event_type, tuple(scales), tuple(roi_shape[:2]), grayscale)
+            cached = self.pyramids.get(key)
+            if cached is not None and cached[0] == template_set.version:
+                return cached[1]
+            templates = template_set.gray if grayscale else template_set.color
+            pyramid = TemplatePyramid(templates, scales, roi_shape)
+            self.pyramids[key] = (template_set.version, pyramid)
+            return pyramid
+
+    def digest(self, event_type):
+        """Return a hash of the template images of an event type, for keying cached results."""
+        with self._lock:
+            template_set = self.get_template_set(event_type)
+            if template_set.digest is None:
+                content = hashlib.sha1()
+                for image in template_set.color:
+                    content.update(str(image.shape).encode())
+                    content.update(image.tobytes())
+                template_set.digest = content.hexdigest()
+            return template_set.digest
 
     def load_all_templates(self):
+        """Load every event type found in the thumbnail directory."""
         print("Loading all templates...")
-        templates = {}
-        # Get the directory of the current script
-        script_dir = os.path.dirname(os.path.realpath(__file__))
-        # Construct the path to the thumbnail directory
-        thumbnail_dir = os.path.join(script_dir, 'thumbnail')
-        
-        for event_type in os.listdir(thumbnail_dir):
-            event_dir = os.path.join(thumbnail_dir, event_type)
-            if os.path.isdir(event_dir):
-                templates[event_type] = [cv2.imread(path, cv2.IMREAD_GRAYSCALE) for path in self._load_templates(event_type, thumbnail_dir)]
+        if os.path.isdir(self.thumbnail_dir):
+            for event_type in sorted(os.listdir(self.thumbnail_dir)):
+                if os.path.isdir(os.path.join(self.thumbnail_dir, event_type)):
+                    self.get_template_set(event_type)
         print("Templates loaded.")
-        return templates
+        return self.templates
+
+    def _scan_templates(self, event_type):
+        template_dir = os.path.join(self.thumbnail_dir, event_type)
+        if not os.path.isdir(template_dir):
+            return [], []
+        paths = sorted(os.path.join(template_dir, file) for file in os.listdir(template_dir) if file.endswith('.png'))
+        mtimes = [os.stat(path).st_mtime_ns for path in paths]
+        return paths, mtimes
 
-    def _load_templates(self, event_type, thumbnail_dir):
+    def _load_template_set(self, event_type, paths, mtimes):
         print(f"Loading templates for {event_type}...")
-        template_dir = os.path.join(thumbnail_dir, event_type)
-        return [os.path.join(template_dir, file) for file in os.listdir(template_dir) if file.endswith('.png')]
+        color, gray = [], []
+        for path in paths:
+            image = cv2.imread(path, cv2.IMREAD_COLOR)
+            if image is None:
+                print(f"Warning: Could not read template {path}")
+                continue
+            color.append(image)
+            gray.append(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY))
+        self._version += 1
+        print(f"Loaded {len(color)} {event_type} templates.")
+        # Keep the scanned paths so unreadable files don't trigger a reload on every check
+        return TemplateSet(event_type, paths, mtimes, color, gray, self._version)
@@ -0,0 +1,78 @@
+# template_pyramid.py
+
+from collections import namedtuple
+import cv2
+import numpy as np
+
+# One scaled template: the scale in percent, the index of the source template and the resized image
+PyramidEntry = namedtuple('PyramidEntry', ['scale', 'template_index', 'image'])
+
+
+class TemplatePyramid:
+    """
+    All scaled variants of a set of templates, resized once up front.
+
+    Variants that can't fit inside an ROI of ``roi_shape`` are dropped, and the
+    remaining images are packed back to back in a single contiguous buffer so
+    matching walks one block of memory instead of many small allocations.
+    Entries are ordered scale-major, like the original nested detector loops.
+    """
+
+    def __init__(self, templates, scales, roi_shape):
+        self.scales = list(scales)
+        self.roi_shape = tuple(roi_shape[:2])
+
+        sized = []
+        for scale in self.scales:
+            for index, template in enumerate(templates):
+                width = int(template.shape[1] * scale / 100)
+                height = int(template.shape[0] * scale / 100)
+                # Skip variants that collapse to nothing or are larger than the ROI
+                if width < 1 or height < 1 or height > self.roi_shape[0] or width > self.roi_shape[1]:
+                    continue
+                sized.append((scale, index, template, (width, height)))
+
+        total = sum(width * height * self._channels(template) for _, _, template, (width, height) in sized)
+        dtype = templates[0].dtype if templates else np.uint8
+        self.buffer = np.empty(total, dtype=dtype)
+
+        self.entries = []
+        offset = 0
+        for scale, index, template, (width, height) in sized:
+            shape = (height, width) + template.shape[2:]
+            size = width * height * self._channels(template)
+            view = self.buffer[offset:offset + size].reshape(shape)
+            cv2.resize(template, (width, height), dst=view)
+            self.entries.append(PyramidEntry(scale, index, view))
+            offset += size
+
+        self._downsampled = {}
+
+    def downsampled(self, factor, min_size=3):
+        """
+        Return the entries shrunk by ``factor``, aligned with ``self.entries``.
+
+        Entries whose shrunk size would fall below ``min_size`` pixels carry too
+        little detail to match reliably and are returned as None.
+        """
+        key = (factor, min_size)
+        if key not in self._downsampled:
+            images = []
+            for entry in self.entries:
+                height, width = entry.image.shape[:2]
+                if height // factor < min_size or width // factor < min_size:
+                    images.append(None)
+                else:
+                    images.append(cv2.resize(entry.image, (width // factor, height // factor), interpolation=cv2.INTER_AREA))
+            self._downsampled[key] = images
+        return self._downsampled[key]
+
+    @staticmethod
+    def _channels(image):
+        return image.shape[2] if image.ndim == 3 else 1
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
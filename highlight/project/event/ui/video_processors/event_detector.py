@@ -1,50 +1,112 @@
 # event_detector.py
 
 # Import necessary functions and modules
-from .event_detection.events.down_event import detect_down_event  # Import the function to detect the "down_event"
-from .event_detection.events.shield_break import detect_shield_break_event  # Import the function to detect the "shield_break_event"
+from .event_detection.detector_registry import get_detector, default_detectors  # Registered detectors and their scheduling hints
+from .event_detection.frame_context import FrameContext  # Shared per-frame ROI cache
+from concurrent.futures import ThreadPoolExecutor  # Runs the detectors of one frame side by side
+import threading  # Guards the creation of the shared detector pools
 import logging  # Library for logging information
 
 # Set the logging level to INFO to display informational messages
 logging.basicConfig(level=logging.INFO)
 print("Logging level set to INFO.")
 
-def detect_all_events(frame, threshold=0.8):
+# Thread pools shared by every scan, keyed by their number of workers
+_detector_pools = {}
+_detector_pools_lock = threading.Lock()
+
+def get_detector_pool(workers):
+    """
+    Returns the shared thread pool with the given number of workers, creating it on first use.
+
+    OpenCV releases the GIL in matchTemplate, cvtColor and resize, so detectors
+    reading different ROIs (or different variants of the same one) of a frame
+    run in parallel on these threads without the copies of multiprocessing.
+    """
+    with _detector_pools_lock:
+        if workers not in _detector_pools:
+            _detector_pools[workers] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="detector")
+        return _detector_pools[workers]
+
+def score_all_events(frame, scale_trackers=None, matcher=None, gates=None, detectors=None, scheduler=None, executor=None,
+                     preprocessing=None):
+    """
+    Runs the detectors on the given frame and returns their best match, whether or not it passes a threshold.
+
+    Args:
+        frame: The full video frame, or a FrameContext wrapping it.
+        scale_trackers: Optional dict of ScaleTracker objects keyed by event name.
+        matcher: Optional matching engine; the module default is used otherwise.
+        gates: Optional dict of ChangeGate objects keyed by event name; a detector
+            whose ROI hasn't changed since it last ran returns its previous match.
+        detectors: Optional list of registered detector names (see detector_registry);
+            the default detectors are run otherwise.
+        scheduler: Optional DetectorScheduler; expensive detectors then only run at
+            their minimum frame rate and return their previous match in between.
+            It also holds the state the detectors keep between the frames of a scan.
+        executor: Optional executor (see get_detector_pool) the detectors are fanned
+            out to. The results are gathered in detector order, so the output is
+            the same as when they run one after the other.
+        preprocessing: Optional RoiPreprocessing; the detectors it has settings for
+            read their ROI preprocessed, and nothing outside the ROIs is processed.
+
+    Returns:
+        A dictionary mapping each event name to its MatchResult (location in frame coordinates).
+    """
+    scale_trackers = scale_trackers or {}
+    gates = gates or {}
+    context = FrameContext.wrap(frame)
+
+    def run(spec):
+        gate = gates.get(spec.name)
+        state = scheduler.state(spec.name) if scheduler is not None else None
+        args = (matcher, scale_trackers.get(spec.name), state)
+        detector_context = preprocessing.context_for(spec.name, context) if preprocessing else context
+        if gate is not None:
+            return gate.run(spec.score, detector_context, *args)
+        return spec.score(detector_context, *args)
+
+    def schedule(spec):
+        if scheduler is not None:
+            return scheduler.run(spec, context.frame_number, lambda: run(spec))
+        return run(spec)
+
+    specs = [get_detector(event_name) for event_name in detectors or default_detectors()]
+    if executor is None or len(specs) < 2:
+        return {spec.name: schedule(spec) for spec in specs}
+
+    # Submit every detector, then wait for them in registration order
+    futures = [(spec.name, executor.submit(schedule, spec)) for spec in specs]
+    return {event_name: future.result() for event_name, future in futures}
+
+def detect_all_events(frame, threshold=0.8, scale_trackers=None, matcher=None, gates=None, detectors=None, scheduler=None,
+                      executor=None, preprocessing=None):
     """
     Detects all events in the given frame..
-    
+
     Args:
-        frame: The video frame in which to detect events.
+        frame: The full video frame in which to detect events, or a FrameContext
+            wrapping it. The ROI crops and color conversions are shared by all detectors.
         threshold: The threshold for event detection.
-        
+        scale_trackers: Optional dict of ScaleTracker objects keyed by event name,
+            used to narrow the template scales searched by each detector.
+        matcher: Optional matching engine; the module default is used otherwise.
+        gates: Optional dict of ChangeGate objects keyed by event name.
+        detectors: Optional list of registered detector names to run.
+        scheduler: Optional DetectorScheduler limiting how often expensive detectors run.
+        executor: Optional executor running the detectors of the frame in parallel.
+        preprocessing: Optional RoiPreprocessing applied to the ROIs of the detectors declaring it.
+
     Returns:
-        A dictionary of detected events.
+        A dictionary of detected events, mapping the event name to its location.
     """
-#    print("Entering detect_all_events function...")
-    
     # Create an empty dictionary to store detected events
     events = {}
- #   print("Initialized empty events dictionary.")
-
-    # Detect the down_event
- #   print("Detecting down_event...")
-    is_down_event, location = detect_down_event(frame, threshold)
-    if is_down_event:
-        events["down_event"] = location
-        print("Down event detected!")
-
-    # Detect the shield_break_event
- #   print("Detecting shield_break_event...")
-    is_shield_break_event, location = detect_shield_break_event(frame, threshold)
-    # If a "shield_break_event" is detected, add it to the events dictionary
-    if is_shield_break_event:
-        events["shield_break_event"] = location
-        print("Shield break event detected!")
 
-    # Return the dictionary of detected events
- #   print("Returning detected events dictionary.")
- # Inside detect_all_events function
-    print(f"Down event detected: {is_down_event}, Location: {location}")
-    print(f"Shield break event detected: {is_shield_break_event}, Location: {location}")
+    # Keep the events whose best match passes the threshold
+    for event_name, match in score_all_events(frame, scale_trackers, matcher, gates, detectors, scheduler, executor, preprocessing).items():
+        if match.score > threshold:
+            events[event_name] = match.location
 
+    # Return the dictionary of detected events
     return events
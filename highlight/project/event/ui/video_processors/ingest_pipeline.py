@@ -0,0 +1,272 @@
+# ingest_pipeline.py
+#
+# Scan videos on one asyncio event loop: decode -> detect -> aggregate -> export.
+# The stages are connected by bounded queues, so a slow stage (usually clip export) holds back
+# the ones before it instead of letting decoded frames pile up, and several videos are in flight
+# at once on shared executors.
+# Run from the ui directory:
+#     python -m video_processors.ingest_pipeline /recordings -o /recordings/events --in-flight 2 --clips
+
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import cpu_count
+
+from .batch_runner import find_videos, output_paths
+from .clip_extractor import ClipExtractor
+from .event_detection.auto_detector import AutoEventDetector
+from .event_detection.detector_registry import default_detectors
+from .event_detection.event_intervals import EventAggregator
+from .event_detection.headless import write_detections
+from .event_detection.matching import MATCHERS, create_matcher
+from .event_detection.preprocess_handler import PreprocessingHandler
+from .event_detection.score_timeline import TimelineRecorder
+from .logger import setup_logger
+
+logger = setup_logger()
+
+# Items each queue between two stages holds before the stage feeding it waits
+DEFAULT_QUEUE_SIZE = 8
+
+# Put on a queue after its last item
+_END = object()
+
+
+class PipelineExecutors:
+    """
+    Thread pools shared by every video in flight.
+
+    Decoding and clip writing spend their time in the codecs, detection and the
+    preprocessing of the ROIs in OpenCV and numpy calls that release the GIL, so
+    threads keep the cores busy without pickling frames between processes.
+
+    :param videos_in_flight: Videos processed at once; each needs a decode thread.
+    :param cpu_workers: Threads for detection (default: one per core).
+    :param export_workers: Threads writing clips.
+    """
+
+    def __init__(self, videos_in_flight=2, cpu_workers=None, export_workers=2):
+        self.decode = ThreadPoolExecutor(videos_in_flight, thread_name_prefix="decode")
+        self.cpu = ThreadPoolExecutor(cpu_workers or cpu_count(), thread_name_prefix="detect")
+        self.export = ThreadPoolExecutor(export_workers, thread_name_prefix="export")
+
+    def shutdown(self):
+        for executor in (self.decode, self.cpu, self.export):
+            executor.shutdown(wait=True)
+
+
+class VideoPipeline:
+    """
+    One video going through the stages.
+
+    Every stage is a task reading from the queue of the stage before it.
+    Frames are copied out of the decoder's ring buffer (see ThreadedFrameSource)
+    before they are queued. Of the three queues only two carry frames: the
+    decoded frames, and the scored frames whose contexts still hold them (the
+    third carries event intervals). So at most about ``2 * queue_size`` frames
+    of the video, plus the few being decoded, scored and aggregated, are held
+    in memory however slow the later stages are.
+
+    Preprocessing is not a stage of its own: it runs inside the detect stage,
+    where the detector's RoiPreprocessing processes the ROIs each detector
+    reads while the frame is scored, as in detect(), so detectors still get
+    the input shape they expect.
+
+    :param detector: The AutoEventDetector of the video; its detectors, rules,
+                     preprocessing, subscribers and result cache are used as in detect().
+    :param executors: The shared PipelineExecutors.
+    :param extractor: ClipExtractor writing one clip per event interval as soon
+                      as the interval closes, or None to skip clip export.
+    :param output_path: File the detections and intervals are written to at the end.
+    :param queue_size: Capacity of each queue between two stages.
+    """
+
+    def __init__(self, detector, executors, extractor=None, output_path=None, queue_size=DEFAULT_QUEUE_SIZE):
+        self.detector = detector
+        self.executors = executors
+        self.extractor = extractor
+        self.output_path = output_path
+        self.queue_size = queue_size
+        self.clips = []
+        self.stopped = False
+
+    async def run(self):
+        """Scan the video (or reuse a cached scan), export its clips and write its events; return the detections."""
+        loop = asyncio.get_running_loop()
+        detector = self.detector
+        if await loop.run_in_executor(self.executors.cpu, detector.load_cached):
+            await self.export_all(detector.intervals)
+        else:
+            await self.scan()
+
+        if self.output_path is not None:
+            await loop.run_in_executor(self.executors.export, write_detections, detector.detections, self.output_path,
+                                       detector.video_path, detector.fps, 'json', detector.intervals)
+        return detector.detections
+
+    async def scan(self):
+        loop = asyncio.get_running_loop()
+        detector = self.detector
+        stride = detector.frames_to_skip + 1
+        source = await loop.run_in_executor(self.executors.decode, detector.open_source, stride)
+        scale_trackers = detector.create_scale_trackers(source.width, source.height)
+        detector.detections = []
+        detector.prepare_scan()
+        aggregator = EventAggregator(detector.rules, detector.threshold, stride * 1000.0 / detector.fps)
+        recorder = TimelineRecorder()
+
+        decoded, scored, closed = (asyncio.Queue(self.queue_size) for _ in range(3))
+        tasks = [
+            asyncio.ensure_future(self.decode(source, decoded)),
+            asyncio.ensure_future(self.detect(decoded, scored, scale_trackers)),
+            asyncio.ensure_future(self.aggregate(scored, closed, aggregator, recorder)),
+            asyncio.ensure_future(self.export(closed)),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # A failed stage would leave the others waiting on their queues forever
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        finally:
+            logger.info(f"Frame source metrics for {detector.video_path}: {source.metrics()}")
+            await loop.run_in_executor(self.executors.decode, source.close)
+            detector.finish(aggregator, scale_trackers)
+
+        if not self.stopped:
+            await loop.run_in_executor(self.executors.export, detector.store_timeline, recorder, stride, detector.full_scan())
+
+    async def decode(self, source, output):
+        loop = asyncio.get_running_loop()
+        frames = iter(source)
+
+        def read():
+            # The source reuses its buffers, so the frame must be copied before the next read
+            item = next(frames, None)
+            return item if item is None else (item[0], item[1].copy())
+
+        while not self.stopped:
+            item = await loop.run_in_executor(self.executors.decode, read)
+            if item is None:
+                break
+            await output.put(item)
+        await output.put(_END)
+
+    async def detect(self, frames, output, scale_trackers):
+        # Frames of one video are scored in order, since the scale trackers, gates and scheduler follow the video
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await frames.get()
+            if item is _END:
+                break
+            if self.stopped:
+                continue
+            scored = await loop.run_in_executor(self.executors.cpu, self.detector.score_frame, *item, scale_trackers)
+            await output.put(scored)
+        await output.put(_END)
+
+    async def aggregate(self, scored, output, aggregator, recorder):
+        detector = self.detector
+        while True:
+            item = await scored.get()
+            if item is _END:
+                break
+            if self.stopped:
+                continue
+            frame_number, timestamp_ms, context, matches = item
+            recorder.add(frame_number, matches)
+            for interval in aggregator.update(timestamp_ms, matches):
+                detector.report(interval)
+                await output.put(interval)
+            if detector.record(frame_number, timestamp_ms, context, matches):
+                # A subscriber asked to stop: decoding ends and the frames still on their way are dropped
+                self.stopped = True
+        for interval in aggregator.close():
+            detector.report(interval)
+            await output.put(interval)
+        await output.put(_END)
+
+    async def export(self, intervals):
+        while True:
+            interval = await intervals.get()
+            if interval is _END:
+                break
+            await self.export_interval(interval)
+
+    async def export_all(self, intervals):
+        for interval in intervals:
+            await self.export_interval(interval)
+
+    async def export_interval(self, interval):
+        if self.extractor is None:
+            return
+        loop = asyncio.get_running_loop()
+        path = await loop.run_in_executor(self.executors.export, self.extractor.extract_clip,
+                                          interval.start_ms, interval.end_ms, interval.event_type)
+        self.clips.append(path)
+
+
+async def run_pipelines(video_paths, output_dir, threshold=0.8, frames_to_skip=0, engine=None, videos_in_flight=2,
+                        cpu_workers=None, export_clips=False, preprocess=False, queue_size=DEFAULT_QUEUE_SIZE):
+    """
+    Process videos with at most ``videos_in_flight`` of them going through the stages at once.
+
+    :return: A list of (video_path, status, number of detections), in the order of ``video_paths``.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    executors = PipelineExecutors(videos_in_flight, cpu_workers)
+    # The saved settings run on the ROI of every default detector, not on the whole frame
+    preprocessing_settings = PreprocessingHandler.load_preprocessing_settings() if preprocess else {}
+    preprocessing = {name: preprocessing_settings for name in default_detectors()} if preprocessing_settings else None
+    slots = asyncio.Semaphore(videos_in_flight)
+
+    async def process(video_path):
+        async with slots:
+            matcher = create_matcher(engine) if engine else None
+            detector = AutoEventDetector(video_path, threshold, frames_to_skip, matcher=matcher, preprocessing=preprocessing)
+            stem = os.path.splitext(os.path.basename(video_path))[0]
+            extractor = ClipExtractor(video_path, os.path.join(output_dir, "clips", stem)) if export_clips else None
+            pipeline = VideoPipeline(detector, executors, extractor, output_paths(video_path, output_dir)[0], queue_size)
+            start = time.perf_counter()
+            try:
+                detections = await pipeline.run()
+            except Exception:
+                logger.exception(f"Failed to process {video_path}")
+                return video_path, "failed", 0
+            logger.info(f"{video_path}: {len(detections)} detections, {len(pipeline.clips)} clips "
+                        f"in {time.perf_counter() - start:.1f}s")
+            return video_path, "done", len(detections)
+
+    try:
+        return await asyncio.gather(*(process(video_path) for video_path in video_paths))
+    finally:
+        executors.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect events in videos with an asyncio pipeline, several videos at a time.")
+    parser.add_argument("source", help="Directory of videos, or a manifest (.json list or one path per line).")
+    parser.add_argument("-o", "--output-dir", required=True, help="Directory for the event files and clips.")
+    parser.add_argument("--threshold", type=float, default=0.8, help="Minimum match score.")
+    parser.add_argument("--skip", type=int, default=0, help="Frames to skip between scanned frames.")
+    parser.add_argument("--engine", choices=sorted(MATCHERS), help="Template matching engine.")
+    parser.add_argument("--in-flight", type=int, default=2, help="Videos processed at once.")
+    parser.add_argument("--workers", type=int, help="Threads for detection (default: one per core).")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE, help="Capacity of each queue between two stages.")
+    parser.add_argument("--clips", action="store_true", help="Write a clip of every event interval.")
+    parser.add_argument("--preprocess", action="store_true",
+                        help="Apply the saved preprocessing settings to the ROI of every default detector.")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_pipelines(find_videos(args.source), args.output_dir, args.threshold, args.skip, args.engine,
+                                        args.in_flight, args.workers, args.clips, args.preprocess, args.queue_size))
+    for video_path, status, count in results:
+        logger.info(f"{video_path}: {status} ({count} detections)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,110 @@
-from multiprocessing import Pool
+import bisect
+import shutil
+import subprocess
+from multiprocessing import Pool, cpu_count
+
+import cv2
+
+from .event_detection.auto_detector import AutoEventDetector
+from .event_detection.event_intervals import intervals_from_detections
+from .event_detection.matching import create_matcher
+
+# Keyframe interval assumed when ffprobe is not available to read the real ones
+DEFAULT_GOP_SECONDS = 2.0
 
 def parallel_process(function, data, num_processes):
     with Pool(num_processes) as pool:
         results = pool.map(function, data)
     return results
+
+def get_keyframes(video_path, fps):
+    """
+    Return the sorted frame numbers of the keyframes of a video.
+
+    The packet flags are read with ffprobe, which only demuxes the file. Returns
+    None when ffprobe is not installed or fails.
+    """
+    ffprobe = shutil.which('ffprobe')
+    if ffprobe is None:
+        return None
+    command = [ffprobe, '-v', 'error', '-select_streams', 'v:0', '-show_entries', 'packet=pts_time,flags',
+               '-of', 'csv=p=0', video_path]
+    try:
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    keyframes = set()
+    for line in output.splitlines():
+        pts_time, _, flags = line.partition(',')
+        if 'K' in flags and pts_time not in ('', 'N/A'):
+            keyframes.add(round(float(pts_time) * fps))
+    return sorted(keyframes) or None
+
+def plan_chunks(video_path, num_chunks, stride=1):
+    """
+    Split a video into about ``num_chunks`` (start_frame, end_frame) ranges.
+
+    Each boundary is moved to the nearest keyframe, so the seek a worker does to
+    reach its chunk only decodes a few frames, and then up to a multiple of
+    ``stride`` so the sampled frames are the same as in a single-process scan.
+    """
+    cap = cv2.VideoCapture(video_path)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+    if frame_count <= 0:
+        return []
+
+    keyframes = get_keyframes(video_path, fps)
+    if keyframes is None:
+        keyframes = list(range(0, frame_count, max(1, round(fps * DEFAULT_GOP_SECONDS))))
+
+    boundaries = {0, frame_count}
+    for index in range(1, num_chunks):
+        target = index * frame_count // num_chunks
+        position = bisect.bisect_left(keyframes, target)
+        nearby = keyframes[max(0, position - 1):position + 1]
+        keyframe = min(nearby, key=lambda frame: abs(frame - target))
+        boundary = -(-keyframe // stride) * stride
+        if 0 < boundary < frame_count:
+            boundaries.add(boundary)
+
+    boundaries = sorted(boundaries)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+def _scan_chunk(task):
+    video_path, start_frame, end_frame, threshold, frames_to_skip, engine = task
+    # One process per core already; keep OpenCV from starting its own thread pool in every worker
+    cv2.setNumThreads(1)
+    matcher = create_matcher(engine) if engine else None
+    # Partial scans aren't cached, so the workers don't need the result cache
+    detector = AutoEventDetector(video_path, threshold, frames_to_skip, matcher=matcher, cache=None)
+    # Workers start from the stored scales but don't write them back concurrently
+    return detector.detect(start_frame, end_frame, save_scales=False)
+
+def merge_chunk_events(chunk_events):
+    """Concatenate the detections of the chunks, which cover disjoint frame ranges, ordered by frame and event type."""
+    detections = [detection for chunk in chunk_events for detection in chunk]
+    return sorted(detections, key=lambda detection: (detection["frame"], detection["event_type"]))
+
+def scan_video_parallel(video_path, threshold=0.8, frames_to_skip=0, num_processes=None, engine=None, chunks_per_process=4):
+    """
+    Scan one video for events with a pool of processes, one chunk of the video per task.
+
+    :param video_path: Video to scan.
+    :param threshold: Minimum match score for a detection.
+    :param frames_to_skip: Frames skipped between two scanned frames.
+    :param num_processes: Number of worker processes (default: one per core).
+    :param engine: Name of the matching engine; None uses the default.
+    :param chunks_per_process: More chunks than workers keeps every core busy until the end.
+    :return: (detections, intervals): the detections in the same format as
+             AutoEventDetector.detect(), and the EventIntervals built from all
+             of them, so an event straddling a chunk boundary is one interval.
+    """
+    num_processes = num_processes or cpu_count()
+    chunks = plan_chunks(video_path, num_processes * chunks_per_process, frames_to_skip + 1)
+    tasks = [(video_path, start, end, threshold, frames_to_skip, engine) for start, end in chunks]
+    print(f"Scanning {video_path} in {len(tasks)} chunks on {num_processes} processes")
+    detections = merge_chunk_events(parallel_process(_scan_chunk, tasks, num_processes))
+    return detections, intervals_from_detections(detections, threshold=threshold)
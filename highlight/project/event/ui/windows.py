@@ -219,10 +219,12 @@ class VideoApp(QMainWindow):
     def adjust_threshold(self, value):
         threshold = value / 100.0
         self.threshold_label.setText(f"Threshold: {threshold:.2f}")
-        # Use the detector object to adjust the threshold
-        if hasattr(self, 'detector'):
-            self.detector.threshold = threshold
+        # Use the detector object to adjust the threshold; its stored score timeline makes this instant
+        if hasattr(self, 'auto_detector'):
+            self.auto_detector.rethreshold(threshold)
             print(f"Threshold set to: {threshold}")
+            if self.auto_detector.timeline is not None:
+                self.show_detected_events()
 
     def seek_video(self, position):
         self.media_player.setPosition(position)
@@ -286,9 +288,19 @@ class VideoApp(QMainWindow):
     def update_slider_range(self, duration):
         self.position_slider.setRange(0, duration)
 
+    def current_frame(self):
+        """Return the frame at the player position, or None when no video is loaded."""
+        if not getattr(self, 'video_path', None):
+            return None
+        cap = cv2.VideoCapture(self.video_path)
+        cap.set(cv2.CAP_PROP_POS_MSEC, self.media_player.position())
+        ret, frame = cap.read()
+        cap.release()
+        return frame if ret else None
+
     def show_preprocessing_settings_dialog(self):
-        """Open the preprocessing settings dialog."""
-        dialog = PreprocessingSettingsDialog()
+        """Open the preprocessing settings dialog, previewing the settings on the current frame."""
+        dialog = PreprocessingSettingsDialog(self.current_frame())
         result = dialog.exec_()  # This will show the dialog and wait for user input
 
         if result == QDialog.Accepted:  # Check if the user clicked "Save"
@@ -308,8 +320,25 @@ class VideoApp(QMainWindow):
     def auto_detect_events(self):
         threshold = self.threshold_slider.value() / 100.0
         frames_to_skip = self.frameSkipSpinBox.value()
-        autodetect = AutoEventDetector(self.video_path, threshold, frames_to_skip)
-        autodetect.play_video()
+        self.auto_detector = AutoEventDetector(self.video_path, threshold, frames_to_skip)
+        # A video already scanned with the same templates and settings comes straight from the result cache
+        if not self.auto_detector.load_cached():
+            self.auto_detector.play_video()
+        self.show_detected_events()
+
+    def show_detected_events(self):
+        # Replace the events added by the previous detection or threshold, keeping the manually marked ones
+        for start, end, _ in getattr(self, 'detected_events', []):
+            if (start, end) in self.events:
+                self.events.remove((start, end))
+        # One interval per detected event, in the same (start, end) milliseconds as the manually marked ones
+        self.detected_events = [(int(interval.start_ms), int(interval.end_ms), interval.event_type) for interval in self.auto_detector.intervals]
+        for start, end, event_type in self.detected_events:
+            print(f"Detected {event_type} from {start} ms to {end} ms")
+            self.events.append((start, end))
+        self.events.sort()
+        self.status_bar.showMessage(f"{len(self.detected_events)} events detected at threshold {self.auto_detector.threshold:.2f}, "
+                                    f"{len(self.events)} events in the list")
 
 
 
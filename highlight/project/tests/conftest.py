@@ -0,0 +1,42 @@
+# conftest.py
+#
+# Fixtures for the event detection tests. Templates and videos are generated
+# into pytest's tmp_path; nothing is read from the production thumbnail folder.
+
+import os
+import sys
+
+import cv2
+import pytest
+
+# The detection code is imported as the UI does, from the ui directory
+UI_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'event', 'ui'))
+if UI_DIR not in sys.path:
+    sys.path.insert(0, UI_DIR)
+
+from video_processors.event_detection.template_manager import TemplateManager  # noqa: E402
+from tests.fixtures import FPS, FRAME_SIZE, ICON_FRAMES, make_frame, make_icon  # noqa: E402
+
+
+@pytest.fixture
+def templates(tmp_path):
+    """Install a TemplateManager reading generated templates from tmp_path; return the thumbnail directory."""
+    thumbnail_dir = tmp_path / 'thumbnail'
+    (thumbnail_dir / 'center_down_icon').mkdir(parents=True)
+    cv2.imwrite(str(thumbnail_dir / 'center_down_icon' / 'icon.png'), make_icon())
+    previous = TemplateManager._instance
+    TemplateManager._instance = TemplateManager(str(thumbnail_dir))
+    yield thumbnail_dir
+    TemplateManager._instance = previous
+
+
+@pytest.fixture
+def event_video(tmp_path, templates):
+    """Write a short video with the down icon on ICON_FRAMES; return its path."""
+    path = str(tmp_path / 'events.avi')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), FPS, FRAME_SIZE)
+    icon = make_icon()
+    for frame_number in range(90):
+        writer.write(make_frame(frame_number, icon if frame_number in ICON_FRAMES else None))
+    writer.release()
+    return path
@@ -0,0 +1,36 @@
+# fixtures.py
+#
+# Generated test data: a synthetic down icon and textured frames to paste it on.
+
+import cv2
+import numpy as np
+
+from video_processors.event_detection.regions.roi_registry import get_roi_box
+
+FRAME_SIZE = (640, 360)
+FPS = 30
+# Frames of the generated video showing the down icon; 60 is a chunk boundary of a parallel scan
+ICON_FRAMES = range(45, 75)
+
+
+def make_icon(size=30):
+    """Return a synthetic high-contrast "down" icon: a bright ring and cross on a dark square."""
+    icon = np.full((size, size, 3), 20, dtype=np.uint8)
+    center = (size // 2, size // 2)
+    cv2.circle(icon, center, size // 2 - 2, (230, 230, 230), 3)
+    cv2.line(icon, (size // 4, size // 4), (3 * size // 4, 3 * size // 4), (60, 200, 240), 3)
+    cv2.line(icon, (3 * size // 4, size // 4), (size // 4, 3 * size // 4), (60, 200, 240), 3)
+    return icon
+
+
+def make_frame(frame_number, icon=None):
+    """Return a textured background frame, with ``icon`` pasted in the middle of the center ROI."""
+    width, height = FRAME_SIZE
+    rng = np.random.default_rng(frame_number % 7)
+    frame = cv2.GaussianBlur(rng.integers(40, 160, (height, width, 3), dtype=np.uint8), (9, 9), 0)
+    if icon is not None:
+        x_start, y_start, x_end, y_end = get_roi_box('center', frame.shape)
+        top = (y_start + y_end - icon.shape[0]) // 2
+        left = (x_start + x_end - icon.shape[1]) // 2
+        frame[top:top + icon.shape[0], left:left + icon.shape[1]] = icon
+    return frame
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from video_processors.event_detection.detector_registry import DetectorScheduler, get_detector
+from video_processors.event_detection.frame_context import FrameContext
+
+from tests.fixtures import FPS
+
+
+class FakeCounter:
+    """Stands in for the OCR kill counter, reading the count from a dict keyed by frame number."""
+
+    def __init__(self, counts):
+        self.counts = counts
+
+    def read_kill_count(self, frame):
+        return self.counts[frame.frame_number]
+
+
+class FakeFeed:
+    """Stands in for the OCR kill feed reader, returning the same text for every frame."""
+
+    def __init__(self, text):
+        self.text = text
+
+    def extract_text_from_frame(self, frame):
+        return self.text
+
+
+def score_counter(scheduler, frame_number):
+    spec = get_detector("kill_counter_event")
+    context = FrameContext(np.zeros((1080, 1920, 3), np.uint8), frame_number)
+    return spec.score(context, None, None, scheduler.state(spec.name)).score
+
+
+def test_kill_count_is_kept_per_scan():
+    counts = {0: 1, 30: 2}
+    first, second = DetectorScheduler(FPS), DetectorScheduler(FPS)
+    first.state("kill_counter_event")['reader'] = FakeCounter(counts)
+    second.state("kill_counter_event")['reader'] = FakeCounter(counts)
+
+    assert score_counter(first, 0) == 0.0
+    # A new scan does not compare with the last count of the previous one
+    assert score_counter(second, 30) == 0.0
+    assert score_counter(first, 30) == 1.0
+
+
+def test_kill_count_compares_with_the_closest_earlier_frame():
+    scheduler = DetectorScheduler(FPS)
+    scheduler.state("kill_counter_event")['reader'] = FakeCounter({0: 1, 60: 2, 30: 1, 45: 2})
+
+    # Coarse pass, then a dense window going back between the two coarse frames
+    assert [score_counter(scheduler, frame) for frame in (0, 60, 30, 45)] == [0.0, 1.0, 0.0, 1.0]
+
+
+@pytest.mark.parametrize("text, score", [
+    ("Wraith_Main -> xXBloodhoundXx\n", 1.0),
+    ("\nsniper99 killed Pathfinder\n", 1.0),
+    ("Octane KNOCKED DOWN lifeline_7\n", 1.0),
+    ("", 0.0),
+    ("  \n\x0c", 0.0),
+    ("SQUADS LEFT 12\n", 0.0),
+    ("~ .i :|\n", 0.0),
+])
+def test_kill_feed_scores_only_kill_lines(text, score):
+    scheduler = DetectorScheduler(FPS)
+    spec = get_detector("kill_feed_event")
+    scheduler.state(spec.name)['reader'] = FakeFeed(text)
+    context = FrameContext(np.zeros((1080, 1920, 3), np.uint8), 0)
+    assert spec.score(context, None, None, scheduler.state(spec.name)).score == score
@@ -0,0 +1,22 @@
+from video_processors.event_detection.event_intervals import (DEFAULT_RULES, EventStateMachine,
+                                                              intervals_from_detections)
+
+
+def test_single_hit_event_lasts_one_frame():
+    machine = EventStateMachine("shield_break_event", DEFAULT_RULES["shield_break_event"], frame_interval_ms=100)
+    assert machine.update(1000, 0.9) is None
+    interval = machine.update(1500, 0.0)
+    assert (interval.start_ms, interval.end_ms) == (1000, 1100)
+
+
+def test_lone_detection_uses_the_frame_duration():
+    detections = [{"frame": 30, "time_ms": 1000.0, "event_type": "shield_break_event", "score": 0.9}]
+    intervals = intervals_from_detections(detections, threshold=0.8)
+    assert len(intervals) == 1
+    assert intervals[0].end_ms - intervals[0].start_ms > 0
+
+
+def test_short_down_flicker_is_still_dropped():
+    machine = EventStateMachine("down_event", DEFAULT_RULES["down_event"], frame_interval_ms=100)
+    machine.update(1000, 0.9)
+    assert machine.update(1500, 0.0) is None
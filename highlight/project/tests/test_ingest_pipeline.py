@@ -0,0 +1,22 @@
+import asyncio
+
+from video_processors.event_detection.auto_detector import AutoEventDetector
+from video_processors.ingest_pipeline import PipelineExecutors, VideoPipeline
+
+from tests.fixtures import ICON_FRAMES
+
+
+def test_pipeline_preprocesses_the_detector_rois_like_detect(event_video):
+    preprocessing = {"down_event": {"enhance_contrast": {}}}
+    expected = AutoEventDetector(event_video, 0.6, cache=None, preprocessing=preprocessing).detect(save_scales=False)
+
+    executors = PipelineExecutors(videos_in_flight=1, cpu_workers=1, export_workers=1)
+    detector = AutoEventDetector(event_video, 0.6, cache=None, preprocessing=preprocessing)
+    try:
+        detections = asyncio.run(VideoPipeline(detector, executors, queue_size=2).run())
+    finally:
+        executors.shutdown()
+
+    assert [(d["frame"], d["event_type"]) for d in detections] == [(d["frame"], d["event_type"]) for d in expected]
+    assert {d["frame"] for d in detections if d["event_type"] == "down_event"} <= set(ICON_FRAMES)
+    assert detections
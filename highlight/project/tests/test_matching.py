@@ -0,0 +1,41 @@
+import cv2
+import pytest
+
+from video_processors.event_detection.events.down_event import DOWN_SCALES
+from video_processors.event_detection.matching import (CoarseToFineMatcher, ExhaustiveMatcher, FFTMatcher,
+                                                       get_default_matcher, results_agree)
+from video_processors.event_detection.template_pyramid import TemplatePyramid
+
+from tests.fixtures import make_frame, make_icon
+
+
+def test_default_matcher_is_the_exhaustive_search():
+    assert isinstance(get_default_matcher(), ExhaustiveMatcher)
+
+
+def test_exhaustive_and_fft_find_the_pasted_icon():
+    icon = make_icon()
+    roi = make_frame(0)[100:190, 200:320].copy()
+    roi[40:70, 50:80] = icon
+    pyramid = TemplatePyramid([icon], [50, 100, 150], roi.shape)
+
+    exhaustive = ExhaustiveMatcher().match(roi, pyramid)
+    assert exhaustive.location == (50, 40)
+    assert exhaustive.scale == 100
+    assert exhaustive.score > 0.99
+    assert results_agree(FFTMatcher().match(roi, pyramid), exhaustive)
+
+
+@pytest.mark.parametrize("scale", [25, 45, 65, 105, 155])
+@pytest.mark.parametrize("position", [(0, 0), (37, 81), (95, 140)])
+def test_coarse_to_fine_agrees_with_the_exhaustive_search(scale, position):
+    icon = make_icon()
+    size = icon.shape[0] * scale // 100
+    roi = make_frame(0)[60:250, 200:350].copy()
+    y, x = min(position[0], roi.shape[0] - size), min(position[1], roi.shape[1] - size)
+    roi[y:y + size, x:x + size] = cv2.resize(icon, (size, size))
+    pyramid = TemplatePyramid([icon], DOWN_SCALES, roi.shape)
+
+    exhaustive = ExhaustiveMatcher().match(roi, pyramid)
+    assert exhaustive.score > 0.9
+    assert results_agree(CoarseToFineMatcher().match(roi, pyramid), exhaustive)
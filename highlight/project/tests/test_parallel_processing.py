@@ -0,0 +1,24 @@
+from video_processors.event_detection.auto_detector import AutoEventDetector
+from video_processors.event_detection.headless import detect_events_headless
+from video_processors.parallel_processing import plan_chunks, scan_video_parallel
+
+from tests.fixtures import FPS, ICON_FRAMES
+
+
+def test_parallel_scan_matches_a_single_process_scan(event_video):
+    assert (60, 90) in plan_chunks(event_video, 2)
+    detections, intervals = scan_video_parallel(event_video, threshold=0.6, num_processes=2, chunks_per_process=1)
+
+    sequential = AutoEventDetector(event_video, 0.6, cache=None).detect(save_scales=False)
+    assert [(d["frame"], d["event_type"]) for d in detections] == [(d["frame"], d["event_type"]) for d in sequential]
+    assert {d["frame"] for d in detections if d["event_type"] == "down_event"} == set(ICON_FRAMES)
+    # The event crosses the chunk boundary at frame 60 and still comes out as one interval
+    down = [interval for interval in intervals if interval.event_type == "down_event"]
+    assert len(down) == 1
+    assert round(down[0].start_ms * FPS / 1000) == ICON_FRAMES[0]
+
+
+def test_headless_writes_the_parallel_scan(event_video, tmp_path):
+    output = str(tmp_path / "events.json")
+    detections = detect_events_headless(event_video, output, threshold=0.6, fmt='json', processes=2)
+    assert len(detections) == len(ICON_FRAMES)
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from video_processors.event_detection.preprocessing_pipeline import (FUSED_HISTOGRAM_MIN_PIXELS, FusedLookup,
+                                                                     PreprocessingPipeline)
+
+from video_processors.event_detection.preprocess_handler import PreprocessingHandler
+
+from tests.fixtures import make_frame
+
+# What PreprocessingSettingsDialog saves with normalize, enhance contrast and global thresholding checked
+DIALOG_SETTINGS = {"normalize_image": {}, "enhance_contrast": {}, "global_thresholding": {"thresh": 127}}
+
+
+def frame_of(pixels):
+    """Return a textured BGR frame of about ``pixels`` pixels, with a narrow value range for normalize to stretch."""
+    height = int((pixels * 9 / 16) ** 0.5) + 1
+    frame = np.tile(make_frame(0), (height // 360 + 1, (16 * height // 9) // 640 + 1, 1))[:height, :16 * height // 9]
+    return (frame // 2 + 40).astype(np.uint8)
+
+
+def test_dialog_settings_fuse_across_the_gray_conversion():
+    steps = PreprocessingPipeline(DIALOG_SETTINGS).steps
+    assert len(steps) == 1
+    assert isinstance(steps[0], FusedLookup)
+    assert steps[0].name == "normalize_image+to_gray+enhance_contrast+global_thresholding"
+
+
+@pytest.mark.parametrize("settings", [
+    DIALOG_SETTINGS,
+    {"normalize_image": {}, "global_thresholding": {"thresh": 100}},
+    {"enhance_contrast": {}, "normalize_image": {}},
+    {"global_thresholding": {"thresh": 50}, "normalize_image": {}, "enhance_contrast": {}},
+])
+@pytest.mark.parametrize("pixels", [150 * 190, FUSED_HISTOGRAM_MIN_PIXELS])
+def test_fused_steps_give_the_pixels_of_the_separate_steps(settings, pixels):
+    frame = frame_of(pixels)
+    fused = PreprocessingPipeline(settings)
+    assert any(isinstance(step, FusedLookup) for step in fused.steps)
+    np.testing.assert_array_equal(fused.apply(frame), PreprocessingPipeline(settings, fuse=False).apply(frame))
+
+
+@pytest.mark.parametrize("settings", [DIALOG_SETTINGS, {"global_thresholding": {"thresh": 100}}, {"reduce_noise": {"kernel_size": 5}}])
+def test_batched_preprocessing_gives_the_pixels_of_the_per_frame_path(settings):
+    crops = [make_frame(frame_number)[100:290, 200:350] for frame_number in range(4)]
+    handler = PreprocessingHandler(settings)
+    batched = handler.apply_preprocessing_batch(crops).copy()
+    for crop, result in zip(crops, batched):
+        np.testing.assert_array_equal(result, handler.apply_preprocessing(crop))
@@ -0,0 +1,21 @@
+import pytest
+
+from video_processors.event_detection.auto_detector import AutoEventDetector
+
+from tests.fixtures import ICON_FRAMES
+
+
+@pytest.mark.parametrize("settings", [{"enhance_contrast": {}}, {"adaptive_thresholding": {}}])
+def test_gray_preprocessed_roi_is_matched_against_gray_templates(event_video, settings):
+    detector = AutoEventDetector(event_video, 0.6, cache=None, preprocessing={"down_event": settings})
+    detections = detector.detect(save_scales=False)
+    down_frames = {d["frame"] for d in detections if d["event_type"] == "down_event"}
+    assert down_frames and down_frames <= set(ICON_FRAMES)
+
+
+def test_timeline_key_ignores_the_global_preprocessing_settings(event_video, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    detector = AutoEventDetector(event_video, 0.6, cache=None, preprocessing={"down_event": {"enhance_contrast": {}}})
+    config = detector.timeline_config(detector.full_scan())
+    (tmp_path / "settings.json").write_text('{"reduce_noise": {"kernel_size": 5}}')
+    assert detector.timeline_config(detector.full_scan()) == config
@@ -0,0 +1,53 @@
+import json
+import multiprocessing
+import os
+import threading
+
+from video_processors.event_detection.scale_tracker import SCALE_STATS_FILE, ScaleStatsStore
+
+
+def test_concurrent_saves_keep_every_scan_statistics(tmp_path):
+    path = str(tmp_path / SCALE_STATS_FILE)
+    stores = [ScaleStatsStore(path) for _ in range(8)]
+    for index, store in enumerate(stores):
+        store.set_hits(f"{640 + index}x360", "center_down_icon", {100: index + 1})
+
+    threads = [threading.Thread(target=store.save) for store in stores]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with open(path) as file:
+        stats = json.load(file)
+    assert len(stats) == 8
+    assert ScaleStatsStore(path).get_hits("645x360", "center_down_icon") == {100: 6}
+    assert sorted(os.listdir(tmp_path)) == [SCALE_STATS_FILE, SCALE_STATS_FILE + '.lock']
+
+
+def test_save_keeps_entries_written_by_another_store(tmp_path):
+    path = str(tmp_path / SCALE_STATS_FILE)
+    first, second = ScaleStatsStore(path), ScaleStatsStore(path)
+    first.set_hits("1920x1080", "center_down_icon", {95: 3})
+    first.save()
+    second.set_hits("1920x1080", "shield_break", {105: 2})
+    second.save()
+    assert ScaleStatsStore(path).get_hits("1920x1080", "center_down_icon") == {95: 3}
+    assert ScaleStatsStore(path).get_hits("1920x1080", "shield_break") == {105: 2}
+
+
+def _save_from_process(args):
+    path, index = args
+    store = ScaleStatsStore(path)
+    store.set_hits(f"{640 + index}x360", "center_down_icon", {100: index + 1})
+    store.save()
+
+
+def test_saves_from_several_processes_keep_every_scan_statistics(tmp_path):
+    path = str(tmp_path / SCALE_STATS_FILE)
+    with multiprocessing.Pool(4) as pool:
+        pool.map(_save_from_process, [(path, index) for index in range(16)])
+
+    with open(path) as file:
+        assert len(json.load(file)) == 16
+    assert sorted(os.listdir(tmp_path)) == [SCALE_STATS_FILE, SCALE_STATS_FILE + '.lock']
@@ -0,0 +1,17 @@
+from video_processors.event_detection.template_manager import THUMBNAIL_DIR, TemplateManager
+
+
+def test_templates_are_loaded_once_from_the_thumbnail_dir(templates):
+    manager = TemplateManager.instance()
+    first = manager.get_templates('center_down_icon')
+    assert len(first) == 1
+    assert manager.get_templates('center_down_icon') is first
+    assert len(manager.get_templates('center_down_icon', grayscale=True)[0].shape) == 2
+
+
+def test_missing_event_type_has_no_templates(templates):
+    assert TemplateManager.instance().get_templates('no_such_event') == []
+
+
+def test_production_thumbnail_dir_is_not_used_by_the_tests(templates):
+    assert TemplateManager.instance().thumbnail_dir != THUMBNAIL_DIR